@@ -0,0 +1,333 @@
+"""
+A mixed API workload driven in-process through the URLconf, middleware
+and JWT authentication, against a seeded library in a throwaway test
+database. Reports throughput, p50/p95/p99 latency and queries per
+request for each operation, saves them as JSON and flags regressions
+against a baseline from an earlier run.
+
+    python -m benchmarks.api_workload --output run.json
+    python -m benchmarks.api_workload --baseline benchmarks/baseline.json
+"""
+import argparse
+import datetime
+import json
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+from unittest import mock
+
+from benchmarks.utils import QueryCounter, benchmark_database, percentile
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from borrowings import seeding, tasks
+from borrowings.models import Borrowing
+from user.models import User
+
+PASSWORD = "library12345"
+# operation: share of the requests
+WORKLOAD = {
+    "browse": 30,
+    "search": 10,
+    "book_detail": 25,
+    "checkout": 10,
+    "return": 10,
+    "me": 10,
+    "token_refresh": 5,
+}
+LATENCY_TOLERANCE = 0.5  # p95 slower than the baseline by more is flagged
+
+
+@dataclass
+class Catalog:
+    book_ids: list[int]
+    weights: list[float]
+
+    @classmethod
+    def seeded(cls, book_ids: list[int]) -> "Catalog":
+        # the seeded popularity: low ranks are asked for far more often
+        return cls(
+            book_ids,
+            seeding.zipf_weights(len(book_ids), seeding.BOOK_POPULARITY),
+        )
+
+    def pick(self, rng: random.Random) -> int:
+        return rng.choices(self.book_ids, cum_weights=self.weights)[0]
+
+
+@dataclass
+class Reader:
+    client: Client
+    access: str
+    refresh: str
+    active: list[int] = field(default_factory=list)
+    next_page: Optional[str] = None
+
+    def headers(self) -> dict[str, str]:
+        return {"HTTP_AUTHORIZATION": f"Bearer {self.access}"}
+
+
+def browse(reader: Reader, rng: random.Random, catalog: Catalog) -> Any:
+    # readers page on through the catalog, then start over
+    url = reader.next_page or reverse("books:book-list")
+    response = reader.client.get(url, **reader.headers())
+    reader.next_page = (
+        response.json()["next"] if rng.random() < 0.8 else None
+    )
+    return response
+
+
+def search(reader: Reader, rng: random.Random, catalog: Catalog) -> Any:
+    words = " ".join(rng.choice(words) for words in seeding.TITLE_WORDS)
+    return reader.client.get(
+        reverse("books:book-list"), {"q": words}, **reader.headers()
+    )
+
+
+def book_detail(
+        reader: Reader,
+        rng: random.Random,
+        catalog: Catalog,
+) -> Any:
+    return reader.client.get(
+        reverse("books:book-detail", args=[catalog.pick(rng)]),
+        **reader.headers(),
+    )
+
+
+def checkout(reader: Reader, rng: random.Random, catalog: Catalog) -> Any:
+    response = reader.client.post(
+        reverse("borrowings:borrowing-list"),
+        {
+            "book": catalog.pick(rng),
+            "expected_return_date": (
+                timezone.localdate() + datetime.timedelta(days=14)
+            ).isoformat(),
+        },
+        **reader.headers(),
+    )
+    if response.status_code == 201:
+        reader.active.append(response.json()["id"])
+    return response
+
+
+def return_book(
+        reader: Reader,
+        rng: random.Random,
+        catalog: Catalog,
+) -> Any:
+    if not reader.active:
+        return checkout(reader, rng, catalog)
+    borrowing_id = reader.active.pop(rng.randrange(len(reader.active)))
+    return reader.client.post(
+        reverse("borrowings:borrowing-return-book", args=[borrowing_id]),
+        **reader.headers(),
+    )
+
+
+def me(reader: Reader, rng: random.Random, catalog: Catalog) -> Any:
+    return reader.client.get(reverse("user:manage"), **reader.headers())
+
+
+def token_refresh(
+        reader: Reader,
+        rng: random.Random,
+        catalog: Catalog,
+) -> Any:
+    response = reader.client.post(
+        reverse("user:token_refresh"), {"refresh": reader.refresh}
+    )
+    tokens = response.json()
+    reader.access, reader.refresh = tokens["access"], tokens["refresh"]
+    return response
+
+
+OPERATIONS: dict[str, Callable[[Reader, random.Random, Catalog], Any]] = {
+    "browse": browse,
+    "search": search,
+    "book_detail": book_detail,
+    "checkout": checkout,
+    "return": return_book,
+    "me": me,
+    "token_refresh": token_refresh,
+}
+
+
+def log_in(user: User) -> Reader:
+    # failed requests are counted as errors rather than raised
+    client = Client(raise_request_exception=False)
+    tokens = client.post(
+        reverse("user:token_obtain_pair"),
+        {"email": user.email, "password": PASSWORD},
+    ).json()
+    reader = Reader(client, tokens["access"], tokens["refresh"])
+    reader.active = list(
+        Borrowing.objects.filter(
+            user=user, actual_return_date=None
+        ).values_list("id", flat=True)
+    )
+    return reader
+
+
+def run_workload(
+        readers: list[Reader],
+        catalog: Catalog,
+        requests: int,
+        rng: random.Random,
+) -> tuple[dict[str, list[tuple[float, int, int]]], float]:
+    """(latency, queries, status) samples per operation, and the run time"""
+    names, shares = zip(*WORKLOAD.items())
+    samples = defaultdict(list)
+    started = time.perf_counter()
+    for name in rng.choices(names, weights=shares, k=requests):
+        reader = rng.choice(readers)
+        with QueryCounter() as queries:
+            request_started = time.perf_counter()
+            response = OPERATIONS[name](reader, rng, catalog)
+            latency = time.perf_counter() - request_started
+        samples[name].append((latency, queries.count, response.status_code))
+    return samples, time.perf_counter() - started
+
+
+def summarize(
+        samples: dict[str, list[tuple[float, int, int]]],
+        elapsed: float,
+) -> dict[str, dict[str, float]]:
+    results = {}
+    for name, rows in sorted(samples.items()):
+        latencies = [latency * 1000 for latency, _, _ in rows]
+        results[name] = {
+            "requests": len(rows),
+            "errors": sum(status >= 400 for _, _, status in rows),
+            "throughput": len(rows) / elapsed,
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "queries_per_request": sum(q for _, q, _ in rows) / len(rows),
+        }
+    return results
+
+
+def compare(
+        results: dict[str, Any],
+        baseline: dict[str, Any],
+        tolerance: float,
+) -> list[str]:
+    """Operations slower or chattier than the baseline"""
+    regressions = []
+    for name, current in results["operations"].items():
+        before = baseline["operations"].get(name)
+        if before is None:
+            continue
+        if current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {current['p95_ms']:.1f}ms, "
+                f"baseline {before['p95_ms']:.1f}ms"
+            )
+        if current["queries_per_request"] > (
+            before["queries_per_request"] + 0.01
+        ):
+            regressions.append(
+                f"{name}: {current['queries_per_request']:.2f} "
+                f"queries per request, baseline "
+                f"{before['queries_per_request']:.2f}"
+            )
+    return regressions
+
+
+def run(args: argparse.Namespace) -> dict[str, Any]:
+    rng = random.Random(args.seed)
+    book_ids = seeding.seed_books(rng, args.books)
+    user_ids = seeding.seed_users(rng, args.users, PASSWORD)
+    seeding.seed_borrowings(rng, args.borrowings, book_ids, user_ids, 365)
+    catalog = Catalog.seeded(book_ids)
+    readers = [
+        log_in(user)
+        for user in User.objects.filter(
+            pk__in=rng.sample(user_ids, min(args.readers, len(user_ids)))
+        )
+    ]
+
+    # the Celery wake-up after a checkout would need a broker; the
+    # events it announces are still written to the outbox
+    with override_settings(DEBUG=False), mock.patch.object(
+        tasks.dispatch_outbox, "delay"
+    ):
+        run_workload(readers, catalog, args.warmup, rng)
+        samples, elapsed = run_workload(readers, catalog, args.requests, rng)
+
+    total = sum(len(rows) for rows in samples.values())
+    return {
+        "meta": {
+            "started": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "books": args.books,
+            "users": args.users,
+            "borrowings": args.borrowings,
+            "readers": len(readers),
+            "seed": args.seed,
+        },
+        "total": {"requests": total, "throughput": total / elapsed},
+        "operations": summarize(samples, elapsed),
+    }
+
+
+def print_results(results: dict[str, Any]) -> None:
+    print(
+        f"{results['total']['requests']} requests, "
+        f"{results['total']['throughput']:.0f} requests/s"
+    )
+    print(
+        f"{'operation':<14}{'requests':>9}{'errors':>8}{'req/s':>9}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}"
+    )
+    for name, row in results["operations"].items():
+        print(
+            f"{name:<14}{row['requests']:>9}{row['errors']:>8}"
+            f"{row['throughput']:>9.0f}{row['p50_ms']:>9.2f}"
+            f"{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+            f"{row['queries_per_request']:>9.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--borrowings", type=int, default=100000)
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument(
+        "--baseline", help="results JSON of an earlier run to compare with"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=LATENCY_TOLERANCE
+    )
+    args = parser.parse_args()
+
+    with benchmark_database():
+        results = run(args)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
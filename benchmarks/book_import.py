@@ -0,0 +1,112 @@
+"""
+Bulk book import throughput, against creating books one POST at a time.
+
+    python -m benchmarks.book_import --books 500000
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import tracemalloc
+
+from benchmarks.utils import QueryCounter, Timer, benchmark_database, report
+
+from books.importer import decode_lines, import_books, read_csv
+from books.models import Book
+from books.serializers import BookSerializer
+
+FIELDS = ("title", "author", "cover", "inventory", "daily_fee")
+
+
+def write_catalog(path: str, books: int, invalid: float, seed: int) -> None:
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as file_:
+        writer = csv.writer(file_)
+        writer.writerow(FIELDS)
+        for i in range(books):
+            writer.writerow((
+                f"Imported book {i}",
+                f"Author {i % 5000}",
+                "PAPER" if rng.random() < invalid else "HARD",
+                rng.randint(0, 20),
+                f"{rng.randint(50, 500) / 100:.2f}",
+            ))
+
+
+def timed_import(path: str, batch_size: int) -> tuple[int, int, float, int]:
+    imported = rejected = 0
+    with open(path, "rb") as stream:
+        rows = read_csv(decode_lines(stream))
+        with Timer() as timer, QueryCounter() as queries:
+            for written, errors in import_books(rows, batch_size):
+                imported += written
+                rejected += len(errors)
+    return imported, rejected, timer.elapsed, queries.count
+
+
+def run(books: int, batch_size: int, baseline: int, seed: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalog.csv")
+        write_catalog(path, books, invalid=0.01, seed=seed)
+
+        for name in ("import into empty catalog", "re-import (all upserts)"):
+            imported, rejected, seconds, queries = timed_import(
+                path, batch_size
+            )
+            report(
+                name,
+                rows=books,
+                imported=imported,
+                rejected=rejected,
+                queries=queries,
+                seconds=seconds,
+                rows_per_second=books / seconds,
+            )
+
+        tracemalloc.start()
+        timed_import(path, batch_size)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report(
+            "memory",
+            input_mb=os.path.getsize(path) / 2 ** 20,
+            peak_mb=peak / 2 ** 20,
+        )
+
+    # the previous path: full serializer validation and a title lookup
+    # per book
+    with Timer() as timer, QueryCounter() as queries:
+        for i in range(baseline):
+            serializer = BookSerializer(data={
+                "title": f"Posted book {i}",
+                "author": "Author",
+                "cover": "HARD",
+                "inventory": 1,
+                "daily_fee": "1.00",
+            })
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+    report(
+        "one book per request (serializer only)",
+        rows=baseline,
+        queries=queries.count,
+        seconds=timer.elapsed,
+        rows_per_second=baseline / timer.elapsed,
+    )
+    assert Book.objects.count() == imported + baseline
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=500000)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--baseline", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    with benchmark_database():
+        run(args.books, args.batch_size, args.baseline, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Book search latency over a large catalog, against downloading it all.
+
+    python -m benchmarks.book_search --books 1000000
+"""
+import argparse
+import random
+
+from benchmarks.utils import Timer, benchmark_database, percentile, report
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from books.models import Book
+from books.serializers import BookSerializer
+
+SYLLABLES = (
+    "ka ri mo ten sha lo vin dra el or an tis bel gor mi nu sa ver kal "
+    "dor pha ren us ith ga lum zor fe ny qua sol mar tek on wy le"
+).split()
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def zipf_weights(size: int) -> list[float]:
+    """Cumulative weights of a Zipf distribution, as real word usage is"""
+    weights, total = [], 0.0
+    for rank in range(1, size + 1):
+        total += 1 / rank
+        weights.append(total)
+    return weights
+
+
+def seed_catalog(
+        books: int,
+        vocabulary: list[str],
+        rng: random.Random,
+) -> None:
+    weights = zipf_weights(len(vocabulary))
+    authors = [
+        " ".join(rng.sample(vocabulary, 2)).title() for _ in range(5000)
+    ]
+    titles = set()
+    while len(titles) < books:
+        words = rng.choices(
+            vocabulary, cum_weights=weights, k=rng.randint(2, 5)
+        )
+        titles.add(" ".join(words).title())
+    titles = list(titles)
+    for start in range(0, books, 10000):
+        Book.objects.bulk_create(
+            Book(
+                title=title,
+                author=rng.choice(authors),
+                cover=rng.choice(Book.CoverChoices.values),
+                inventory=rng.randint(0, 20),
+                daily_fee=rng.randint(50, 500) / 100,
+            )
+            for title in titles[start:start + 10000]
+        )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE books_book")
+
+
+def run(books: int, searches: int, seed: int) -> None:
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(50000, rng)
+    with Timer() as timer:
+        seed_catalog(books, vocabulary, rng)
+    report("seed catalog", books=books, seconds=timer.elapsed)
+
+    client = APIClient()
+    client.get("/api/books/", {"q": vocabulary[0]})  # warm up
+    weights = zipf_weights(len(vocabulary))
+    latencies = []
+    for _ in range(searches):
+        text = " ".join(
+            rng.choices(vocabulary, cum_weights=weights, k=rng.randint(1, 2))
+        )
+        with Timer() as timer:
+            response = client.get("/api/books/", {"q": text})
+        assert response.status_code == 200
+        latencies.append(timer.elapsed * 1000)
+    report(
+        "search /api/books/?q=",
+        searches=searches,
+        p50_ms=percentile(latencies, 0.5),
+        p95_ms=percentile(latencies, 0.95),
+        p99_ms=percentile(latencies, 0.99),
+    )
+
+    # what clients did before search: fetch and filter the whole catalog
+    with Timer() as timer:
+        body = JSONRenderer().render(
+            BookSerializer(Book.objects.defer("search_vector"), many=True).data
+        )
+    report(
+        "download whole catalog",
+        seconds=timer.elapsed,
+        response_mb=len(body) / 2 ** 20,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=1000000)
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    with benchmark_database():
+        run(args.books, args.searches, args.seed)
+
+
+if __name__ == "__main__":
+    main()
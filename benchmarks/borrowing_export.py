@@ -0,0 +1,55 @@
+"""
+Peak memory and throughput of the streaming borrowing export at growing
+sizes; the peak should stay flat as the row count grows.
+
+    python -m benchmarks.borrowing_export --sizes 10000 100000 1000000
+"""
+import argparse
+import tracemalloc
+
+from benchmarks.utils import Timer, benchmark_database, report, seed_borrowings
+
+from borrowings.export import RENDERERS, export_borrowings
+from borrowings.models import Borrowing
+
+
+def measure(size: int, output: str) -> tuple[float, float, int]:
+    queryset = Borrowing.objects.filter(
+        pk__in=Borrowing.objects.order_by("id").values("id")[:size]
+    )
+    written = 0
+    tracemalloc.start()
+    with Timer() as timer:
+        for chunk in export_borrowings(queryset, output):
+            written += len(chunk)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timer.elapsed, peak, written
+
+
+def run(sizes: list[int]) -> None:
+    seed_borrowings(max(sizes), overdue=0.5)
+    for size in sizes:
+        for output in sorted(RENDERERS):
+            seconds, peak, written = measure(size, output)
+            report(
+                f"{output} export, {size} rows",
+                seconds=seconds,
+                rows_per_second=size / seconds,
+                output_mb=written / 2 ** 20,
+                peak_mb=peak / 2 ** 20,
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    args = parser.parse_args()
+    with benchmark_database():
+        run(args.sizes)
+
+
+if __name__ == "__main__":
+    main()
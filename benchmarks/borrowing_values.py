@@ -0,0 +1,69 @@
+"""
+Borrowing list rendering through model instances and the serializer,
+against values() rows shaped into dicts, at growing sizes.
+
+    python -m benchmarks.borrowing_values --sizes 1000 10000 100000
+"""
+import argparse
+import tracemalloc
+from typing import Callable
+
+from benchmarks.utils import Timer, benchmark_database, report, seed_borrowings
+from rest_framework.renderers import JSONRenderer
+
+from borrowings.models import Borrowing
+from borrowings.serializers import BorrowingListSerializer
+from borrowings.values import borrowing_rows, shape_borrowing
+
+
+def serializer_path(size: int) -> bytes:
+    borrowings = Borrowing.objects.select_related("book", "user")[:size]
+    return JSONRenderer().render(
+        BorrowingListSerializer(borrowings, many=True).data
+    )
+
+
+def values_path(size: int) -> bytes:
+    rows = borrowing_rows(Borrowing.objects.all())[:size]
+    return JSONRenderer().render([shape_borrowing(row) for row in rows])
+
+
+def measure(path: Callable[[int], bytes], size: int) -> tuple[float, float]:
+    with Timer() as timer:
+        path(size)
+    tracemalloc.start()
+    path(size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timer.elapsed, peak
+
+
+def run(sizes: list[int]) -> None:
+    seed_borrowings(max(sizes), overdue=0.5)
+    for size in sizes:
+        assert serializer_path(size) == values_path(size)
+        for name, path in (
+            ("serializer", serializer_path),
+            ("values", values_path),
+        ):
+            seconds, peak = measure(path, size)
+            report(
+                f"{name} path, {size} rows",
+                seconds=seconds,
+                rows_per_second=size / seconds,
+                peak_mb=peak / 2 ** 20,
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    args = parser.parse_args()
+    with benchmark_database():
+        run(args.sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Latency of short requests (GET /api/user/me/, a single query) when every
+request opens its own database connection, against persistent
+connections on WSGI and the in-process pool on ASGI, each served by
+gunicorn on a throwaway test database. Also reports how many
+connections each setup leaves open on the server.
+
+    python -m benchmarks.db_connections --concurrency 1 8 --duration 10
+"""
+import argparse
+import asyncio
+import random
+
+from benchmarks.serving import load, start_server, wait_until_ready
+from benchmarks.utils import benchmark_database, report
+from django.db import connection
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from borrowings import seeding
+from user.models import User
+
+# setup: serving stack, environment of the server
+SETUPS = {
+    "wsgi-connect-per-request": ("wsgi", {"POSTGRES_CONN_MAX_AGE": "0"}),
+    "wsgi-persistent": ("wsgi", {"POSTGRES_CONN_MAX_AGE": "60"}),
+    "asgi-connect-per-request": (
+        "asgi", {"POSTGRES_POOL_SIZE": "0", "POSTGRES_CONN_MAX_AGE": "0"}
+    ),
+    "asgi-pool": ("asgi", {"POSTGRES_POOL_SIZE": "10"}),
+}
+WORKLOAD = {"me": 1}
+
+
+def server_connections() -> int:
+    """Connections to the benchmark database other than this one"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND pid <> pg_backend_pid()"
+        )
+        return cursor.fetchone()[0]
+
+
+def run(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    user_ids = seeding.seed_users(rng, args.users, "library12345")
+    tokens = [
+        str(RefreshToken.for_user(user).access_token)
+        for user in User.objects.filter(pk__in=user_ids)
+    ]
+
+    for setup in args.setups:
+        stack, environment = SETUPS[setup]
+        server = start_server(stack, args.port, args.workers, environment)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            wait_until_ready(base_url)
+            for concurrency in args.concurrency:
+                results = asyncio.run(load(
+                    base_url, tokens, [], concurrency, args.duration,
+                    server.pid, args.seed, WORKLOAD,
+                ))
+                results.pop("peak_rss")
+                report(
+                    f"{setup}, {args.workers} workers, "
+                    f"{concurrency} concurrent connections",
+                    **results,
+                    open_db_connections=server_connections(),
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--setups", nargs="+", choices=sorted(SETUPS), default=list(SETUPS)
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 8]
+    )
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
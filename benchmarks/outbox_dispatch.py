@@ -0,0 +1,75 @@
+"""
+Outbox drain throughput against a local stub sink.
+
+    python -m benchmarks.outbox_dispatch --events 20000 --dispatchers 4
+"""
+import argparse
+import asyncio
+import threading
+
+from benchmarks.utils import Timer, benchmark_database, report
+from django.db import connection
+
+from borrowings import outbox
+from borrowings.models import OutboxEvent
+
+
+def run(
+        events: int,
+        dispatchers: int,
+        batch_size: int,
+        sink_latency: float,
+) -> None:
+    OutboxEvent.objects.bulk_create(
+        (OutboxEvent(message=f"event {i}") for i in range(events)),
+        batch_size=5000,
+    )
+    sent = []
+
+    async def stub_sink(messages: list[str]) -> list:
+        await asyncio.sleep(sink_latency)
+        sent.extend(messages)
+        return [None] * len(messages)
+
+    def dispatcher() -> None:
+        try:
+            outbox.drain(batch_size=batch_size, send=stub_sink)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=dispatcher) for _ in range(dispatchers)]
+    with Timer() as timer:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    report(
+        "outbox dispatch",
+        events=events,
+        dispatchers=dispatchers,
+        batch_size=batch_size,
+        seconds=timer.elapsed,
+        events_per_second=events / timer.elapsed,
+        duplicates=len(sent) - len(set(sent)),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--dispatchers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument(
+        "--sink-latency",
+        type=float,
+        default=0.005,
+        help="seconds the stub sink spends on every batch",
+    )
+    args = parser.parse_args()
+    with benchmark_database():
+        run(args.events, args.dispatchers, args.batch_size, args.sink_latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Overdue report over a seeded dataset against a stub Telegram sink.
+
+    python -m benchmarks.overdue_report --borrowings 100000 --compare
+"""
+import argparse
+import asyncio
+import tracemalloc
+from datetime import date, timedelta
+
+from benchmarks.utils import (
+    QueryCounter,
+    Timer,
+    benchmark_database,
+    report,
+    seed_borrowings,
+)
+from django.conf import settings
+
+from borrowings import overdue
+from borrowings.models import Borrowing
+from borrowings.telegram_notifications import RateLimiter
+
+
+async def stub_sink(messages: list[str]) -> list:
+    # rate limiting is part of the real sink; time it without the sleeps
+    limiter = RateLimiter(rate=float("inf"))
+    for _ in messages:
+        await limiter.wait()
+    return [None] * len(messages)
+
+
+def legacy_report(due_date: date) -> int:
+    """The pre-rewrite loop: lazy book/user lookups and a loop per message"""
+    async def send(message: str) -> None:
+        pass
+
+    sent = 0
+    for borrowing in Borrowing.objects.filter(
+        expected_return_date__lte=due_date
+    ).filter(actual_return_date=None):
+        asyncio.run(send(
+            f"Borrowing of {borrowing.book} "
+            f"is overdue by user {borrowing.user}. "
+            f"Expected return date - {borrowing.expected_return_date}"
+        ))
+        sent += 1
+    return sent
+
+
+def run(
+        borrowings: int,
+        digest_size: int,
+        max_messages: int,
+        compare: bool,
+) -> None:
+    seed_borrowings(borrowings)
+    due_date = date.today() + timedelta(days=1)
+
+    tracemalloc.start()
+    with Timer() as timer, QueryCounter() as queries:
+        messages = overdue.overdue_report(
+            due_date, digest_size, max_messages
+        )
+        asyncio.run(stub_sink(messages))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report(
+        "overdue report",
+        borrowings=borrowings,
+        digest_size=digest_size,
+        max_messages=max_messages,
+        messages=len(messages),
+        queries=queries.count,
+        seconds=timer.elapsed,
+        rows_per_second=borrowings / timer.elapsed,
+        peak_memory_mb=peak / 2 ** 20,
+    )
+
+    if compare:
+        with Timer() as timer, QueryCounter() as queries:
+            sent = legacy_report(due_date)
+        report(
+            "legacy overdue report",
+            messages=sent,
+            queries=queries.count,
+            seconds=timer.elapsed,
+            rows_per_second=borrowings / timer.elapsed,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--borrowings", type=int, default=100000)
+    parser.add_argument("--digest-size", type=int, default=40)
+    parser.add_argument(
+        "--max-messages", type=int, default=settings.OVERDUE_MAX_MESSAGES
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="also time the previous row-by-row implementation",
+    )
+    args = parser.parse_args()
+    with benchmark_database():
+        run(
+            args.borrowings, args.digest_size, args.max_messages, args.compare
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Borrowing list serialization per 10k rows, full against sparse fieldsets.
+
+    python -m benchmarks.serialization --rows 10000
+"""
+import argparse
+
+from benchmarks.utils import Timer, benchmark_database, report, seed_borrowings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from borrowings.models import Borrowing
+from borrowings.serializers import BorrowingListSerializer
+from borrowings.views import BorrowingViewSet
+from user.models import User
+
+CASES = {
+    "full rows": {},
+    "ids and dates": {"fields": "id,borrow_date,expected_return_date"},
+    "dates and book title": {
+        "fields": "id,expected_return_date,book.title",
+    },
+    "expanded user email": {"fields": "id,user.email", "expand": "user"},
+}
+
+
+def measure(params: dict[str, str], rounds: int) -> tuple[float, float]:
+    request = Request(APIRequestFactory().get("/", params))
+    request.user = User.objects.filter(is_staff=True).get()
+    view = BorrowingViewSet(
+        request=request, action="list", kwargs={}, format_kwarg=None
+    )
+    queryset = view.get_queryset()
+
+    fetch = serialize = 0.0
+    for _ in range(rounds):
+        with Timer() as timer:
+            rows = list(queryset.all())
+        fetch += timer.elapsed
+        with Timer() as timer:
+            BorrowingListSerializer(
+                rows, many=True, context={"request": request}
+            ).data
+        serialize += timer.elapsed
+    return fetch / rounds, serialize / rounds
+
+
+def run(rows: int, rounds: int) -> None:
+    seed_borrowings(rows, books=1000, users=1000)
+    User.objects.filter(pk=User.objects.order_by("pk")[0].pk).update(
+        is_staff=True
+    )
+    assert Borrowing.objects.count() == rows
+    for name, params in CASES.items():
+        fetch, serialize = measure(params, rounds)
+        report(
+            name,
+            rows=rows,
+            query_ms=fetch * 1000,
+            serialize_ms=serialize * 1000,
+            serialize_ms_per_10k=serialize * 1000 * 10000 / rows,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    with benchmark_database():
+        run(args.rows, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
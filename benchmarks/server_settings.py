@@ -0,0 +1,5 @@
+"""Settings of the servers benchmarks.serving starts, as in production"""
+from rest_practice.settings import *  # noqa: F401, F403
+
+DEBUG = False
+ALLOWED_HOSTS = ["127.0.0.1"]
@@ -0,0 +1,251 @@
+"""
+Requests per second and server memory per concurrent connection of the
+sync WSGI stack against ASGI with the async read views, and without
+them, each served by gunicorn with the same number of workers, on a
+seeded library in a throwaway test database. The load is the hot
+reads: book list and detail, the reader's borrowings and /api/user/me/.
+
+    python -m benchmarks.serving --concurrency 1 16 64 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+from benchmarks.utils import benchmark_database, percentile, report
+from django.db import connection
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from borrowings import seeding
+from user.models import User
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+UVICORN_WORKER = "uvicorn.workers.UvicornWorker"
+# stack: application, gunicorn worker class, ASYNC_VIEWS
+STACKS = {
+    "wsgi": ("rest_practice.wsgi:application", "sync", "0"),
+    "asgi": ("rest_practice.asgi:application", UVICORN_WORKER, "1"),
+    # the server without the async views, to tell the two apart
+    "asgi-sync-views": ("rest_practice.asgi:application", UVICORN_WORKER, "0"),
+}
+# operation: share of the requests
+WORKLOAD = {
+    "book_list": 35,
+    "book_detail": 35,
+    "borrowings": 15,
+    "me": 15,
+}
+
+
+def tree_rss(pid: int) -> int:
+    """Resident memory of a process and all its descendants, in bytes"""
+    parents = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        parents[int(stat.parent.name)] = int(fields[1])
+
+    tree, frontier = {pid}, [pid]
+    while frontier:
+        parent = frontier.pop()
+        children = [
+            child for child, ppid in parents.items() if ppid == parent
+        ]
+        tree.update(children)
+        frontier.extend(children)
+
+    rss = 0
+    for member in tree:
+        try:
+            status = Path(f"/proc/{member}/status").read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith("VmRSS:"):
+                rss += int(line.split()[1]) * 1024
+    return rss
+
+
+def start_server(
+        stack: str,
+        port: int,
+        workers: int,
+        environment: Optional[dict[str, str]] = None,
+) -> subprocess.Popen:
+    application, worker_class, async_views = STACKS[stack]
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "benchmarks.server_settings",
+        "POSTGRES_DB": connection.settings_dict["NAME"],
+        "ASYNC_VIEWS": async_views,
+        **(environment or {}),
+    }
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn", application,
+            "--worker-class", worker_class,
+            "--workers", str(workers),
+            "--bind", f"127.0.0.1:{port}",
+            "--log-level", "warning",
+        ],
+        cwd=BASE_DIR,
+        env=env,
+    )
+
+
+def wait_until_ready(base_url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/books/").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"the server at {base_url} did not come up")
+
+
+def request_url(
+        rng: random.Random,
+        book_ids: list[int],
+        workload: dict[str, int] = WORKLOAD,
+) -> str:
+    names, shares = zip(*workload.items())
+    name = rng.choices(names, weights=shares)[0]
+    if name == "book_detail":
+        return f"/api/books/{rng.choice(book_ids)}/"
+    return {
+        "book_list": "/api/books/",
+        "borrowings": "/api/borrowings/",
+        "me": "/api/user/me/",
+    }[name]
+
+
+async def load(
+        base_url: str,
+        tokens: list[str],
+        book_ids: list[int],
+        concurrency: int,
+        duration: float,
+        pid: int,
+        seed: int,
+        workload: dict[str, int] = WORKLOAD,
+) -> dict[str, Any]:
+    """``concurrency`` clients, each sending its next request on reply"""
+    latencies, errors, peak_rss = [], 0, 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        async def reader(number: int) -> None:
+            nonlocal errors
+            rng = random.Random(seed + number)
+            headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+            while time.monotonic() < deadline:
+                url = request_url(rng, book_ids, workload)
+                started = time.perf_counter()
+                try:
+                    response = await client.get(url, headers=headers)
+                except httpx.TransportError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code >= 400
+
+        async def sample_memory() -> None:
+            nonlocal peak_rss
+            while time.monotonic() < deadline:
+                peak_rss = max(peak_rss, tree_rss(pid))
+                await asyncio.sleep(0.1)
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            sample_memory(), *(reader(i) for i in range(concurrency))
+        )
+        elapsed = time.perf_counter() - started
+
+    latencies = [latency * 1000 for latency in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "peak_rss": peak_rss,
+    }
+
+
+def run(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    book_ids = seeding.seed_books(rng, args.books)
+    user_ids = seeding.seed_users(rng, args.users, "library12345")
+    seeding.seed_borrowings(rng, args.borrowings, book_ids, user_ids, 365)
+    tokens = [
+        str(RefreshToken.for_user(user).access_token)
+        for user in User.objects.filter(pk__in=rng.sample(user_ids, 50))
+    ]
+
+    for stack in args.stacks:
+        server = start_server(stack, args.port, args.workers)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            wait_until_ready(base_url)
+            # warm every worker up before the idle reading
+            asyncio.run(load(
+                base_url, tokens, book_ids, args.workers, 2, server.pid,
+                args.seed,
+            ))
+            idle_rss = tree_rss(server.pid)
+            for concurrency in args.concurrency:
+                results = asyncio.run(load(
+                    base_url, tokens, book_ids, concurrency, args.duration,
+                    server.pid, args.seed,
+                ))
+                growth = max(results.pop("peak_rss") - idle_rss, 0)
+                report(
+                    f"{stack}, {args.workers} workers, "
+                    f"{concurrency} concurrent connections",
+                    **results,
+                    idle_rss_mb=idle_rss / 2 ** 20,
+                    mb_per_connection=growth / 2 ** 20 / concurrency,
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--stacks", nargs="+", choices=sorted(STACKS), default=list(STACKS)
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 16, 64]
+    )
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--borrowings", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
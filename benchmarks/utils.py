@@ -0,0 +1,130 @@
+import contextlib
+import os
+import time
+from typing import Iterator
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rest_practice.settings")
+django.setup()
+
+from django.db import connections  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+
+@contextlib.contextmanager
+def benchmark_database() -> Iterator[None]:
+    """Run the benchmark against a throwaway test database"""
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+class QueryCounter:
+    """Counts statements without keeping them, unlike CaptureQueriesContext"""
+
+    def __init__(self, alias: str = "default") -> None:
+        self.alias = alias
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self) -> "QueryCounter":
+        self._wrapper = connections[self.alias].execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._wrapper.__exit__(*exc_info)
+
+
+class Timer:
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.elapsed = time.perf_counter() - self.started
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(name: str, **metrics: float) -> None:
+    print(name)
+    for metric, value in metrics.items():
+        if isinstance(value, float):
+            value = f"{value:,.3f}"
+        print(f"  {metric:<24} {value}")
+
+
+def seed_borrowings(
+        borrowings: int,
+        books: int = 1000,
+        users: int = 1000,
+        overdue: float = 1.0,
+) -> None:
+    """Bulk insert a library where ``overdue`` of the loans are past due"""
+    from datetime import date, timedelta
+
+    from books.models import Book
+    from borrowings.models import Borrowing
+    from user.models import User
+
+    Book.objects.bulk_create(
+        (
+            Book(
+                title=f"Book {i}",
+                author=f"Author {i % 97}",
+                cover=Book.CoverChoices.HARD,
+                inventory=10,
+                daily_fee=1,
+            )
+            for i in range(books)
+        ),
+        batch_size=5000,
+    )
+    User.objects.bulk_create(
+        (
+            User(
+                email=f"user{i}@library.com",
+                first_name=f"First{i}",
+                last_name=f"Last{i}",
+                password="!",
+            )
+            for i in range(users)
+        ),
+        batch_size=5000,
+    )
+    book_ids = list(Book.objects.values_list("id", flat=True))
+    user_ids = list(User.objects.values_list("id", flat=True))
+    overdue_every = round(1 / overdue) if overdue else 0
+    today = date.today()
+    Borrowing.objects.bulk_create(
+        (
+            Borrowing(
+                book_id=book_ids[i % len(book_ids)],
+                user_id=user_ids[i % len(user_ids)],
+                expected_return_date=(
+                    today - timedelta(days=i % 30)
+                    if overdue_every and i % overdue_every == 0
+                    else today + timedelta(days=14)
+                ),
+            )
+            for i in range(borrowings)
+        ),
+        batch_size=5000,
+    )
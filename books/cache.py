@@ -0,0 +1,27 @@
+from functools import partial
+from typing import Any, Optional
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from books.models import Book
+from rest_practice.caching import invalidate
+
+BOOK_CACHE_NAMESPACE = "books"
+
+
+def invalidate_book(book_id: Optional[int] = None) -> None:
+    """
+    Drops cached book lists and the book's detail, or every detail when
+    ``book_id`` is None. Done again on commit: a read between the two
+    could have cached the state the writer had not committed yet.
+    """
+    invalidate(BOOK_CACHE_NAMESPACE, book_id)
+    transaction.on_commit(partial(invalidate, BOOK_CACHE_NAMESPACE, book_id))
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def book_changed(sender: type[Book], instance: Book, **kwargs: Any) -> None:
+    invalidate_book(instance.pk)
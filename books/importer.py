@@ -0,0 +1,133 @@
+import codecs
+import csv
+import json
+from typing import Any, BinaryIO, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db import reset_queries, transaction
+from rest_framework import serializers
+
+from books.cache import invalidate_book
+from books.models import Book
+from books.serializers import BookSerializer
+
+Row = tuple[int, Any]  # line number and the parsed row
+
+
+class BookImportSerializer(BookSerializer):
+    """Book field rules without the per-row title lookup: titles upsert"""
+
+    class Meta(BookSerializer.Meta):
+        fields = ("title", "author", "cover", "inventory", "daily_fee")
+        extra_kwargs = {"title": {"validators": []}}
+
+
+class UnreadableInput(ValueError):
+    """The input cannot be read on from a line: bad encoding or CSV syntax"""
+
+    def __init__(self, line: int, reason: str) -> None:
+        super().__init__(f"Line {line}: {reason}")
+        self.line = line
+        self.reason = reason
+
+
+def decode_lines(binary: BinaryIO) -> Iterator[str]:
+    """
+    Decodes a binary file line by line, so an encoding error surfaces at
+    the line it is on rather than somewhere in a block read ahead
+    """
+    for number, raw in enumerate(binary):
+        if number == 0:
+            raw = raw.removeprefix(codecs.BOM_UTF8)
+        yield raw.decode()
+
+
+def read_csv(stream: Iterable[str]) -> Iterator[Row]:
+    reader = csv.DictReader(stream)
+    try:
+        for row in reader:
+            yield reader.line_num, row
+    except UnicodeDecodeError as exc:
+        raise UnreadableInput(reader.line_num + 1, "not UTF-8") from exc
+    except csv.Error as exc:
+        raise UnreadableInput(reader.line_num, str(exc)) from exc
+
+
+def read_jsonl(stream: Iterable[str]) -> Iterator[Row]:
+    line = 0
+    try:
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except ValueError:
+                # left to the serializer to reject as "expected a dictionary"
+                yield line, text
+    except UnicodeDecodeError as exc:
+        raise UnreadableInput(line + 1, "not UTF-8") from exc
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl, "ndjson": read_jsonl}
+
+
+def validate_batch(
+        rows: list[Row],
+        serializer: serializers.Serializer,
+) -> tuple[dict[str, dict], list[tuple[int, Any]]]:
+    """Valid rows keyed by title, the last one winning, and the errors"""
+    books, errors = {}, []
+    for line, row in rows:
+        try:
+            data = serializer.run_validation(row)
+        except serializers.ValidationError as exc:
+            errors.append((line, exc.detail))
+        else:
+            books[data["title"]] = data
+    return books, errors
+
+
+def write_batch(books: list[dict]) -> int:
+    if not books:
+        return 0
+    with transaction.atomic():
+        # updated_at is filled by auto_now on insert, and taken from the
+        # would-be insert on conflict
+        Book.objects.bulk_create(
+            [Book(**data) for data in books],
+            update_conflicts=True,
+            unique_fields=["title"],
+            update_fields=[
+                "author", "cover", "inventory", "daily_fee", "updated_at"
+            ],
+        )
+        invalidate_book()
+    return len(books)
+
+
+def import_books(
+        rows: Iterable[Row],
+        batch_size: Optional[int] = None,
+) -> Iterator[tuple[int, list[tuple[int, Any]]]]:
+    """
+    Validates (line, row) pairs against the Book field rules and upserts
+    them by title, one batch at a time, so memory stays flat however
+    long the input is. Yields the number of books written and the
+    (line, errors) of the rejected rows for every batch.
+    """
+    batch_size = batch_size or settings.BOOK_IMPORT_BATCH_SIZE
+    # one serializer for all rows: its fields are only built once
+    serializer = BookImportSerializer()
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            books, errors = validate_batch(batch, serializer)
+            yield write_batch(list(books.values())), errors
+            # with DEBUG on, the statement log would keep every multi-row
+            # INSERT and grow with the input
+            reset_queries()
+            batch = []
+    if batch:
+        books, errors = validate_batch(batch, serializer)
+        yield write_batch(list(books.values())), errors
@@ -0,0 +1,79 @@
+from typing import Optional
+
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from books.cache import invalidate_book
+from books.models import Book
+from books.serializers import MAX_INVENTORY
+
+# a delta is applied to the stock as it is when the row is locked, so it
+# composes with concurrent checkouts; setting an absolute inventory
+# overwrites whatever they did in the meantime
+ADJUST_INVENTORY = """
+UPDATE {table} AS book
+SET inventory = CASE
+        WHEN item.delta IS NULL THEN item.inventory
+        ELSE book.inventory + item.delta
+    END,
+    updated_at = %s
+FROM (VALUES {values}) AS item (id, delta, inventory)
+WHERE book.id = item.id
+    AND (
+        item.delta IS NULL
+        -- in bigint, as the sum can overflow the integer column
+        OR book.inventory::bigint + item.delta BETWEEN 0 AND %s
+    )
+RETURNING book.id, book.inventory
+"""
+
+
+def adjust_inventory(
+        items: list[tuple[int, Optional[int], Optional[int]]],
+) -> dict[int, int]:
+    """
+    Applies (id, delta, inventory) items, one of delta and inventory set,
+    in a single UPDATE ... FROM (VALUES ...) and returns the new stock
+    by book id. All or nothing: unknown books or stock that would go
+    negative or past MAX_INVENTORY reject the whole request.
+    """
+    values = ", ".join(["(%s::bigint, %s::integer, %s::integer)"] * len(items))
+    sql = ADJUST_INVENTORY.format(
+        table=connection.ops.quote_name(Book._meta.db_table), values=values
+    )
+    params = [timezone.now()]
+    for item in sorted(items, key=lambda item: item[0]):
+        params.extend(item)
+    params.append(MAX_INVENTORY)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            stock = dict(cursor.fetchall())
+        if len(stock) < len(items):
+            transaction.set_rollback(True)
+        else:
+            invalidate_book()
+
+    if len(stock) < len(items):
+        deltas = {
+            book_id: delta for book_id, delta, _ in items
+            if book_id not in stock
+        }
+        existing = dict(
+            Book.objects.filter(pk__in=deltas).values_list("pk", "inventory")
+        )
+        raise ValidationError({
+            str(book_id): rejection(existing.get(book_id), delta)
+            for book_id, delta in deltas.items()
+        })
+    return stock
+
+
+def rejection(inventory: Optional[int], delta: Optional[int]) -> str:
+    if inventory is None:
+        return "Book does not exist"
+    if delta is not None and inventory + delta > MAX_INVENTORY:
+        return f"Inventory cannot exceed {MAX_INVENTORY}"
+    return "Inventory cannot become negative"
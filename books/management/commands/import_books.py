@@ -0,0 +1,79 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+
+from books.importer import (
+    READERS,
+    UnreadableInput,
+    decode_lines,
+    import_books,
+)
+
+
+class Command(BaseCommand):
+    """
+    Django command to import books from a CSV file with a header row or
+    from JSON Lines, updating the books whose titles already exist
+    """
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("path", help="input file, or - for stdin")
+        parser.add_argument(
+            "--format",
+            choices=sorted(READERS),
+            help="input format, guessed from the file extension by default",
+        )
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument(
+            "--errors",
+            help="write rejected rows as JSON Lines to this file "
+                 "instead of stderr",
+        )
+
+    def handle(self, *args, **options) -> None:
+        path = options["path"]
+        input_format = options["format"] or Path(path).suffix.lstrip(".")
+        if input_format not in READERS:
+            raise CommandError(
+                "Cannot guess the input format, pass --format"
+            )
+
+        stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+        errors = (
+            open(options["errors"], "w") if options["errors"]
+            else self.stderr
+        )
+        imported = rejected = 0
+        started = time.perf_counter()
+        try:
+            for written, batch_errors in import_books(
+                READERS[input_format](decode_lines(stream)),
+                options["batch_size"],
+            ):
+                imported += written
+                rejected += len(batch_errors)
+                for line, detail in batch_errors:
+                    errors.write(
+                        json.dumps({"line": line, "errors": detail}) + "\n"
+                    )
+                rate = imported / (time.perf_counter() - started)
+                self.stdout.write(
+                    f"Imported {imported} books, rejected {rejected} rows "
+                    f"({rate:.0f} books/s)"
+                )
+        except UnreadableInput as exc:
+            raise CommandError(
+                f"{exc}, {imported} books imported before it"
+            )
+        finally:
+            if path != "-":
+                stream.close()
+            if errors is not self.stderr:
+                errors.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {imported} books imported, {rejected} rows rejected"
+        ))
@@ -0,0 +1,67 @@
+# Generated by Django 4.1.7 on 2026-10-17 19:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# The list validators count the write statements each table has seen.
+# Every statement appends a row to table_changes, an insert that takes
+# no lock other writers wait for; a row becomes visible when its
+# transaction commits, so a write committing late still changes the
+# count readers see, whatever the clocks of the servers say.
+# compact_table_changes() folds the log into table_versions, keeping
+# the sums.
+TABLE_VERSIONS = """
+CREATE TABLE table_versions (
+    table_name text PRIMARY KEY,
+    version bigint NOT NULL,
+    changed_at timestamptz NOT NULL
+);
+
+CREATE TABLE table_changes (
+    id bigserial PRIMARY KEY,
+    table_name text NOT NULL,
+    changed_at timestamptz NOT NULL DEFAULT clock_timestamp()
+);
+CREATE INDEX table_changes_table_name_idx ON table_changes (table_name);
+
+CREATE FUNCTION record_table_change() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_changes (table_name) VALUES (TG_TABLE_NAME);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+INSERT INTO table_versions VALUES ('books_book', 0, now());
+
+CREATE TRIGGER books_book_change_trigger
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON books_book
+FOR EACH STATEMENT EXECUTE FUNCTION record_table_change();
+"""
+
+DROP_TABLE_VERSIONS = """
+DROP TRIGGER books_book_change_trigger ON books_book;
+DROP FUNCTION record_table_change();
+DROP TABLE table_changes;
+DROP TABLE table_versions;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0002_book_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                db_index=True,
+                default=django.utils.timezone.now,
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(TABLE_VERSIONS, DROP_TABLE_VERSIONS),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 
@@ -12,9 +14,16 @@ class Book(models.Model):
     cover = models.CharField(max_length=50, choices=CoverChoices.choices)
     inventory = models.PositiveIntegerField()
     daily_fee = models.DecimalField(max_digits=7, decimal_places=2)
+    # maintained by a database trigger from title and author
+    search_vector = SearchVectorField(null=True, editable=False)
+    # version stamp for conditional GET; bulk update() calls set it too
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self) -> str:
         return self.title
 
     class Meta:
         ordering = ["title"]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="book_search_vector_idx"),
+        ]
@@ -0,0 +1,59 @@
+import functools
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import connection
+from django.db.models import F, FloatField, Q, QuerySet, Value
+from django.db.models.functions import Cast, Greatest
+
+SEARCH_CONFIG = "english"
+
+
+@functools.lru_cache(maxsize=None)
+def trigram_available() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def search_books(queryset: QuerySet, text: str) -> QuerySet:
+    """
+    Rank books by full-text match on title and author, treating the
+    last word as a prefix so partially typed input matches. When
+    pg_trgm is installed, titles and authors within trigram distance
+    also match, which covers typos the stemmer cannot.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return queryset.none()
+
+    words[-1] += ":*"
+    query = SearchQuery(
+        " & ".join(words),
+        config=SEARCH_CONFIG,
+        search_type="raw",
+    )
+    matches = Q(search_vector=query)
+    similarity = Value(0.0)
+    if trigram_available():
+        matches |= Q(title__trigram_similar=text)
+        matches |= Q(author__trigram_similar=text)
+        similarity = Greatest(
+            TrigramSimilarity("title", text),
+            TrigramSimilarity("author", text),
+        )
+
+    # both are float4, which loses digits on the way through the JSON
+    # pagination cursor; as float8 a cursor value compares equal again
+    return (
+        queryset.annotate(
+            rank=Cast(SearchRank(F("search_vector"), query), FloatField()),
+            similarity=Cast(similarity, FloatField()),
+        )
+        .filter(matches)
+        .order_by("-rank", "-similarity", "id")
+    )
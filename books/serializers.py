@@ -1,9 +1,48 @@
 from rest_framework import serializers
 from books.models import Book
+from rest_practice.sparse import SparseFieldsetMixin
 
+MAX_INVENTORY = 2 ** 31 - 1  # the column is a 32-bit integer
 
-class BookSerializer(serializers.ModelSerializer):
+
+class BookSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Book
         fields = ("id", "title", "author", "cover", "inventory", "daily_fee")
+
+
+class BookImportFileSerializer(serializers.Serializer):
+    catalog = serializers.FileField(
+        help_text="CSV with a header row (.csv) or JSON Lines (.jsonl)"
+    )
+
+
+class BookInventoryListSerializer(serializers.ListSerializer):
+    def validate(self, attrs: list[dict]) -> list[dict]:
+        ids = [item["id"] for item in attrs]
+        if len(set(ids)) < len(ids):
+            raise serializers.ValidationError(
+                "Each book can be listed only once"
+            )
+        return attrs
+
+
+class BookInventorySerializer(serializers.Serializer):
+    id = serializers.IntegerField(min_value=1)  # noqa: VNE003
+    delta = serializers.IntegerField(
+        required=False, min_value=-MAX_INVENTORY, max_value=MAX_INVENTORY
+    )
+    inventory = serializers.IntegerField(
+        required=False, min_value=0, max_value=MAX_INVENTORY
+    )
+
+    class Meta:
+        list_serializer_class = BookInventoryListSerializer
+
+    def validate(self, attrs: dict) -> dict:
+        if ("delta" in attrs) == ("inventory" in attrs):
+            raise serializers.ValidationError(
+                "Pass either a delta or an absolute inventory"
+            )
+        return attrs
@@ -1,11 +1,30 @@
+import io
+import json
+import os
+import tempfile
+import datetime
+import threading
+import time
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from books.models import Book
+from books.search import trigram_available
 from books.serializers import BookSerializer
+from rest_practice.caching import cache_stats
+from rest_practice.conditional import compact_table_changes
+from rest_practice.pagination import KeysetPagination
 
 BOOK_URL = reverse("books:book-list")
 
@@ -39,7 +58,7 @@ class NotAdminBookApiTests(TestCase):
         serializer = BookSerializer(books, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_create_book_not_allowed(self) -> None:
         payload = {
@@ -69,6 +88,392 @@ class NotAdminBookApiTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class BookSparseFieldsetTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.book = sample_book()
+
+    def test_only_requested_columns_are_loaded(self) -> None:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(BOOK_URL, {"fields": "id,title"})
+
+        self.assertEqual(
+            response.data["results"],
+            [{"id": self.book.id, "title": self.book.title}],
+        )
+        self.assertNotIn("daily_fee", queries.captured_queries[-1]["sql"])
+
+    def test_detail_fields(self) -> None:
+        response = self.client.get(
+            detail_url(self.book.id), {"fields": "inventory"}
+        )
+
+        self.assertEqual(response.data, {"inventory": self.book.inventory})
+
+    def test_unknown_field(self) -> None:
+        response = self.client.get(BOOK_URL, {"fields": "id,price"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BookPaginationTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        for i in range(7):
+            sample_book(title=f"Book {i}")
+
+    def test_pages_follow_title_ordering(self) -> None:
+        titles, url = [], BOOK_URL + "?page_size=3"
+        while url:
+            response = self.client.get(url)
+            titles += [book["title"] for book in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(titles, [f"Book {i}" for i in range(7)])
+
+    def test_previous_link_returns_previous_page(self) -> None:
+        first = self.client.get(BOOK_URL, {"page_size": 3})
+        second = self.client.get(first.data["next"])
+        previous = self.client.get(second.data["previous"])
+
+        self.assertIsNone(first.data["previous"])
+        self.assertEqual(previous.data["results"], first.data["results"])
+        self.assertIsNotNone(previous.data["next"])
+
+    def test_page_size_is_capped(self) -> None:
+        for i in range(7, KeysetPagination.max_page_size + 5):
+            sample_book(title=f"Book {i}")
+
+        response = self.client.get(BOOK_URL, {"page_size": 10 ** 6})
+
+        self.assertEqual(
+            len(response.data["results"]), KeysetPagination.max_page_size
+        )
+
+    def test_deep_page_costs_the_same_as_first(self) -> None:
+        url = BOOK_URL + "?page_size=2"
+        # the page itself plus the conditional GET version stamp
+        with self.assertNumQueries(2):
+            url = self.client.get(url).data["next"]
+        with self.assertNumQueries(2):
+            url = self.client.get(url).data["next"]
+
+    def test_invalid_cursor(self) -> None:
+        response = self.client.get(BOOK_URL, {"cursor": "garbage"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BookSearchTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        sample_book(title="War and Peace", author="Leo Tolstoy")
+        sample_book(title="Anna Karenina", author="Leo Tolstoy")
+        sample_book(title="The Art of War", author="Sun Tzu")
+        sample_book(title="Peace Talks", author="Jim Butcher")
+
+    def search(self, text: str) -> list[str]:
+        response = self.client.get(BOOK_URL, {"q": text})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book["title"] for book in response.data["results"]]
+
+    def test_search_by_title_and_author(self) -> None:
+        self.assertEqual(
+            set(self.search("tolstoy")), {"War and Peace", "Anna Karenina"}
+        )
+        self.assertEqual(self.search("war peace"), ["War and Peace"])
+
+    def test_search_ranks_title_matches_first(self) -> None:
+        sample_book(title="Collected Essays", author="Peace Corps")
+
+        self.assertEqual(self.search("peace")[-1], "Collected Essays")
+
+    def test_search_matches_word_prefixes(self) -> None:
+        self.assertEqual(self.search("karen"), ["Anna Karenina"])
+
+    def test_search_ignores_punctuation_only_query(self) -> None:
+        self.assertEqual(self.search("&!:*"), [])
+
+    def test_search_vector_follows_updates(self) -> None:
+        book = Book.objects.get(title="Peace Talks")
+        book.title = "Skin Game"
+        book.save()
+
+        self.assertEqual(self.search("skin"), ["Skin Game"])
+
+    def test_ranked_pages_return_every_match_once(self) -> None:
+        # titles of the same shape tie on rank
+        for i in range(40):
+            sample_book(title=f"War Story {i}", author=f"Author {i}")
+
+        ids, url = [], BOOK_URL + "?q=war&page_size=3"
+        while url:
+            response = self.client.get(url)
+            ids += [book["id"] for book in response.data["results"]]
+            url = response.data["next"]
+            self.assertLessEqual(len(ids), 50)
+
+        expected = Book.objects.filter(title__icontains="war")
+        self.assertEqual(sorted(ids), sorted(book.id for book in expected))
+
+    def test_search_tolerates_typos(self) -> None:
+        if not trigram_available():
+            self.skipTest("pg_trgm extension is not installed")
+        self.assertIn("Anna Karenina", self.search("Ana Karenena"))
+
+
+class BookConditionalGetTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.book = sample_book()
+
+    def test_unchanged_list_is_not_modified(self) -> None:
+        response = self.client.get(BOOK_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", response)
+
+        # the version stamp comes from the response cache
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                BOOK_URL, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn("ETag", response)
+
+    def test_unchanged_detail_is_not_modified(self) -> None:
+        url = detail_url(self.book.id)
+        response = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+
+        self.assertEqual(
+            not_modified.status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_same_second_write_is_modified_since(self) -> None:
+        url = detail_url(self.book.id)
+        last_modified = self.client.get(url)["Last-Modified"]
+
+        self.book.inventory = 5
+        self.book.save()
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["inventory"], 5)
+        self.assertEqual(response["Last-Modified"], last_modified)
+
+    def test_update_changes_etag(self) -> None:
+        url = detail_url(self.book.id)
+        etag = self.client.get(url)["ETag"]
+        list_etag = self.client.get(BOOK_URL)["ETag"]
+
+        self.book.inventory = 5
+        self.book.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["inventory"], 5)
+        self.assertNotEqual(response["ETag"], etag)
+        response = self.client.get(BOOK_URL, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_changes_list_etag(self) -> None:
+        sample_book(title="Newer book")
+        etag = self.client.get(BOOK_URL)["ETag"]
+
+        # the deleted row is not the newest one, so only the table
+        # version can move the stamp
+        self.book.delete()
+
+        response = self.client.get(BOOK_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_etag_depends_on_query(self) -> None:
+        etag = self.client.get(BOOK_URL)["ETag"]
+
+        response = self.client.get(
+            BOOK_URL, {"q": "sample"}, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_missing_book_not_found(self) -> None:
+        response = self.client.get(detail_url(self.book.id + 1))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("ETag", response)
+
+
+class BookTableVersionTests(TransactionTestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.book = sample_book()
+
+    def list_etag(self) -> str:
+        cache.clear()
+        return self.client.get(BOOK_URL)["ETag"]
+
+    def assert_list_changed(self, etag: str) -> None:
+        cache.clear()
+        response = self.client.get(BOOK_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_behind_a_clock_ahead_changes_etag(self) -> None:
+        newer = sample_book(title="Newer book")
+        # written by an app server whose clock runs a day ahead
+        Book.objects.filter(pk=newer.pk).update(
+            updated_at=timezone.now() + datetime.timedelta(days=1)
+        )
+        etag = self.list_etag()
+
+        self.book.delete()
+
+        self.assert_list_changed(etag)
+
+    def test_late_commit_changes_etag(self) -> None:
+        written = threading.Event()
+        commit = threading.Event()
+
+        def write_late() -> None:
+            try:
+                with transaction.atomic():
+                    sample_book(title="Late book")
+                    written.set()
+                    commit.wait(10)
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=write_late)
+        writer.start()
+        self.assertTrue(written.wait(10))
+        # committed first, with the newer updated_at
+        sample_book(title="Early book")
+        etag = self.list_etag()
+
+        commit.set()
+        writer.join()
+
+        self.assert_list_changed(etag)
+
+    def test_compaction_keeps_etag(self) -> None:
+        sample_book(title="Another book")
+        etag = self.list_etag()
+
+        self.assertGreater(compact_table_changes(), 0)
+
+        cache.clear()
+        response = self.client.get(BOOK_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.book.delete()
+        self.assert_list_changed(etag)
+
+
+class BookCacheTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.book = sample_book()
+
+    def test_repeated_reads_are_served_from_cache(self) -> None:
+        hits = cache_stats()["hits"]
+        for url in (BOOK_URL, detail_url(self.book.id)):
+            response = self.client.get(url)
+            with self.assertNumQueries(0):
+                cached = self.client.get(url)
+
+            self.assertEqual(cached.status_code, status.HTTP_200_OK)
+            self.assertEqual(cached.data, response.data)
+        self.assertEqual(cache_stats()["hits"] - hits, 2)
+
+    def test_cache_is_keyed_by_query(self) -> None:
+        sample_book(title="Another book")
+        self.client.get(BOOK_URL)
+
+        response = self.client.get(BOOK_URL, {"page_size": 1})
+
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_save_invalidates_list_and_detail(self) -> None:
+        url = detail_url(self.book.id)
+        self.client.get(BOOK_URL)
+        self.client.get(url)
+
+        self.book.inventory = 3
+        self.book.save()
+
+        self.assertEqual(self.client.get(url).data["inventory"], 3)
+        self.assertEqual(
+            self.client.get(BOOK_URL).data["results"][0]["inventory"], 3
+        )
+
+    def test_delete_invalidates_list_and_detail(self) -> None:
+        url = detail_url(self.book.id)
+        self.client.get(BOOK_URL)
+        self.client.get(url)
+
+        self.book.delete()
+
+        self.assertEqual(
+            self.client.get(url).status_code, status.HTTP_404_NOT_FOUND
+        )
+        self.assertEqual(self.client.get(BOOK_URL).data["results"], [])
+
+    def test_other_books_keep_detail_cached(self) -> None:
+        url = detail_url(self.book.id)
+        self.client.get(url)
+
+        sample_book(title="Another book")
+
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+
+class ConcurrentBookCacheTests(TransactionTestCase):
+    READERS = 8
+
+    def read(self, barrier: threading.Barrier, results: list) -> None:
+        client = APIClient(raise_request_exception=False)
+        barrier.wait()
+        try:
+            results.append(client.get(BOOK_URL).status_code)
+        finally:
+            connection.close()
+
+    def test_concurrent_misses_rebuild_once(self) -> None:
+        cache.clear()
+        sample_book()
+        barrier = threading.Barrier(self.READERS)
+        results = []
+        threads = [
+            threading.Thread(target=self.read, args=(barrier, results))
+            for _ in range(self.READERS)
+        ]
+        to_representation = BookSerializer.to_representation
+
+        def slow_to_representation(serializer, instance):
+            time.sleep(0.2)
+            return to_representation(serializer, instance)
+
+        before = cache_stats()
+        with mock.patch.object(
+            BookSerializer, "to_representation", slow_to_representation
+        ):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        after = cache_stats()
+
+        self.assertEqual(results, [status.HTTP_200_OK] * self.READERS)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], self.READERS - 1)
+
+
 class AuthenticatedBookApiTests(TestCase):
     def setUp(self) -> None:
         self.client = APIClient()
@@ -86,7 +491,7 @@ class AuthenticatedBookApiTests(TestCase):
         serializer = BookSerializer(books, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_create_book_not_allowed(self) -> None:
         payload = {
@@ -161,3 +566,243 @@ class AdminBookApiTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Book.objects.count(), 0)
+
+
+CSV_CATALOG = (
+    "title,author,cover,inventory,daily_fee\n"
+    "Sample book,New author,SOFT,3,2.50\n"
+    "Dune,Frank Herbert,HARD,5,1.00\n"
+    "Broken,Nobody,PAPER,-1,1.00\n"
+    "Dune,Frank Herbert,HARD,7,1.00\n"
+)
+
+
+class BookImportTests(TestCase):
+    def setUp(self) -> None:
+        self.book = sample_book()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name: str, content: str) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as file_:
+            file_.write(content)
+        return path
+
+    def test_import_csv_upserts_by_title(self) -> None:
+        errors = os.path.join(self.directory.name, "errors.jsonl")
+        stdout = io.StringIO()
+        call_command(
+            "import_books",
+            self.write("books.csv", CSV_CATALOG),
+            errors=errors,
+            batch_size=2,
+            stdout=stdout,
+        )
+        self.book.refresh_from_db()
+
+        self.assertEqual(Book.objects.count(), 2)
+        self.assertEqual(self.book.author, "New author")
+        self.assertEqual(self.book.inventory, 3)
+        # the later duplicate of a title wins
+        self.assertEqual(Book.objects.get(title="Dune").inventory, 7)
+        with open(errors) as file_:
+            report = [json.loads(line) for line in file_]
+        self.assertEqual([error["line"] for error in report], [4])
+        self.assertEqual(
+            set(report[0]["errors"]), {"cover", "inventory"}
+        )
+        self.assertIn("Imported 2 books, rejected 0 rows", stdout.getvalue())
+
+    def test_import_jsonl_reports_malformed_lines(self) -> None:
+        path = self.write(
+            "books.jsonl",
+            '{"title": "Dune", "author": "Frank Herbert", "cover": "HARD",'
+            ' "inventory": 5, "daily_fee": "1.00"}\n'
+            "\n"
+            "{not json\n",
+        )
+        stderr = io.StringIO()
+        call_command(
+            "import_books", path, stdout=io.StringIO(), stderr=stderr
+        )
+
+        self.assertTrue(Book.objects.filter(title="Dune").exists())
+        self.assertEqual(json.loads(stderr.getvalue())["line"], 3)
+
+    def test_import_invalidates_cached_books(self) -> None:
+        client = APIClient()
+        client.get(BOOK_URL)
+        client.get(detail_url(self.book.id))
+
+        call_command(
+            "import_books",
+            self.write("books.csv", CSV_CATALOG),
+            stdout=io.StringIO(),
+            stderr=io.StringIO(),
+        )
+
+        self.assertEqual(len(client.get(BOOK_URL).data["results"]), 2)
+        self.assertEqual(
+            client.get(detail_url(self.book.id)).data["inventory"], 3
+        )
+
+    def test_import_endpoint(self) -> None:
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(
+            "admin@admin.com", "admin12345", is_staff=True
+        ))
+        catalog = SimpleUploadedFile("books.csv", CSV_CATALOG.encode())
+
+        response = client.post(
+            BOOK_URL + "import/", {"catalog": catalog}, format="multipart"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["imported"], 2)
+        self.assertEqual(response.data["rejected"], 1)
+        self.assertEqual(response.data["errors"][0]["line"], 4)
+
+    def test_import_endpoint_rejects_non_utf8_upload(self) -> None:
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(
+            "admin@admin.com", "admin12345", is_staff=True
+        ))
+        catalog = SimpleUploadedFile(
+            "books.csv",
+            (CSV_CATALOG + "Les Misérables,Victor Hugo,HARD,2,1.00\n")
+            .encode("latin-1"),
+        )
+
+        response = client.post(
+            BOOK_URL + "import/", {"catalog": catalog}, format="multipart"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Line 6: not UTF-8", response.data["catalog"])
+
+    def test_import_endpoint_rejects_unknown_format(self) -> None:
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(
+            "admin@admin.com", "admin12345", is_staff=True
+        ))
+        catalog = SimpleUploadedFile("books.xml", b"<books/>")
+
+        response = client.post(
+            BOOK_URL + "import/", {"catalog": catalog}, format="multipart"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_endpoint_admin_only(self) -> None:
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(
+            "test@test.com", "test12345"
+        ))
+        catalog = SimpleUploadedFile("books.csv", CSV_CATALOG.encode())
+
+        response = client.post(
+            BOOK_URL + "import/", {"catalog": catalog}, format="multipart"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Book.objects.count(), 1)
+
+
+class BookInventoryTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(
+            "admin@admin.com", "admin12345", is_staff=True
+        ))
+        self.first = sample_book(title="First", inventory=2)
+        self.second = sample_book(title="Second", inventory=5)
+
+    def adjust(self, items: list[dict]):
+        return self.client.post(
+            BOOK_URL + "inventory/", items, format="json"
+        )
+
+    def test_apply_deltas_and_absolute_stock(self) -> None:
+        # one UPDATE plus the savepoint pair around it
+        with self.assertNumQueries(3):
+            response = self.adjust([
+                {"id": self.second.id, "inventory": 1},
+                {"id": self.first.id, "delta": 10},
+            ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {"id": self.first.id, "inventory": 12},
+            {"id": self.second.id, "inventory": 1},
+        ])
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.inventory, 12)
+
+    def test_delta_composes_with_concurrent_changes(self) -> None:
+        # a checkout between reading the stock and restocking it
+        Book.objects.filter(pk=self.first.pk).update(inventory=1)
+
+        self.adjust([{"id": self.first.id, "delta": 3}])
+        self.first.refresh_from_db()
+
+        self.assertEqual(self.first.inventory, 4)
+
+    def test_negative_stock_rejects_whole_request(self) -> None:
+        response = self.adjust([
+            {"id": self.first.id, "delta": -3},
+            {"id": self.second.id, "delta": 1},
+            {"id": self.second.id + 100, "delta": 1},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {
+            str(self.first.id), str(self.second.id + 100)
+        })
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.inventory, 5)
+
+    def test_overflowing_stock_rejects_whole_request(self) -> None:
+        Book.objects.filter(pk=self.first.pk).update(inventory=2 ** 31 - 10)
+
+        response = self.adjust([
+            {"id": self.first.id, "delta": 10},
+            {"id": self.second.id, "delta": 1},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {
+            str(self.first.id): f"Inventory cannot exceed {2 ** 31 - 1}"
+        })
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.inventory, 2 ** 31 - 10)
+
+    def test_invalid_items(self) -> None:
+        for items in (
+            [],
+            [{"id": self.first.id}],
+            [{"id": self.first.id, "delta": 1, "inventory": 1}],
+            [{"id": self.first.id, "inventory": -1}],
+            [{"id": self.first.id, "delta": 1}] * 2,
+        ):
+            response = self.adjust(items)
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+    def test_adjustment_invalidates_cache(self) -> None:
+        url = detail_url(self.first.id)
+        self.client.get(url)
+
+        self.adjust([{"id": self.first.id, "delta": 1}])
+
+        self.assertEqual(self.client.get(url).data["inventory"], 3)
+
+    def test_not_admin_forbidden(self) -> None:
+        self.client.force_authenticate(get_user_model().objects.create_user(
+            "test@test.com", "test12345"
+        ))
+
+        response = self.adjust([{"id": self.first.id, "delta": 1}])
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,11 +1,166 @@
-from rest_framework import viewsets
+from pathlib import Path
+from typing import Any, Type
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import QuerySet
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.serializers import Serializer, ValidationError
+
+from books.cache import BOOK_CACHE_NAMESPACE
+from books.importer import (
+    READERS,
+    UnreadableInput,
+    decode_lines,
+    import_books,
+)
+from books.inventory import adjust_inventory
 from books.models import Book
 from books.permissions import IsAdminUserOrReadOnly
-from books.serializers import BookSerializer
+from books.search import search_books, trigram_available
+from books.serializers import (
+    BookImportFileSerializer,
+    BookInventorySerializer,
+    BookSerializer
+)
+from rest_practice.asynchronous import AsyncReadMixin
+from rest_practice.caching import CachedResponseMixin
+from rest_practice.conditional import ConditionalGetMixin
+from rest_practice.sparse import SPARSE_PARAMETERS, SparseQuerysetMixin
 
 
-class BookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.all()
+class BookViewSet(
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    SparseQuerysetMixin,
+    AsyncReadMixin,
+    viewsets.ModelViewSet
+):
+    queryset = Book.objects.defer("search_vector")
     permission_classes = (IsAdminUserOrReadOnly,)
     serializer_class = BookSerializer
+    stamp_models = (Book,)
+    cache_namespace = BOOK_CACHE_NAMESPACE
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+
+        text = self.request.query_params.get("q")
+        if self.action == "list" and text:
+            queryset = search_books(queryset, text)
+        return queryset
+
+    async def aget_read_queryset(self) -> QuerySet:
+        if self.action == "list" and self.request.query_params.get("q"):
+            # searching probes for pg_trgm once per process
+            await sync_to_async(trigram_available)()
+        return await super().aget_read_queryset()
+
+    def get_serializer_class(self) -> Type[Serializer]:
+        if self.action == "import_books":
+            return BookImportFileSerializer
+        if self.action == "bulk_inventory":
+            return BookInventorySerializer
+
+        return BookSerializer
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "q",
+                type=str,
+                description="search books by title and author, "
+                            "best matches first (ex: ?q=tolstoy war)"
+            ),
+            *SPARSE_PARAMETERS,
+        ]
+    )
+    def list(
+            self,
+            request: Request,
+            *args: Any,
+            **kwargs: Any
+    ) -> Response:
+        return super().list(request, *args, **kwargs)
+
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="import",
+        permission_classes=[IsAdminUser],
+        parser_classes=[MultiPartParser],
+    )
+    def import_books(self, request: Request) -> Response:
+        """Upsert books by title from an uploaded CSV or JSON Lines file"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data["catalog"]
+        input_format = Path(upload.name).suffix.lstrip(".").lower()
+        if input_format not in READERS:
+            raise ValidationError(
+                {"catalog": "Expected a .csv or .jsonl file"}
+            )
+
+        # large uploads are spooled to disk, so rows are streamed from it
+        rows = READERS[input_format](decode_lines(upload.file))
+        imported, errors, rejected = 0, [], 0
+        try:
+            for written, batch_errors in import_books(rows):
+                imported += written
+                rejected += len(batch_errors)
+                room = settings.BOOK_IMPORT_MAX_REPORTED_ERRORS - len(errors)
+                errors.extend(
+                    {"line": line, "errors": detail}
+                    for line, detail in batch_errors[:room]
+                )
+        except UnreadableInput as exc:
+            # the batches before the line are already written
+            raise ValidationError({
+                "catalog": f"{exc}, {imported} books imported before it"
+            })
+
+        return Response(
+            {"imported": imported, "rejected": rejected, "errors": errors},
+            status=status.HTTP_200_OK,
+        )
+
+    @extend_schema(
+        request=BookInventorySerializer(many=True),
+        responses=BookInventorySerializer(many=True),
+    )
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="inventory",
+        permission_classes=[IsAdminUser],
+    )
+    def bulk_inventory(self, request: Request) -> Response:
+        """
+        Restock many books at once from [{"id", "delta"}] items, or set
+        their stock with [{"id", "inventory"}]; returns the new stock
+        """
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=settings.BOOK_INVENTORY_MAX_ITEMS,
+        )
+        serializer.is_valid(raise_exception=True)
+        stock = adjust_inventory([
+            (item["id"], item.get("delta"), item.get("inventory"))
+            for item in serializer.validated_data
+        ])
+
+        return Response(
+            [
+                {"id": book_id, "inventory": inventory}
+                for book_id, inventory in sorted(stock.items())
+            ],
+            status=status.HTTP_200_OK,
+        )
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from borrowings.models import Borrowing
+from borrowings.models import Borrowing, OutboxEvent
 
 
 admin.site.register(Borrowing)
+admin.site.register(OutboxEvent)
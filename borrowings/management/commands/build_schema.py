@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from rest_practice.schema import (
+    RENDERERS,
+    artifact_path,
+    generate_schema,
+    render_schema
+)
+
+
+class Command(BaseCommand):
+    """
+    Django command to write the OpenAPI schema of a code version as
+    YAML and JSON, for the schema view to serve instead of generating it
+    """
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--code-version",
+            default=settings.CODE_VERSION,
+            help="version the files are named for, CODE_VERSION by default",
+        )
+
+    def handle(self, *args, **options) -> None:
+        version = options["code_version"]
+        if not version:
+            raise CommandError("Set CODE_VERSION or pass --code-version")
+
+        Path(settings.OPENAPI_SCHEMA_DIR).mkdir(parents=True, exist_ok=True)
+        schema = generate_schema()
+        for schema_format in RENDERERS:
+            path = artifact_path(schema_format, version)
+            path.write_bytes(render_schema(schema, schema_format))
+            self.stdout.write(f"Wrote {path}")
@@ -0,0 +1,64 @@
+import datetime
+
+from django.core.management import BaseCommand
+
+from borrowings.export import (
+    CONTENT_TYPES,
+    export_borrowings,
+    filter_borrowings
+)
+from borrowings.models import Borrowing
+
+
+class Command(BaseCommand):
+    """
+    Django command to export borrowing history as CSV or NDJSON,
+    streamed from a server-side cursor
+    """
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--format", choices=sorted(CONTENT_TYPES), default="csv"
+        )
+        parser.add_argument(
+            "--output", default="-", help="output file, or - for stdout"
+        )
+        parser.add_argument(
+            "--is-active",
+            action="store_true",
+            help="only borrowings not returned yet",
+        )
+        parser.add_argument("--user-id", type=int)
+        parser.add_argument(
+            "--borrowed-after",
+            type=datetime.date.fromisoformat,
+            help="first borrow date to include, YYYY-MM-DD",
+        )
+        parser.add_argument(
+            "--borrowed-before",
+            type=datetime.date.fromisoformat,
+            help="last borrow date to include, YYYY-MM-DD",
+        )
+
+    def handle(self, *args, **options) -> None:
+        queryset = filter_borrowings(
+            Borrowing.objects.all(),
+            is_active=options["is_active"],
+            user_id=options["user_id"],
+            borrowed_after=options["borrowed_after"],
+            borrowed_before=options["borrowed_before"],
+        )
+        if options["output"] == "-":
+            # chunks end mid-line, the wrapper must not add newlines
+            self.stdout.ending = ""
+            output = self.stdout
+        else:
+            output = open(
+                options["output"], "w", encoding="utf-8", newline=""
+            )
+        try:
+            for chunk in export_borrowings(queryset, options["format"]):
+                output.write(chunk)
+        finally:
+            if output is not self.stdout:
+                output.close()
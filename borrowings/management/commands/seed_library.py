@@ -0,0 +1,90 @@
+import random
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from books.cache import invalidate_book
+from books.models import Book
+from borrowings import seeding
+from user.models import User
+
+
+class Command(BaseCommand):
+    """
+    Django command to fill the database with a synthetic library: books,
+    readers and years of loan history, written with COPY. The same seed
+    on the same starting data gives the same rows.
+    """
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--books", type=int, default=10_000)
+        parser.add_argument("--users", type=int, default=5_000)
+        parser.add_argument("--borrowings", type=int, default=100_000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=730,
+            help="how many days back the loan history goes",
+        )
+        parser.add_argument(
+            "--password",
+            default="library12345",
+            help="password shared by every seeded user",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1")
+        rng = random.Random(options["seed"])
+
+        with transaction.atomic():
+            book_ids = self.step(
+                "books", seeding.seed_books, rng, options["books"]
+            )
+            user_ids = self.step(
+                "users",
+                seeding.seed_users,
+                rng,
+                options["users"],
+                options["password"],
+            )
+            if options["borrowings"]:
+                # loans go to the new rows, or the existing ones if none
+                book_ids = book_ids or list(
+                    Book.objects.values_list("pk", flat=True)
+                )
+                user_ids = user_ids or list(
+                    User.objects.values_list("pk", flat=True)
+                )
+                if not (book_ids and user_ids):
+                    raise CommandError("Borrowings need books and users")
+                self.step(
+                    "borrowings",
+                    seeding.seed_borrowings,
+                    rng,
+                    options["borrowings"],
+                    book_ids,
+                    user_ids,
+                    options["days"],
+                )
+        invalidate_book()
+
+        # fresh planner statistics, the row counts changed by orders
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "ANALYZE books_book, user_user, borrowings_borrowing"
+            )
+        self.stdout.write(self.style.SUCCESS("Library seeded"))
+
+    def step(self, name: str, seed, *args):
+        started = time.perf_counter()
+        result = seed(*args)
+        written = result if isinstance(result, int) else len(result)
+        seconds = time.perf_counter() - started
+        self.stdout.write(
+            f"Seeded {written} {name} in {seconds:.1f}s "
+            f"({written / max(seconds, 1e-9):.0f} rows/s)"
+        )
+        return result
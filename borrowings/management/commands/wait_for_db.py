@@ -1,20 +1,115 @@
 import time
+from typing import Callable
+
+import redis
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management import BaseCommand
+
+REDIS_SCHEMES = ("redis://", "rediss://", "unix://")
+REDIS_SETTINGS = (
+    "CELERY_BROKER_URL",
+    "CELERY_RESULT_BACKEND",
+    "REDIS_CACHE_URL",
+)
+CONNECT_TIMEOUT = 2  # seconds a single Redis check may take
+
+
+def database_check(alias: str) -> Callable[[], None]:
+    def check() -> None:
+        connections[alias].ensure_connection()
+    return check
+
+
+def redis_check(url: str) -> Callable[[], None]:
+    def check() -> None:
+        client = redis.Redis.from_url(
+            url,
+            socket_connect_timeout=CONNECT_TIMEOUT,
+            socket_timeout=CONNECT_TIMEOUT,
+        )
+        try:
+            client.ping()
+        finally:
+            client.close()
+    return check
 
 
 class Command(BaseCommand):
-    """Django command to pause execution until db is available"""
+    """
+    Django command to pause execution until the databases and the Redis
+    servers the settings point at are available, retrying with
+    exponential backoff and failing once the timeout runs out
+    """
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="seconds to wait for everything before failing",
+        )
+        parser.add_argument(
+            "--max-delay",
+            type=float,
+            default=5,
+            help="longest pause between two attempts, in seconds",
+        )
+        parser.add_argument(
+            "--skip-redis",
+            action="store_true",
+            help="wait for the databases only",
+        )
+
+    def checks(self, skip_redis: bool) -> dict[str, Callable[[], None]]:
+        checks = {
+            f"Database {alias!r}": database_check(alias)
+            for alias in connections
+        }
+        if not skip_redis:
+            urls = {
+                getattr(settings, name) for name in REDIS_SETTINGS
+                if (getattr(settings, name, None) or "").startswith(
+                    REDIS_SCHEMES
+                )
+            }
+            for url in sorted(urls):
+                names = " and ".join(
+                    name for name in REDIS_SETTINGS
+                    if getattr(settings, name, None) == url
+                )
+                checks[f"Redis of {names}"] = redis_check(url)
+        return checks
 
     def handle(self, *args, **options) -> None:
         self.stdout.write("Waiting for database...")
-        db_conn = None
-        while not db_conn:
-            try:
-                db_conn = connections["default"].cursor()
-            except OperationalError:
-                self.stdout.write("Database unavailable, waiting 1 second...")
-                time.sleep(1)
+        pending = self.checks(options["skip_redis"])
+        deadline = time.monotonic() + options["timeout"]
+        delay = 0.1
+        while True:
+            for name, check in list(pending.items()):
+                try:
+                    check()
+                except (OperationalError, redis.RedisError):
+                    continue
+                del pending[name]
+                self.stdout.write(f"{name} available")
+            if not pending:
+                break
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise CommandError(
+                    f"{', '.join(pending)} unavailable after "
+                    f"{options['timeout']:g} seconds"
+                )
+            delay = min(delay, remaining)
+            self.stdout.write(
+                f"{', '.join(pending)} unavailable, "
+                f"waiting {delay:.1f} seconds..."
+            )
+            time.sleep(delay)
+            delay = min(delay * 2, options["max_delay"])
 
         self.stdout.write(self.style.SUCCESS("Database available!"))
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.7 on 2026-10-17 18:01
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the borrowings table is large, build indexes without blocking writes
+    atomic = False
+
+    dependencies = [
+        ("borrowings", "0003_outboxevent"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="borrowing",
+            index=models.Index(
+                condition=models.Q(("actual_return_date", None)),
+                fields=["expected_return_date"],
+                name="borrowing_active_due_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="borrowing",
+            index=models.Index(
+                fields=["user", "-borrow_date", "-id"], name="borrowing_user_recent_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="borrowing",
+            index=models.Index(
+                condition=models.Q(("actual_return_date", None)),
+                fields=["book"],
+                name="borrowing_active_book_idx",
+            ),
+        ),
+    ]
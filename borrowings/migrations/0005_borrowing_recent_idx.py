@@ -0,0 +1,22 @@
+# Generated by Django 4.1.7 on 2026-10-17 18:02
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # built concurrently for the same reason as 0004_borrowing_indexes
+    atomic = False
+
+    dependencies = [
+        ("borrowings", "0004_borrowing_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="borrowing",
+            index=models.Index(
+                fields=["-borrow_date", "-id"], name="borrowing_recent_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.1.7 on 2026-10-17 19:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.utils.timezone
+
+# the table version count of books.0003_book_updated_at
+VERSION_TRIGGER = """
+INSERT INTO table_versions VALUES ('borrowings_borrowing', 0, now());
+
+CREATE TRIGGER borrowings_borrowing_change_trigger
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON borrowings_borrowing
+FOR EACH STATEMENT EXECUTE FUNCTION record_table_change();
+"""
+
+DROP_VERSION_TRIGGER = """
+DROP TRIGGER borrowings_borrowing_change_trigger ON borrowings_borrowing;
+DELETE FROM table_changes WHERE table_name = 'borrowings_borrowing';
+DELETE FROM table_versions WHERE table_name = 'borrowings_borrowing';
+"""
+
+
+class Migration(migrations.Migration):
+    # built concurrently for the same reason as 0004_borrowing_indexes
+    atomic = False
+
+    dependencies = [
+        ("books", "0003_book_updated_at"),
+        ("borrowings", "0005_borrowing_recent_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="borrowing",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(VERSION_TRIGGER, DROP_VERSION_TRIGGER),
+        AddIndexConcurrently(
+            model_name="borrowing",
+            index=models.Index(
+                fields=["updated_at"], name="borrowing_updated_at_idx"
+            ),
+        ),
+    ]
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import datetime
-from typing import Optional, Type, Any
+from typing import Any, Iterable, Optional, Type
 
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 
 from books.models import Book
 from user.models import User
@@ -24,9 +25,34 @@ class Borrowing(models.Model):
         on_delete=models.CASCADE,
         related_name="borrowings"
     )
+    # version stamp for conditional GET; bulk update() calls set it too
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-borrow_date", "-id"]
+        indexes = [
+            models.Index(
+                fields=["expected_return_date"],
+                condition=models.Q(actual_return_date=None),
+                name="borrowing_active_due_idx",
+            ),
+            models.Index(
+                fields=["user", "-borrow_date", "-id"],
+                name="borrowing_user_recent_idx",
+            ),
+            models.Index(
+                fields=["-borrow_date", "-id"],
+                name="borrowing_recent_idx",
+            ),
+            models.Index(
+                fields=["book"],
+                condition=models.Q(actual_return_date=None),
+                name="borrowing_active_book_idx",
+            ),
+            models.Index(
+                fields=["updated_at"], name="borrowing_updated_at_idx"
+            ),
+        ]
 
     @staticmethod
     def validate_date(
@@ -38,6 +64,53 @@ class Borrowing(models.Model):
                 "Expected return date cannot be earlier than today's date"
             )
 
+    @classmethod
+    def validate_batch(cls, borrowings: Iterable[Borrowing]) -> None:
+        """
+        Validates borrowings for bulk_create() as save() would, looking up
+        the books and users given by id with one query per relation
+        rather than two per borrowing
+        """
+        borrowings = list(borrowings)
+        existing = {}
+        for field in cls._relations():
+            ids = {
+                getattr(borrowing, field.attname) for borrowing in borrowings
+                if not borrowing._has_loaded(field)
+            } - {None}
+            existing[field] = set(
+                field.related_model._base_manager.filter(
+                    pk__in=ids
+                ).values_list("pk", flat=True)
+            ) if ids else set()
+
+        errors = {}
+        for position, borrowing in enumerate(borrowings):
+            try:
+                # unknown ids fall through to the usual per field check,
+                # so they are reported with its message
+                borrowing.full_clean(exclude=[
+                    field.name for field, ids in existing.items()
+                    if borrowing._has_loaded(field) or (
+                        getattr(borrowing, field.attname) in ids
+                    )
+                ])
+            except ValidationError as error:
+                errors[str(position)] = error.messages
+        if errors:
+            raise ValidationError(errors)
+
+    @classmethod
+    def _relations(cls) -> list[models.ForeignKey]:
+        return [field for field in cls._meta.concrete_fields
+                if field.many_to_one]
+
+    def _has_loaded(self, field: models.ForeignKey) -> bool:
+        """Whether the related object was assigned or fetched, not an id"""
+        return field.is_cached(self) and (
+            field.get_cached_value(self) is not None
+        )
+
     def clean(self) -> None:
         Borrowing.validate_date(
             self.expected_return_date,
@@ -51,7 +124,12 @@ class Borrowing(models.Model):
             using: Optional[Any] = None,
             update_fields: Optional[Any] = None,
     ) -> Borrowing:
-        self.full_clean()
+        # related objects handed in by a serializer or form were loaded
+        # from the database already, only bare ids are looked up again
+        self.full_clean(exclude=[
+            field.name for field in self._relations()
+            if self._has_loaded(field)
+        ])
         return super(Borrowing, self).save(
             force_insert, force_update, using, update_fields
         )
@@ -61,3 +139,37 @@ class Borrowing(models.Model):
             f"Book {self.book.id} ordered on {self.borrow_date}, "
             f"return date - {self.expected_return_date}"
         )
+
+
+class OutboxEvent(models.Model):
+    """Notification written in the same transaction as the change it reports"""
+
+    class StatusChoices(models.TextChoices):
+        PENDING = "PENDING"
+        SENT = "SENT"
+        DEAD = "DEAD"
+
+    message = models.TextField()
+    status = models.CharField(
+        max_length=10,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["available_at"],
+                condition=models.Q(status="PENDING"),
+                name="outbox_pending_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.status} event {self.id}: {self.message[:50]}"
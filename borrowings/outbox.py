@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from borrowings.models import OutboxEvent
+from borrowings.telegram_notifications import send_telegram_notifications
+
+logger = logging.getLogger(__name__)
+
+Sink = Callable[[list[str]], Awaitable[list[Optional[Exception]]]]
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff after the given number of failed attempts"""
+    seconds = settings.OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.OUTBOX_MAX_RETRY_BACKOFF))
+
+
+def claim_batch(batch_size: int) -> tuple[list[OutboxEvent], datetime]:
+    """
+    Lease a batch of due events to this dispatcher for
+    OUTBOX_CLAIM_LEASE seconds. Rows are picked with SKIP LOCKED and
+    leased by pushing available_at past the lease in the same short
+    transaction, so concurrent dispatchers claim disjoint batches and
+    no row lock is held while the batch is sent.
+    """
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True).filter(
+                status=OutboxEvent.StatusChoices.PENDING,
+                available_at__lte=timezone.now(),
+            )[:batch_size]
+        )
+        leased_until = timezone.now() + timedelta(
+            seconds=settings.OUTBOX_CLAIM_LEASE
+        )
+        OutboxEvent.objects.filter(
+            id__in=[event.id for event in events]
+        ).update(available_at=leased_until)
+    return events, leased_until
+
+
+def record_results(
+        events: list[OutboxEvent],
+        errors: list[Optional[Exception]],
+        leased_until: datetime,
+) -> None:
+    """
+    Mark the sent events and schedule or bury the failed ones. Events
+    whose lease ran out and that another dispatcher claimed meanwhile
+    are left to it.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = set(
+            OutboxEvent.objects.select_for_update().filter(
+                id__in=[event.id for event in events],
+                status=OutboxEvent.StatusChoices.PENDING,
+                available_at=leased_until,
+            ).values_list("id", flat=True)
+        )
+        sent, failed = [], []
+        for event, error in zip(events, errors):
+            if event.id not in claimed:
+                continue
+            if error is None:
+                sent.append(event.id)
+                continue
+            event.attempts += 1
+            event.last_error = repr(error)
+            if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                event.status = OutboxEvent.StatusChoices.DEAD
+                event.available_at = now
+                logger.error("Outbox event %s is dead: %r", event.id, error)
+            else:
+                event.available_at = now + retry_delay(event.attempts)
+            failed.append(event)
+
+        OutboxEvent.objects.filter(id__in=sent).update(
+            status=OutboxEvent.StatusChoices.SENT,
+            attempts=F("attempts") + 1,
+            sent_at=now,
+        )
+        OutboxEvent.objects.bulk_update(
+            failed, ["status", "attempts", "last_error", "available_at"]
+        )
+
+
+def dispatch_batch(
+        batch_size: Optional[int] = None,
+        send: Optional[Sink] = None,
+) -> int:
+    """
+    Send one batch of due events and return how many were processed:
+    claim it, send it outside any transaction, then record the results
+    """
+    send = send or send_telegram_notifications
+    events, leased_until = claim_batch(
+        batch_size or settings.OUTBOX_BATCH_SIZE
+    )
+    if not events:
+        return 0
+
+    try:
+        errors = asyncio.run(send([event.message for event in events]))
+    except Exception as error:
+        # the sink could not even start, e.g. invalid token or no network
+        logger.exception("Outbox sink failed")
+        errors = [error] * len(events)
+
+    record_results(events, errors, leased_until)
+    return len(events)
+
+
+def drain(
+        batch_size: Optional[int] = None,
+        send: Optional[Sink] = None,
+) -> int:
+    """Dispatch batches until no due events are left"""
+    dispatched = 0
+    while processed := dispatch_batch(batch_size, send):
+        dispatched += processed
+    return dispatched
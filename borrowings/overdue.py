@@ -0,0 +1,101 @@
+import datetime
+import itertools
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.db.models import QuerySet
+
+from borrowings.models import Borrowing
+
+MAX_MESSAGE_LENGTH = 4096  # Telegram rejects longer messages
+DIGEST_HEADER = "Overdue borrowings:"
+
+
+def overdue_borrowings(due_date: datetime.date) -> QuerySet:
+    return Borrowing.objects.filter(
+        expected_return_date__lte=due_date,
+        actual_return_date=None,
+    ).order_by("expected_return_date", "id")
+
+
+def overdue_rows(due_date: datetime.date) -> Iterator[tuple]:
+    """
+    Stream (title, first name, last name, expected return date) of
+    active borrowings due by ``due_date`` from a server-side cursor.
+    Book and user come from the same joined query, not one per row.
+    """
+    return (
+        overdue_borrowings(due_date)
+        .values_list(
+            "book__title",
+            "user__first_name",
+            "user__last_name",
+            "expected_return_date",
+        )
+        .iterator(chunk_size=settings.OVERDUE_CHUNK_SIZE)
+    )
+
+
+def render_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    for title, first_name, last_name, expected_return_date in rows:
+        yield (
+            f"Borrowing of {title} "
+            f"is overdue by user {first_name} {last_name}. "
+            f"Expected return date - {expected_return_date}"
+        )
+
+
+def pack_digests(
+        lines: Iterable[str],
+        digest_size: int,
+) -> Iterator[list[str]]:
+    """Split lines into messages of up to ``digest_size`` lines each"""
+    digest, length = [], len(DIGEST_HEADER)
+    for line in lines:
+        too_long = length + len(line) + 1 > MAX_MESSAGE_LENGTH
+        if digest and (len(digest) >= digest_size or too_long):
+            yield digest
+            digest, length = [], len(DIGEST_HEADER)
+        digest.append(line)
+        length += len(line) + 1
+    if digest:
+        yield digest
+
+
+def format_digest(lines: list[str], digest_size: int) -> str:
+    if digest_size == 1:
+        return lines[0]
+    return "\n".join([DIGEST_HEADER, *lines])
+
+
+def group_digests(lines: Iterable[str], digest_size: int) -> Iterator[str]:
+    """Pack lines into messages of up to ``digest_size`` lines each"""
+    for digest in pack_digests(lines, digest_size):
+        yield format_digest(digest, digest_size)
+
+
+def overdue_report(
+        due_date: datetime.date,
+        digest_size: int,
+        max_messages: int,
+) -> list[str]:
+    """
+    Up to ``max_messages`` messages on the borrowings overdue by
+    ``due_date``, and one counting those that did not fit in them, so
+    the report takes a bounded time to send however many there are
+    """
+    rows = overdue_rows(due_date)
+    digests = pack_digests(render_lines(rows), digest_size)
+    messages, reported = [], 0
+    for digest in itertools.islice(digests, max_messages):
+        messages.append(format_digest(digest, digest_size))
+        reported += len(digest)
+    if not messages:
+        return ["No borrowings overdue today!"]
+
+    if next(digests, None) is not None:
+        # releases the server-side cursor before the count
+        rows.close()
+        more = overdue_borrowings(due_date).count() - reported
+        messages.append(f"...and {more} more overdue borrowings")
+    return messages
@@ -0,0 +1,45 @@
+import datetime
+from typing import Optional
+
+from django.db import connection
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from books.models import Book
+from borrowings.models import Borrowing
+
+# only the statement that flips actual_return_date from NULL gives the
+# copy back, so concurrent returns cannot double it; the borrowing
+# UPDATE hands its book id to the book UPDATE, all in one round trip
+RETURN_BORROWING = """
+WITH returned AS (
+    UPDATE {borrowings}
+    SET actual_return_date = %s, updated_at = %s
+    WHERE id IN ({borrowing}) AND actual_return_date IS NULL
+    RETURNING book_id
+)
+UPDATE {books} AS book
+SET inventory = book.inventory + 1, updated_at = %s
+FROM returned
+WHERE book.id = returned.book_id
+RETURNING book.id
+"""
+
+
+def return_borrowing(borrowings: QuerySet) -> Optional[int]:
+    """
+    Returns the borrowing ``borrowings`` selects, if it is not returned
+    yet, and restocks its book. The id of that book, or None when
+    nothing was returned.
+    """
+    borrowing, params = borrowings.values("pk").query.sql_with_params()
+    sql = RETURN_BORROWING.format(
+        borrowings=connection.ops.quote_name(Borrowing._meta.db_table),
+        books=connection.ops.quote_name(Book._meta.db_table),
+        borrowing=borrowing,
+    )
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [datetime.date.today(), now, *params, now])
+        row = cursor.fetchone()
+    return row[0] if row else None
@@ -0,0 +1,245 @@
+import datetime
+import io
+import itertools
+import math
+import random
+from typing import Any, Iterable, Iterator, Sequence
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.db.models import Model
+from django.utils import timezone
+
+from books.models import Book
+from borrowings.models import Borrowing
+from user.models import User
+
+COPY_BATCH_SIZE = 100_000  # rows per COPY statement
+
+TITLE_WORDS = (
+    ("Silent", "Broken", "Hidden", "Last", "Golden", "Winter", "Distant",
+     "Burning", "Forgotten", "Little", "Endless", "Crimson", "Northern"),
+    ("River", "Garden", "Empire", "Letters", "Machine", "Harbor", "Orchard",
+     "Shadow", "Kingdom", "Voyage", "Archive", "Frontier", "Lighthouse"),
+)
+FIRST_NAMES = (
+    "Anna", "Oleh", "Maria", "Taras", "Iryna", "Mark", "Sofia", "Petro",
+    "Olena", "David", "Lesia", "Ivan", "Nadia", "Andrii", "Kateryna", "Yurii",
+)
+LAST_NAMES = (
+    "Koval", "Shevchenko", "Bondar", "Melnyk", "Tkachenko", "Kravets",
+    "Moroz", "Lysenko", "Savchenko", "Rudenko", "Marchenko", "Polishchuk",
+)
+
+BOOK_POPULARITY = 0.9  # Zipf exponent: a few titles take most loans
+READER_ACTIVITY = 0.8  # Zipf exponent: heavy readers borrow far more
+LOAN_DAYS = (7, 14, 14, 21, 30)
+LATE_SHARE = 0.15  # loans kept past the expected return date
+MEAN_DAYS_LATE = 10
+LOST_SHARE = 0.005  # loans never returned, the long overdue tail
+
+
+def copy_value(value: Any) -> str:
+    """A value in COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (
+        str(value).replace("\\", "\\\\")
+        .replace("\t", "\\t").replace("\n", "\\n")
+    )
+
+
+def copy_rows(
+        model: type[Model],
+        columns: Sequence[str],
+        rows: Iterable[Sequence[Any]],
+) -> int:
+    """Writes rows with COPY, COPY_BATCH_SIZE rows per statement"""
+    quote = connection.ops.quote_name
+    sql = (
+        f"COPY {quote(model._meta.db_table)} "
+        f"({', '.join(quote(column) for column in columns)}) FROM STDIN"
+    )
+    written = 0
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while batch := list(itertools.islice(rows, COPY_BATCH_SIZE)):
+            buffer = io.StringIO()
+            for row in batch:
+                buffer.write("\t".join(map(copy_value, row)))
+                buffer.write("\n")
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            written += len(batch)
+    return written
+
+
+def zipf_weights(size: int, exponent: float) -> list[float]:
+    """Cumulative weights of ranks 1..size, for random.choices()"""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+def book_rows(rng: random.Random, count: int, start: int) -> Iterator[tuple]:
+    now = timezone.now()
+    authors = [
+        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        for _ in range(max(1, count // 8))
+    ]
+    author_weights = zipf_weights(len(authors), READER_ACTIVITY)
+    for number in range(start, start + count):
+        yield (
+            f"{rng.choice(TITLE_WORDS[0])} {rng.choice(TITLE_WORDS[1])} "
+            f"{number}",
+            rng.choices(authors, cum_weights=author_weights)[0],
+            rng.choice(Book.CoverChoices.values),
+            rng.randint(1, 12),
+            f"{rng.randint(10, 500) / 100:.2f}",
+            now,
+        )
+
+
+def user_rows(
+        rng: random.Random,
+        count: int,
+        start: int,
+        password: str,
+) -> Iterator[tuple]:
+    # hashing is deliberately slow, every seeded user shares one hash
+    hashed = make_password(password)
+    now = timezone.now()
+    for number in range(start, start + count):
+        yield (
+            f"reader{number}@library.com",
+            hashed,
+            rng.choice(FIRST_NAMES),
+            rng.choice(LAST_NAMES),
+            False,
+            False,
+            True,
+            now,
+        )
+
+
+def borrowing_rows(
+        rng: random.Random,
+        count: int,
+        book_ids: list[int],
+        user_ids: list[int],
+        days: int,
+) -> Iterator[tuple]:
+    """
+    Loans spread over the last ``days`` days. Popular books and heavy
+    readers are drawn by Zipf weights; each loan is returned early, on
+    time or late, and the ones whose return falls after today are still
+    active, overdue when their expected date has passed.
+    """
+    today = timezone.localdate()
+    now = timezone.now()
+    # ISO strings by days before today, negative for the future
+    longest = max(LOAN_DAYS)
+    dates = {
+        offset: (today - datetime.timedelta(days=offset)).isoformat()
+        for offset in range(-longest, days)
+    }
+    book_ids, user_ids = book_ids[:], user_ids[:]
+    rng.shuffle(book_ids)
+    rng.shuffle(user_ids)
+    book_weights = zipf_weights(len(book_ids), BOOK_POPULARITY)
+    user_weights = zipf_weights(len(user_ids), READER_ACTIVITY)
+
+    while count > 0:
+        size = min(count, COPY_BATCH_SIZE)
+        count -= size
+        books = rng.choices(book_ids, cum_weights=book_weights, k=size)
+        users = rng.choices(user_ids, cum_weights=user_weights, k=size)
+        for book_id, user_id in zip(books, users):
+            borrowed = rng.randrange(days)
+            loan_days = rng.choice(LOAN_DAYS)
+            chance = rng.random()
+            if chance < LOST_SHARE:
+                kept = math.inf
+            elif chance < LATE_SHARE:
+                kept = loan_days + math.ceil(
+                    rng.expovariate(1 / MEAN_DAYS_LATE)
+                )
+            else:
+                kept = rng.randint(1, loan_days)
+            yield (
+                dates[borrowed],
+                dates[borrowed - loan_days],
+                dates[borrowed - kept] if kept <= borrowed else None,
+                book_id,
+                user_id,
+                now,
+            )
+
+
+def new_ids(model: type[Model], after: int) -> list[int]:
+    return list(
+        model.objects.filter(pk__gt=after)
+        .order_by("pk").values_list("pk", flat=True)
+    )
+
+
+def last_id(model: type[Model]) -> int:
+    return model.objects.order_by("-pk").values_list(
+        "pk", flat=True
+    ).first() or 0
+
+
+def seed_books(rng: random.Random, count: int) -> list[int]:
+    after = last_id(Book)
+    copy_rows(
+        Book,
+        ("title", "author", "cover", "inventory", "daily_fee", "updated_at"),
+        book_rows(rng, count, Book.objects.count()),
+    )
+    return new_ids(Book, after)
+
+
+def seed_users(rng: random.Random, count: int, password: str) -> list[int]:
+    after = last_id(User)
+    copy_rows(
+        User,
+        ("email", "password", "first_name", "last_name",
+         "is_superuser", "is_staff", "is_active", "date_joined"),
+        user_rows(rng, count, User.objects.count(), password),
+    )
+    return new_ids(User, after)
+
+
+def seed_borrowings(
+        rng: random.Random,
+        count: int,
+        book_ids: list[int],
+        user_ids: list[int],
+        days: int,
+) -> int:
+    written = copy_rows(
+        Borrowing,
+        ("borrow_date", "expected_return_date", "actual_return_date",
+         "book_id", "user_id", "updated_at"),
+        borrowing_rows(rng, count, book_ids, user_ids, days),
+    )
+    # copies still out on loan are not on the shelf
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE books_book
+            SET inventory = GREATEST(books_book.inventory - active.loans, 0),
+                updated_at = now()
+            FROM (
+                SELECT book_id, count(*) AS loans
+                FROM borrowings_borrowing
+                WHERE actual_return_date IS NULL AND book_id = ANY(%s)
+                GROUP BY book_id
+            ) AS active
+            WHERE books_book.id = active.book_id
+            """,
+            [book_ids],
+        )
+    return written
@@ -1,13 +1,19 @@
-import asyncio
 from typing import Any
 
-from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
 
+from books.cache import invalidate_book
 from books.models import Book
 from books.serializers import BookSerializer
+from borrowings.export import CONTENT_TYPES
 from borrowings.models import Borrowing
-from borrowings.telegram_notifications import send_telegram_notification
+from borrowings.tasks import notify
+from rest_practice.metrics import CHECKOUTS
+from rest_practice.sparse import SparseFieldsetMixin
+from user.serializers import UserSerializer
 
 
 class BorrowingSerializer(serializers.ModelSerializer):
@@ -24,23 +30,34 @@ class BorrowingSerializer(serializers.ModelSerializer):
         )
 
     def create(self, validated_data: dict[str, Any]) -> Borrowing:
-        book = Book.objects.get(title=validated_data["book"])
-        if not book.inventory:
-            raise ValidationError("This book is currently out of stock")
-        book.inventory -= 1
-        book.save()
-
-        asyncio.run(
-            send_telegram_notification(
+        book = validated_data["book"]
+        with transaction.atomic():
+            # a single conditional UPDATE: concurrent checkouts queue on the
+            # row lock and the last copy can only be taken once
+            reserved = Book.objects.filter(
+                pk=book.pk, inventory__gt=0
+            ).update(inventory=F("inventory") - 1, updated_at=timezone.now())
+            if not reserved:
+                CHECKOUTS.labels("out_of_stock").inc()
+                # raised past validation, so it must be DRF's to become a
+                # 400 rather than a server error
+                raise serializers.ValidationError(
+                    {"book": ["This book is currently out of stock"]}
+                )
+            invalidate_book(book.pk)
+            borrowing = super().create(validated_data)
+
+            notify(
                 f"Book {book.title} was borrowed by {validated_data['user']}. "
-                f"Expected return date: {validated_data['expected_return_date']}"
+                "Expected return date: "
+                f"{validated_data['expected_return_date']}"
             )
-        )
 
-        return super().create(validated_data)
+        CHECKOUTS.labels("borrowed").inc()
+        return borrowing
 
 
-class BorrowingListSerializer(BorrowingSerializer):
+class BorrowingListSerializer(SparseFieldsetMixin, BorrowingSerializer):
     book = BookSerializer(many=False, read_only=True)
     user = serializers.StringRelatedField(many=False, read_only=True)
 
@@ -54,6 +71,7 @@ class BorrowingListSerializer(BorrowingSerializer):
             "book",
             "user"
         )
+        expandable_fields = {"user": UserSerializer}
 
 
 class BorrowingReturnSerializer(serializers.ModelSerializer):
@@ -64,5 +82,22 @@ class BorrowingReturnSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         if self.instance.actual_return_date:
-            raise ValidationError("This book is already returned")
+            raise serializers.ValidationError("This book is already returned")
+        return attrs
+
+
+class BorrowingExportSerializer(serializers.Serializer):
+    output = serializers.ChoiceField(
+        choices=sorted(CONTENT_TYPES), default="csv"
+    )
+    borrowed_after = serializers.DateField(required=False)
+    borrowed_before = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get("borrowed_after") and attrs.get("borrowed_before") and (
+            attrs["borrowed_after"] > attrs["borrowed_before"]
+        ):
+            raise serializers.ValidationError(
+                "borrowed_after must not be later than borrowed_before"
+            )
         return attrs
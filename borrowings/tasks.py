@@ -1,25 +1,59 @@
 import asyncio
+import logging
 
-from borrowings.models import Borrowing
+from borrowings.models import OutboxEvent
 from datetime import timedelta, date
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from kombu.exceptions import OperationalError
 
-from borrowings.telegram_notifications import send_telegram_notification
+from borrowings import outbox, overdue
+from borrowings.telegram_notifications import send_telegram_notifications
+from rest_practice.conditional import compact_table_changes
+from rest_practice.profiling import timed
+from rest_practice.replicas import replica_reads
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def dispatch_outbox() -> int:
+    return outbox.drain()
+
+
+@shared_task
+def compact_table_versions() -> int:
+    return compact_table_changes()
+
+
+def wake_outbox_dispatcher() -> None:
+    try:
+        with timed("outbound"):
+            dispatch_outbox.delay()
+    except OperationalError:
+        # events stay in the outbox and the periodic dispatch picks them up
+        logger.warning("Broker unavailable, outbox dispatch postponed")
+
+
+def notify(message: str) -> None:
+    """Queue a notification to be sent once the transaction commits"""
+    OutboxEvent.objects.create(message=message)
+    transaction.on_commit(wake_outbox_dispatcher)
 
 
 @shared_task
-def check_overdue_borrowings() -> None:
-    overdue_borrowings = Borrowing.objects.filter(
-        expected_return_date__lte=date.today() + timedelta(days=1)
-    ).filter(actual_return_date=None)
-    if overdue_borrowings:
-        for borrowing in overdue_borrowings:
-            asyncio.run(send_telegram_notification(
-                f"Borrowing of {borrowing.book} "
-                f"is overdue by user {borrowing.user}. "
-                f"Expected return date - {borrowing.expected_return_date}"
-            ))
-    else:
-        asyncio.run(send_telegram_notification(
-            "No borrowings overdue today!"
-        ))
+def check_overdue_borrowings() -> int:
+    with replica_reads():
+        messages = overdue.overdue_report(
+            date.today() + timedelta(days=1),
+            settings.OVERDUE_DIGEST_SIZE,
+            settings.OVERDUE_MAX_MESSAGES,
+        )
+    errors = asyncio.run(send_telegram_notifications(messages))
+    failed = len(messages) - errors.count(None)
+    if failed:
+        logger.error(
+            "%s of %s overdue messages were not sent", failed, len(messages)
+        )
+    return len(messages)
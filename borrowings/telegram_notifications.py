@@ -1,7 +1,74 @@
+import asyncio
+from typing import Optional
+
 import telegram
 from django.conf import settings
 
+from rest_practice.metrics import TELEGRAM_SEND_LATENCY, TELEGRAM_SENDS
+from rest_practice.profiling import timed
+
+
+class RateLimiter:
+    """Spaces calls so that at most ``rate`` of them start per second"""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        await asyncio.sleep(slot - now)
+
+
+async def send_telegram_notifications(
+        messages: list[str],
+        concurrency: Optional[int] = None,
+        rate: Optional[float] = None,
+) -> list[Optional[Exception]]:
+    """
+    Send messages over one shared bot, returning an error per message.
+    ``concurrency`` workers send in parallel, spaced to the per-chat
+    ``rate`` (messages per second) Telegram allows; flood control
+    replies are waited out and retried.
+    """
+    limiter = RateLimiter(rate or settings.TELEGRAM_MESSAGES_PER_SECOND)
+    errors: list[Optional[Exception]] = [None] * len(messages)
+    pending = iter(enumerate(messages))
+
+    async def send(bot: telegram.Bot, message: str) -> Optional[Exception]:
+        for _ in range(settings.TELEGRAM_SEND_ATTEMPTS):
+            await limiter.wait()
+            try:
+                with timed("outbound"), TELEGRAM_SEND_LATENCY.time():
+                    await bot.send_message(
+                        chat_id=settings.TELEGRAM_CHAT_ID, text=message
+                    )
+            except telegram.error.RetryAfter as error:
+                TELEGRAM_SENDS.labels("flood_wait").inc()
+                flood_error = error
+                await asyncio.sleep(error.retry_after)
+            except telegram.error.TelegramError as error:
+                TELEGRAM_SENDS.labels("error").inc()
+                return error
+            else:
+                TELEGRAM_SENDS.labels("sent").inc()
+                return None
+        return flood_error
+
+    async def worker(bot: telegram.Bot) -> None:
+        for index, message in pending:
+            errors[index] = await send(bot, message)
 
-async def send_telegram_notification(message: str) -> None:
-    bot = telegram.Bot(token=settings.TELEGRAM_BOT_TOKEN)
-    await bot.send_message(chat_id=settings.TELEGRAM_CHAT_ID, text=message)
+    async with telegram.Bot(token=settings.TELEGRAM_BOT_TOKEN) as bot:
+        await asyncio.gather(
+            *(
+                worker(bot)
+                for _ in range(concurrency or settings.TELEGRAM_CONCURRENCY)
+            )
+        )
+    return errors
@@ -1,15 +1,54 @@
+import asyncio
+import base64
+import csv
+import datetime
+import io
+import json
+import random
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.core.signals import request_finished, request_started
+from django.db import (
+    close_old_connections,
+    connection,
+    connections,
+    transaction
+)
+from django.db.utils import OperationalError
+from django.db.models import Count
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+import redis
+import telegram
 
 from books.models import Book
-from borrowings.models import Borrowing
+from borrowings import outbox, overdue, seeding
+from borrowings.models import Borrowing, OutboxEvent
 from borrowings.serializers import BorrowingListSerializer, BorrowingSerializer
+from borrowings.tasks import (
+    check_overdue_borrowings,
+    dispatch_outbox,
+    wake_outbox_dispatcher
+)
+from borrowings.telegram_notifications import (
+    RateLimiter,
+    send_telegram_notifications
+)
+from rest_practice.asynchronous import ASGIHandler
 
 BORROWING_URL = reverse("borrowings:borrowing-list")
+EXPORT_URL = reverse("borrowings:borrowing-export")
 INVENTORY = 10
 
 
@@ -66,7 +105,7 @@ class AuthenticatedBorrowingApiTests(TestCase):
         serializer = BorrowingListSerializer(borrowings, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_retrieve_borrowing_detail(self) -> None:
         borrowing = sample_borrowing(user=self.user)
@@ -92,6 +131,32 @@ class AuthenticatedBorrowingApiTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(book.inventory, INVENTORY - 1)
 
+    def test_checkout_writes_outbox_event(self) -> None:
+        payload = {
+            "expected_return_date": "2023-10-20",
+            "book": sample_book().id,
+        }
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(BORROWING_URL, payload)
+
+        event = OutboxEvent.objects.get()
+        self.assertIn("Sample book", event.message)
+        self.assertEqual(event.status, OutboxEvent.StatusChoices.PENDING)
+        self.assertIn(wake_outbox_dispatcher, callbacks)
+
+    def test_create_borrowing_query_count(self) -> None:
+        payload = {
+            "expected_return_date": "2023-10-20",
+            "book": sample_book().id,
+        }
+        # the book lookup, the stock UPDATE, the two INSERTs and the
+        # savepoint pair: the book and user are not fetched again to
+        # validate the borrowing
+        with self.assertNumQueries(6):
+            response = self.client.post(BORROWING_URL, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
     def test_create_borrowing_with_invalid_data(self) -> None:
         book = sample_book(inventory=0)
         payload = {
@@ -100,12 +165,14 @@ class AuthenticatedBorrowingApiTests(TestCase):
             "user": self.user.id,
             "book": book.id,
         }
-        with self.assertRaises(ValidationError) as exc:
-            response = self.client.post(BORROWING_URL, payload)
-            self.assertNotEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(BORROWING_URL, payload)
 
-        self.assertIn("This book is currently out of stock", exc.exception)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data, {"book": ["This book is currently out of stock"]}
+        )
         self.assertEqual(book.inventory, 0)
+        self.assertFalse(OutboxEvent.objects.exists())
 
     def test_return_borrowing(self) -> None:
         borrowing = sample_borrowing(user=self.user)
@@ -134,6 +201,99 @@ class AuthenticatedBorrowingApiTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(book.inventory, INVENTORY)
 
+    def test_return_borrowing_query_count(self) -> None:
+        borrowing = sample_borrowing(user=self.user)
+        url = f"{detail_url(borrowing.id)}return/"
+
+        # the borrowing and the book UPDATE, chained in one statement
+        with self.assertNumQueries(1):
+            response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_return_malformed_id_not_found(self) -> None:
+        response = self.client.post(BORROWING_URL + "abc/return/")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_return_lost_to_a_concurrent_one_is_rejected(self) -> None:
+        borrowing = sample_borrowing(user=self.user)
+        url = f"{detail_url(borrowing.id)}return/"
+
+        # the other request returned it after this one's UPDATE
+        with mock.patch(
+            "borrowings.views.return_borrowing", return_value=None
+        ):
+            response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_return_foreign_borrowing_not_found(self) -> None:
+        user_2 = get_user_model().objects.create_user(
+            "another@user.com",
+            "another_password12345"
+        )
+        borrowing = sample_borrowing(user=user_2)
+        url = f"{detail_url(borrowing.id)}return/"
+        response = self.client.post(url)
+        borrowing.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIsNone(borrowing.actual_return_date)
+        self.assertEqual(borrowing.book.inventory, INVENTORY)
+
+    def test_checkout_and_return_change_etags(self) -> None:
+        book = sample_book()
+        book_url = reverse("books:book-detail", args=[book.id])
+        book_etag = self.client.get(book_url)["ETag"]
+
+        self.client.post(
+            BORROWING_URL,
+            {"book": book.id, "expected_return_date": "2023-10-10"}
+        )
+        response = self.client.get(book_url, HTTP_IF_NONE_MATCH=book_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["inventory"], INVENTORY - 1)
+
+        borrowing = Borrowing.objects.get()
+        url = detail_url(borrowing.id)
+        etag = self.client.get(url)["ETag"]
+        list_etag = self.client.get(BORROWING_URL)["ETag"]
+        book_etag = self.client.get(book_url)["ETag"]
+
+        self.client.post(f"{url}return/")
+
+        for url, etag in (
+            (url, etag), (BORROWING_URL, list_etag), (book_url, book_etag)
+        ):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_unchanged_borrowings_are_not_modified(self) -> None:
+        borrowing = sample_borrowing(user=self.user)
+
+        for url in (BORROWING_URL, detail_url(borrowing.id)):
+            etag = self.client.get(url)["ETag"]
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(
+                response.status_code, status.HTTP_304_NOT_MODIFIED
+            )
+
+    def test_borrowing_etag_is_per_user(self) -> None:
+        sample_borrowing(user=self.user)
+        etag = self.client.get(BORROWING_URL)["ETag"]
+        user_2 = get_user_model().objects.create_user(
+            "another@user.com",
+            "another_password12345"
+        )
+        self.client.force_authenticate(user_2)
+
+        response = self.client.get(BORROWING_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Authorization", response["Vary"])
+
     def test_update_borrowing_not_allowed(self) -> None:
         borrowing = sample_borrowing(
             user=self.user
@@ -162,7 +322,7 @@ class AuthenticatedBorrowingApiTests(TestCase):
         serializer = BorrowingSerializer(borrowing)
         response = self.client.get(BORROWING_URL, {"is_active": 1})
 
-        self.assertNotIn(serializer.data, response.data)
+        self.assertNotIn(serializer.data, response.data["results"])
 
     def test_filter_by_user_not_allowed(self) -> None:
         user_2 = get_user_model().objects.create_user(
@@ -176,7 +336,39 @@ class AuthenticatedBorrowingApiTests(TestCase):
         response = self.client.get(BORROWING_URL, {"user_id": user_2.id})
         serializer = BorrowingSerializer(borrowing)
 
-        self.assertNotIn(serializer.data, response.data)
+        self.assertNotIn(serializer.data, response.data["results"])
+
+    def test_sparse_fields_skip_unrequested_joins(self) -> None:
+        borrowing = sample_borrowing(user=self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                BORROWING_URL, {"fields": "id,book.title"}
+            )
+
+        self.assertEqual(
+            response.data["results"],
+            [{"id": borrowing.id, "book": {"title": "Sample book"}}],
+        )
+        sql = queries.captured_queries[-1]["sql"]
+        self.assertNotIn("user_user", sql)
+        self.assertNotIn("expected_return_date", sql)
+
+    def test_expand_user(self) -> None:
+        sample_borrowing(user=self.user)
+
+        response = self.client.get(
+            BORROWING_URL, {"expand": "user", "fields": "user.email"}
+        )
+
+        self.assertEqual(
+            response.data["results"], [{"user": {"email": "test@test.com"}}]
+        )
+
+    def test_expand_unknown_relation(self) -> None:
+        response = self.client.get(BORROWING_URL, {"expand": "book"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
 class AdminBorrowingApiTests(TestCase):
@@ -199,9 +391,961 @@ class AdminBorrowingApiTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_pagination_walks_ties_on_borrow_date(self) -> None:
+        book = sample_book()
+        Borrowing.objects.bulk_create(
+            Borrowing(
+                book=book,
+                user=self.user,
+                expected_return_date=datetime.date.today()
+            )
+            for _ in range(7)
+        )
+        expected = list(Borrowing.objects.values_list("id", flat=True))
+
+        ids, url = [], BORROWING_URL + "?page_size=3"
+        while url:
+            response = self.client.get(url)
+            ids += [borrowing["id"] for borrowing in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursor_position(self) -> None:
+        cursor = base64.urlsafe_b64encode(b'{"p": ["not a date", 1], "r": 0}')
+        response = self.client.get(BORROWING_URL, {"cursor": cursor.decode()})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_admin_can_delete_borrowing(self) -> None:
         borrowing = sample_borrowing(user=self.user)
         url = detail_url(borrowing.id)
         response = self.client.delete(url)
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class BorrowingValuesReadTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@admin.com",
+            "admin12345",
+            first_name="Ada",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        unnamed = get_user_model().objects.create_user(
+            "unnamed@user.com", "test12345"
+        )
+        for i, (fee, user) in enumerate(
+            ((1.25, self.user), (10, unnamed), (0.5, self.user))
+        ):
+            Borrowing.objects.create(
+                user=user,
+                book=sample_book(title=f"Book {i}", daily_fee=fee),
+                expected_return_date="2023-10-10",
+                actual_return_date="2023-10-12" if i == 1 else None,
+            )
+
+    def assertSameJson(self, url: str, **params) -> None:
+        response = self.client.get(url, params)
+        with override_settings(BORROWING_VALUES_READS=False):
+            expected = self.client.get(url, params)
+
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+
+    def test_list_renders_identical_json(self) -> None:
+        self.assertSameJson(BORROWING_URL)
+        self.assertSameJson(BORROWING_URL, page_size=2)
+        self.assertSameJson(BORROWING_URL, is_active=1)
+
+    def test_retrieve_renders_identical_json(self) -> None:
+        for borrowing in Borrowing.objects.all():
+            self.assertSameJson(detail_url(borrowing.id))
+        self.assertSameJson(detail_url(0))
+
+    def test_list_is_a_single_query(self) -> None:
+        # the page plus the conditional GET version stamp
+        with self.assertNumQueries(2):
+            self.client.get(BORROWING_URL)
+
+
+class BorrowingValidationTests(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "test12345"
+        )
+        self.book = sample_book()
+
+    def test_save_checks_related_ids(self) -> None:
+        borrowing = Borrowing(
+            book_id=0, user_id=self.user.id, expected_return_date="2023-10-10"
+        )
+        with self.assertRaises(ValidationError) as exc:
+            borrowing.save()
+
+        self.assertIn("book", exc.exception.message_dict)
+
+    def test_save_skips_lookups_for_loaded_relations(self) -> None:
+        borrowing = Borrowing(
+            book=self.book, user=self.user, expected_return_date="2023-10-10"
+        )
+        with self.assertNumQueries(1):
+            borrowing.save()
+
+    def test_save_still_validates_date(self) -> None:
+        borrowing = Borrowing(
+            book=self.book, user=self.user, expected_return_date="2023-01-01"
+        )
+        with self.assertRaises(ValidationError):
+            borrowing.save()
+
+    def test_validate_batch_looks_up_each_relation_once(self) -> None:
+        books = [sample_book(title=f"Book {i}") for i in range(5)]
+        borrowings = [
+            Borrowing(
+                book_id=book.id,
+                user_id=self.user.id,
+                expected_return_date="2023-10-10",
+            )
+            for book in books
+        ]
+        with self.assertNumQueries(2):
+            Borrowing.validate_batch(borrowings)
+        Borrowing.objects.bulk_create(borrowings)
+
+        self.assertEqual(Borrowing.objects.count(), 5)
+
+    def test_validate_batch_reports_rows(self) -> None:
+        borrowings = [
+            Borrowing(
+                book=self.book, user=self.user,
+                expected_return_date="2023-10-10",
+            ),
+            Borrowing(
+                book=self.book, user=self.user,
+                expected_return_date="2023-01-01",
+            ),
+            Borrowing(
+                book_id=0, user=self.user, expected_return_date="2023-10-10"
+            ),
+        ]
+        with self.assertRaises(ValidationError) as exc:
+            Borrowing.validate_batch(borrowings)
+
+        self.assertEqual(sorted(exc.exception.message_dict), ["1", "2"])
+        self.assertIn(
+            "Expected return date cannot be earlier than today's date",
+            exc.exception.message_dict["1"],
+        )
+
+
+class SeedLibraryTests(TestCase):
+    def test_seed_library(self) -> None:
+        stdout = io.StringIO()
+        call_command(
+            "seed_library",
+            "--books=50",
+            "--users=20",
+            "--borrowings=2000",
+            "--password=seeded12345",
+            stdout=stdout,
+        )
+        active = Borrowing.objects.filter(actual_return_date=None)
+
+        self.assertEqual(Book.objects.count(), 50)
+        self.assertEqual(get_user_model().objects.count(), 20)
+        self.assertEqual(Borrowing.objects.count(), 2000)
+        self.assertTrue(active.exists())
+        self.assertTrue(active.filter(
+            expected_return_date__lt=datetime.date.today()
+        ).exists())
+        self.assertFalse(Book.objects.filter(search_vector=None).exists())
+        self.assertTrue(
+            get_user_model().objects.first().check_password("seeded12345")
+        )
+        self.assertIn("Library seeded", stdout.getvalue())
+
+    def test_popularity_is_skewed(self) -> None:
+        call_command(
+            "seed_library",
+            "--books=100",
+            "--users=10",
+            "--borrowings=5000",
+            stdout=io.StringIO(),
+        )
+        loans = sorted(
+            Book.objects.annotate(
+                loans=Count("borrowings")
+            ).values_list("loans", flat=True),
+            reverse=True,
+        )
+
+        self.assertGreater(sum(loans[:10]), sum(loans[-50:]))
+
+    def test_rows_depend_on_the_seed_only(self) -> None:
+        def rows(seed: int) -> list[tuple]:
+            # the last column is the seeding time
+            return [row[:-1] for row in seeding.borrowing_rows(
+                random.Random(seed), 500, list(range(1, 30)), [1, 2, 3], 90
+            )]
+
+        self.assertEqual(rows(1), rows(1))
+        self.assertNotEqual(rows(1), rows(2))
+
+
+class BorrowingExportTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@admin.com",
+            "admin12345",
+            first_name="Ada",
+            last_name="Lovelace",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        reader = get_user_model().objects.create_user(
+            "reader@user.com", "test12345"
+        )
+        for i, (borrow_date, user) in enumerate(
+            (("2023-01-05", self.user), ("2023-02-10", reader),
+             ("2023-03-15", self.user))
+        ):
+            borrowing = Borrowing.objects.create(
+                user=user,
+                book=sample_book(title=f"Book, {i}"),
+                expected_return_date="2023-10-10",
+                actual_return_date="2023-03-20" if i == 1 else None,
+            )
+            Borrowing.objects.filter(pk=borrowing.pk).update(
+                borrow_date=borrow_date
+            )
+        self.ids = list(
+            Borrowing.objects.order_by("id").values_list("id", flat=True)
+        )
+
+    def export(self, **params) -> list[dict]:
+        response = self.client.get(EXPORT_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode()
+        if params.get("output") == "ndjson":
+            return [json.loads(line) for line in content.splitlines()]
+        return list(csv.DictReader(io.StringIO(content)))
+
+    def test_csv_export(self) -> None:
+        rows = self.export()
+
+        self.assertEqual([int(row["id"]) for row in rows], self.ids)
+        self.assertEqual(rows[0]["book_title"], "Book, 0")
+        self.assertEqual(rows[0]["borrow_date"], "2023-01-05")
+        self.assertEqual(rows[0]["actual_return_date"], "")
+        self.assertEqual(rows[0]["daily_fee"], "1.25")
+        self.assertEqual(rows[0]["user_email"], "admin@admin.com")
+        self.assertEqual(rows[0]["user_name"], "Ada Lovelace")
+        self.assertEqual(rows[1]["actual_return_date"], "2023-03-20")
+
+    def test_ndjson_export(self) -> None:
+        response = self.client.get(EXPORT_URL, {"output": "ndjson"})
+        rows = self.export(output="ndjson")
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual([row["id"] for row in rows], self.ids)
+        self.assertEqual(rows[0]["actual_return_date"], None)
+        self.assertEqual(rows[0]["daily_fee"], "1.25")
+        self.assertEqual(rows[1]["borrow_date"], "2023-02-10")
+
+    def test_export_filters(self) -> None:
+        reader = get_user_model().objects.get(email="reader@user.com")
+
+        self.assertEqual(
+            [int(row["id"]) for row in self.export(is_active=1)],
+            [self.ids[0], self.ids[2]],
+        )
+        self.assertEqual(
+            [int(row["id"]) for row in self.export(user_id=reader.id)],
+            [self.ids[1]],
+        )
+        self.assertEqual(
+            [int(row["id"]) for row in self.export(
+                borrowed_after="2023-02-10", borrowed_before="2023-03-14"
+            )],
+            [self.ids[1]],
+        )
+
+    def test_export_rejects_invalid_params(self) -> None:
+        for params in (
+            {"output": "xml"},
+            {"borrowed_after": "yesterday"},
+            {"borrowed_after": "2023-03-01", "borrowed_before": "2023-01-01"},
+        ):
+            response = self.client.get(EXPORT_URL, params)
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+    def test_export_admin_only(self) -> None:
+        self.client.force_authenticate(
+            get_user_model().objects.get(email="reader@user.com")
+        )
+        response = self.client.get(EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_reads_rows_while_streaming(self) -> None:
+        with override_settings(BORROWING_EXPORT_CHUNK_SIZE=2):
+            response = self.client.get(EXPORT_URL)
+            with CaptureQueriesContext(connection) as queries:
+                content = b"".join(response.streaming_content)
+
+        # one cursor, fetched two rows at a time, after the view returned
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(content.decode().splitlines()), 4)
+
+    def test_asgi_export(self) -> None:
+        token = RefreshToken.for_user(self.user).access_token
+        messages = []
+
+        async def receive() -> dict:
+            return {"type": "http.request"}
+
+        async def send(message: dict) -> None:
+            messages.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": EXPORT_URL,
+            "query_string": b"output=ndjson",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"authorization", f"Bearer {token}".encode()),
+            ],
+        }
+        # the handler would close the connection of the test transaction
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            with override_settings(BORROWING_EXPORT_CHUNK_SIZE=2):
+                async_to_sync(ASGIHandler())(scope, receive, send)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+
+        self.assertEqual(messages[0]["status"], status.HTTP_200_OK)
+        content = b"".join(message.get("body", b"") for message in messages)
+        self.assertEqual(
+            [json.loads(line)["id"] for line in content.splitlines()],
+            self.ids,
+        )
+        self.assertFalse(messages[-1].get("more_body", False))
+
+    def test_command_export(self) -> None:
+        stdout = io.StringIO()
+        call_command(
+            "export_borrowings",
+            "--format=ndjson",
+            "--is-active",
+            "--borrowed-before=2023-02-01",
+            stdout=stdout,
+        )
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+        self.assertEqual([row["id"] for row in rows], [self.ids[0]])
+        self.assertEqual(rows[0]["user_name"], "Ada Lovelace")
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    CHECKOUTS = 12
+    STOCK = 3
+
+    def checkout(
+            self,
+            book: Book,
+            barrier: threading.Barrier,
+            results: list,
+    ) -> None:
+        user = get_user_model().objects.create_user(
+            f"user{threading.get_ident()}@test.com",
+            "test12345"
+        )
+        # the test client shares request exceptions between instances
+        # through a global signal, so failures are read from status codes
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user)
+        payload = {
+            "expected_return_date": datetime.date.today()
+            + datetime.timedelta(days=7),
+            "book": book.id,
+        }
+        barrier.wait()
+        try:
+            results.append(client.post(BORROWING_URL, payload))
+        finally:
+            connection.close()
+
+    @mock.patch("borrowings.tasks.dispatch_outbox")
+    def test_parallel_checkouts_never_oversell(self, _) -> None:
+        book = sample_book(inventory=self.STOCK)
+        barrier = threading.Barrier(self.CHECKOUTS)
+        results = []
+        threads = [
+            threading.Thread(
+                target=self.checkout,
+                args=(book, barrier, results)
+            )
+            for _ in range(self.CHECKOUTS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        book.refresh_from_db()
+        self.assertEqual(len(results), self.CHECKOUTS)
+        created = [
+            response for response in results
+            if response.status_code == status.HTTP_201_CREATED
+        ]
+        self.assertEqual(len(created), self.STOCK)
+        for response in results:
+            if response not in created:
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+                self.assertEqual(
+                    response.data,
+                    {"book": ["This book is currently out of stock"]},
+                )
+        self.assertEqual(book.inventory, 0)
+        self.assertEqual(Borrowing.objects.count(), self.STOCK)
+
+
+    @mock.patch("borrowings.tasks.dispatch_outbox")
+    def test_restock_during_checkouts_keeps_every_change(self, _) -> None:
+        book = sample_book(inventory=self.CHECKOUTS)
+        barrier = threading.Barrier(self.CHECKOUTS + 1)
+        results = []
+        admin = get_user_model().objects.create_user(
+            "admin@admin.com", "admin12345", is_staff=True
+        )
+
+        def restock() -> None:
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(admin)
+            barrier.wait()
+            try:
+                results.append(client.post(
+                    reverse("books:book-bulk-inventory"),
+                    [{"id": book.id, "delta": 5}],
+                    format="json",
+                ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=restock)] + [
+            threading.Thread(
+                target=self.checkout,
+                args=(book, barrier, results)
+            )
+            for _ in range(self.CHECKOUTS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        book.refresh_from_db()
+        codes = [response.status_code for response in results]
+        self.assertEqual(codes.count(status.HTTP_200_OK), 1)
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), self.CHECKOUTS)
+        self.assertEqual(book.inventory, 5)
+
+
+class ConcurrentReturnTests(TransactionTestCase):
+    RETURNS = 8
+
+    def return_book(
+            self,
+            borrowing: Borrowing,
+            barrier: threading.Barrier,
+            results: list,
+    ) -> None:
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(borrowing.user)
+        barrier.wait()
+        try:
+            response = client.post(f"{detail_url(borrowing.id)}return/")
+            results.append(response.status_code)
+        finally:
+            connection.close()
+
+    def test_parallel_returns_restock_once(self) -> None:
+        user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test12345"
+        )
+        borrowing = sample_borrowing(
+            user=user,
+            expected_return_date=datetime.date.today()
+        )
+        barrier = threading.Barrier(self.RETURNS)
+        results = []
+        threads = [
+            threading.Thread(
+                target=self.return_book,
+                args=(borrowing, barrier, results)
+            )
+            for _ in range(self.RETURNS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        borrowing.book.refresh_from_db()
+        self.assertEqual(results.count(status.HTTP_200_OK), 1)
+        self.assertEqual(
+            results.count(status.HTTP_400_BAD_REQUEST), self.RETURNS - 1
+        )
+        self.assertEqual(borrowing.book.inventory, INVENTORY + 1)
+
+
+async def stub_sink(messages: list[str]) -> list:
+    return [None] * len(messages)
+
+
+class OutboxDispatchTests(TestCase):
+    def test_dispatch_marks_events_sent(self) -> None:
+        OutboxEvent.objects.bulk_create(
+            OutboxEvent(message=f"message {i}") for i in range(3)
+        )
+        sink = mock.AsyncMock(side_effect=stub_sink)
+
+        self.assertEqual(outbox.drain(batch_size=2, send=sink), 3)
+
+        self.assertEqual(sink.await_count, 2)
+        self.assertFalse(
+            OutboxEvent.objects.exclude(
+                status=OutboxEvent.StatusChoices.SENT
+            ).exists()
+        )
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_BACKOFF=10)
+    def test_failed_event_backs_off_then_dies(self) -> None:
+        event = OutboxEvent.objects.create(message="message")
+        failing_sink = mock.AsyncMock(side_effect=ConnectionError("down"))
+
+        with self.assertLogs("borrowings.outbox", "ERROR"):
+            outbox.dispatch_batch(send=failing_sink)
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.StatusChoices.PENDING)
+        self.assertEqual(event.attempts, 1)
+        self.assertIn("down", event.last_error)
+        self.assertGreater(
+            event.available_at,
+            timezone.now() + datetime.timedelta(seconds=5)
+        )
+
+        # not due yet, so the next run leaves it alone
+        self.assertEqual(outbox.dispatch_batch(send=failing_sink), 0)
+
+        OutboxEvent.objects.update(available_at=timezone.now())
+        with self.assertLogs("borrowings.outbox", "ERROR"):
+            outbox.dispatch_batch(send=failing_sink)
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.StatusChoices.DEAD)
+        self.assertEqual(event.attempts, 2)
+
+    def test_partial_batch_failure(self) -> None:
+        OutboxEvent.objects.bulk_create(
+            OutboxEvent(message=message) for message in ("ok", "fail")
+        )
+
+        async def sink(messages: list[str]) -> list:
+            return [
+                None if message == "ok" else ValueError(message)
+                for message in messages
+            ]
+
+        outbox.dispatch_batch(send=sink)
+
+        self.assertEqual(
+            OutboxEvent.objects.get(message="ok").status,
+            OutboxEvent.StatusChoices.SENT
+        )
+        self.assertEqual(
+            OutboxEvent.objects.get(message="fail").status,
+            OutboxEvent.StatusChoices.PENDING
+        )
+
+
+class ConcurrentOutboxDispatchTests(TransactionTestCase):
+    EVENTS = 200
+    DISPATCHERS = 4
+
+    def test_parallel_dispatchers_send_each_event_once(self) -> None:
+        OutboxEvent.objects.bulk_create(
+            OutboxEvent(message=str(i)) for i in range(self.EVENTS)
+        )
+        sent = []
+
+        async def sink(messages: list[str]) -> list:
+            sent.extend(messages)
+            await asyncio.sleep(0.01)
+            return [None] * len(messages)
+
+        def dispatcher() -> None:
+            try:
+                outbox.drain(batch_size=10, send=sink)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=dispatcher)
+            for _ in range(self.DISPATCHERS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(sent, key=int), [
+            str(i) for i in range(self.EVENTS)
+        ])
+        self.assertEqual(
+            OutboxEvent.objects.filter(
+                status=OutboxEvent.StatusChoices.SENT
+            ).count(),
+            self.EVENTS
+        )
+
+    def test_batch_is_sent_outside_a_transaction(self) -> None:
+        OutboxEvent.objects.bulk_create(
+            OutboxEvent(message=str(i)) for i in range(3)
+        )
+        seen = {}
+
+        def meanwhile() -> None:
+            try:
+                # the batch is leased, not locked
+                with transaction.atomic():
+                    seen["locked"] = list(
+                        OutboxEvent.objects.select_for_update(nowait=True)
+                    )
+                seen["claimed"] = outbox.dispatch_batch(send=stub_sink)
+            finally:
+                connection.close()
+
+        async def sink(messages: list[str]) -> list:
+            seen["in_transaction"] = connection.in_atomic_block
+            other = threading.Thread(target=meanwhile)
+            other.start()
+            other.join()
+            return [None] * len(messages)
+
+        self.assertEqual(outbox.dispatch_batch(send=sink), 3)
+
+        self.assertFalse(seen["in_transaction"])
+        self.assertEqual(len(seen["locked"]), 3)
+        self.assertEqual(seen["claimed"], 0)
+        self.assertEqual(
+            OutboxEvent.objects.filter(
+                status=OutboxEvent.StatusChoices.SENT
+            ).count(),
+            3
+        )
+
+    def test_expired_lease_is_left_to_the_new_claim(self) -> None:
+        event = OutboxEvent.objects.create(message="message")
+
+        def dispatch_again() -> None:
+            try:
+                outbox.dispatch_batch(send=stub_sink)
+            finally:
+                connection.close()
+
+        async def slow_sink(messages: list[str]) -> list:
+            # the lease runs out and another dispatcher sends the event
+            await sync_to_async(dispatch_again)()
+            return [ConnectionError("timed out")]
+
+        with override_settings(OUTBOX_CLAIM_LEASE=0):
+            outbox.dispatch_batch(send=slow_sink)
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.StatusChoices.SENT)
+        self.assertEqual(event.attempts, 1)
+
+    def test_checkout_does_not_wait_for_notification(self) -> None:
+        sink_delay = 1
+
+        async def slow_sink(messages: list[str]) -> list:
+            await asyncio.sleep(sink_delay)
+            return [None] * len(messages)
+
+        workers = []
+
+        def dispatch() -> None:
+            def work() -> None:
+                try:
+                    dispatch_outbox()
+                finally:
+                    connection.close()
+
+            worker = threading.Thread(target=work)
+            worker.start()
+            workers.append(worker)
+
+        user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test12345"
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        payload = {
+            "expected_return_date": datetime.date.today(),
+            "book": sample_book().id,
+        }
+        with mock.patch(
+            "borrowings.outbox.send_telegram_notifications",
+            side_effect=slow_sink
+        ) as sink, mock.patch.object(
+            dispatch_outbox, "delay", side_effect=dispatch
+        ):
+            started = time.perf_counter()
+            response = client.post(BORROWING_URL, payload)
+            elapsed = time.perf_counter() - started
+            for worker in workers:
+                worker.join()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertLess(elapsed, sink_delay / 2)
+        sink.assert_called_once()
+        self.assertEqual(
+            OutboxEvent.objects.get().status,
+            OutboxEvent.StatusChoices.SENT
+        )
+
+
+class OverdueReportTests(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test12345",
+            first_name="Test",
+            last_name="User"
+        )
+
+    def sample_overdue(self, count: int) -> None:
+        Borrowing.objects.bulk_create(
+            Borrowing(
+                book=sample_book(title=f"Book {i}"),
+                user=self.user,
+                expected_return_date=datetime.date.today()
+            )
+            for i in range(count)
+        )
+
+    def test_digests_respect_size(self) -> None:
+        lines = [f"line {i}" for i in range(5)]
+
+        digests = list(overdue.group_digests(lines, 2))
+
+        self.assertEqual(len(digests), 3)
+        self.assertEqual(
+            digests[0], "\n".join([overdue.DIGEST_HEADER, "line 0", "line 1"])
+        )
+        self.assertEqual(list(overdue.group_digests(lines, 1)), lines)
+
+    def test_digests_respect_message_length(self) -> None:
+        lines = ["x" * 1000] * 10
+
+        digests = list(overdue.group_digests(lines, 50))
+
+        self.assertEqual(len(digests), 3)
+        for digest in digests:
+            self.assertLessEqual(len(digest), overdue.MAX_MESSAGE_LENGTH)
+
+    @override_settings(OVERDUE_DIGEST_SIZE=1)
+    def test_overdue_report_query_count_is_flat(self) -> None:
+        self.sample_overdue(10)
+        returned = Borrowing.objects.first()
+        returned.actual_return_date = datetime.date.today()
+        returned.save()
+
+        with mock.patch(
+            "borrowings.tasks.send_telegram_notifications",
+            side_effect=stub_sink
+        ) as sink, self.assertNumQueries(1):
+            self.assertEqual(check_overdue_borrowings(), 9)
+
+        messages = sink.call_args.args[0]
+        self.assertIn(
+            "Borrowing of Book 1 is overdue by user Test User. "
+            f"Expected return date - {datetime.date.today()}",
+            messages
+        )
+
+    @override_settings(OVERDUE_DIGEST_SIZE=40, OVERDUE_MAX_MESSAGES=3)
+    def test_overdue_report_is_capped(self) -> None:
+        book = sample_book()
+        Borrowing.objects.bulk_create(
+            Borrowing(
+                book=book,
+                user=self.user,
+                expected_return_date=datetime.date.today()
+            )
+            for _ in range(5000)
+        )
+
+        with mock.patch(
+            "borrowings.tasks.send_telegram_notifications",
+            side_effect=stub_sink
+        ) as sink, self.assertNumQueries(2):
+            self.assertEqual(check_overdue_borrowings(), 4)
+
+        *digests, summary = sink.call_args.args[0]
+        for digest in digests:
+            self.assertEqual(len(digest.splitlines()), 41)
+        self.assertEqual(summary, "...and 4880 more overdue borrowings")
+
+    def test_report_that_fits_has_no_summary(self) -> None:
+        self.sample_overdue(4)
+
+        messages = overdue.overdue_report(datetime.date.today(), 2, 2)
+
+        self.assertEqual(len(messages), 2)
+        self.assertNotIn("more overdue", messages[-1])
+
+    def test_no_overdue_borrowings(self) -> None:
+        with mock.patch(
+            "borrowings.tasks.send_telegram_notifications",
+            side_effect=stub_sink
+        ) as sink:
+            check_overdue_borrowings()
+
+        sink.assert_called_once_with(["No borrowings overdue today!"])
+
+
+class TelegramSenderTests(TestCase):
+    def test_rate_limiter_spaces_calls(self) -> None:
+        async def burst() -> None:
+            limiter = RateLimiter(rate=50)
+            for _ in range(5):
+                await limiter.wait()
+
+        started = time.perf_counter()
+        asyncio.run(burst())
+
+        self.assertGreaterEqual(time.perf_counter() - started, 4 / 50)
+
+    @mock.patch("borrowings.telegram_notifications.telegram.Bot")
+    def test_send_collects_errors_and_retries_flood_control(
+            self, bot_class
+    ) -> None:
+        bot = bot_class.return_value.__aenter__.return_value
+        failure = telegram.error.BadRequest("chat not found")
+        bot.send_message = mock.AsyncMock(side_effect=[
+            None,
+            telegram.error.RetryAfter(0),
+            None,
+            failure,
+        ])
+
+        errors = asyncio.run(send_telegram_notifications(
+            ["first", "second", "third"], concurrency=1, rate=1000
+        ))
+
+        self.assertEqual(errors, [None, None, failure])
+        self.assertEqual(bot.send_message.await_count, 4)
+
+
+class BorrowingIndexTests(TestCase):
+    def setUp(self) -> None:
+        # on a near-empty table a sequential scan is always cheapest
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index: str) -> None:
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn("Seq Scan", plan)
+
+    def test_overdue_scan_uses_active_due_index(self) -> None:
+        self.assertUsesIndex(
+            overdue.overdue_borrowings(datetime.date.today()),
+            "borrowing_active_due_idx"
+        )
+
+    def test_user_list_uses_user_recent_index(self) -> None:
+        user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test12345"
+        )
+        self.assertUsesIndex(
+            Borrowing.objects.filter(user=user),
+            "borrowing_user_recent_idx"
+        )
+
+    def test_active_loans_of_book_use_active_book_index(self) -> None:
+        self.assertUsesIndex(
+            Borrowing.objects.filter(book=sample_book(), actual_return_date=None),
+            "borrowing_active_book_idx"
+        )
+
+
+@mock.patch("borrowings.management.commands.wait_for_db.time.sleep")
+class WaitForDbTests(TestCase):
+    # every database is checked, the replicas as well
+    databases = "__all__"
+
+    def wait(self, **options) -> str:
+        out = io.StringIO()
+        call_command("wait_for_db", stdout=out, **options)
+        return out.getvalue()
+
+    def test_retries_with_exponential_backoff(self, sleep) -> None:
+        with mock.patch.object(
+            connections["default"],
+            "ensure_connection",
+            side_effect=[OperationalError] * 4 + [None],
+        ):
+            output = self.wait(skip_redis=True, max_delay=0.5)
+
+        self.assertEqual(
+            [call.args[0] for call in sleep.call_args_list],
+            [0.1, 0.2, 0.4, 0.5]
+        )
+        self.assertIn("Database available!", output)
+
+    def test_fails_once_the_timeout_runs_out(self, sleep) -> None:
+        with mock.patch.object(
+            connections["default"],
+            "ensure_connection",
+            side_effect=OperationalError,
+        ):
+            with self.assertRaisesMessage(CommandError, "'default'"):
+                self.wait(skip_redis=True, timeout=0)
+        sleep.assert_not_called()
+
+    @override_settings(
+        CELERY_BROKER_URL="redis://redis:6379/0",
+        CELERY_RESULT_BACKEND="redis://redis:6379/0",
+        REDIS_CACHE_URL=None,
+    )
+    def test_waits_for_redis(self, sleep) -> None:
+        with mock.patch.object(
+            redis.Redis, "ping", side_effect=[redis.ConnectionError, True]
+        ) as ping:
+            output = self.wait()
+
+        self.assertEqual(ping.call_count, 2)
+        self.assertEqual(sleep.call_count, 1)
+        self.assertIn(
+            "Redis of CELERY_BROKER_URL and CELERY_RESULT_BACKEND available",
+            output
+        )
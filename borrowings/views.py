@@ -1,29 +1,58 @@
-import datetime
 from typing import Type, Optional, Any
 
 from django.db.models import QuerySet
+from django.http import Http404, StreamingHttpResponse
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.serializers import Serializer
+from rest_framework.serializers import Serializer, ValidationError
 
+from books.cache import invalidate_book
+from books.models import Book
+from borrowings.export import (
+    CONTENT_TYPES,
+    export_borrowings,
+    filter_borrowings
+)
 from borrowings.models import Borrowing
 from borrowings.permissions import IsAdminOrIfAuthenticatedReadOnly
+from borrowings.returns import return_borrowing
 from borrowings.serializers import (
+    BorrowingExportSerializer,
     BorrowingSerializer,
     BorrowingListSerializer,
     BorrowingReturnSerializer
 )
+from borrowings.values import BorrowingValuesMixin
+from rest_practice.asynchronous import AsyncReadMixin
+from rest_practice.conditional import (
+    STAMP_LOOKUP_ERRORS,
+    ConditionalGetMixin
+)
+from rest_practice.metrics import RETURNS
+from rest_practice.sparse import SPARSE_PARAMETERS, SparseQuerysetMixin
 
 
-class BorrowingViewSet(viewsets.ModelViewSet):
+class BorrowingViewSet(
+    ConditionalGetMixin,
+    SparseQuerysetMixin,
+    BorrowingValuesMixin,
+    AsyncReadMixin,
+    viewsets.ModelViewSet
+):
+    queryset = Borrowing.objects.select_related("book", "user").defer(
+        "book__search_vector"
+    )
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    # borrowings are rendered with their book, so its changes count too
+    stamp_models = (Borrowing, Book)
+    stamp_fields = ("updated_at", "book__updated_at")
 
     def get_queryset(self) -> QuerySet:
-        queryset = Borrowing.objects.all().select_related("book")
+        queryset = super().get_queryset()
 
         is_active = self.request.query_params.get("is_active")
         user_id = self.request.query_params.get("user_id")
@@ -40,6 +69,8 @@ class BorrowingViewSet(viewsets.ModelViewSet):
             return BorrowingListSerializer
         if self.action == "return_book":
             return BorrowingReturnSerializer
+        if self.action == "export":
+            return BorrowingExportSerializer
 
         return BorrowingSerializer
 
@@ -59,15 +90,24 @@ class BorrowingViewSet(viewsets.ModelViewSet):
     ) -> Response:
 
         """Endpoint for borrowing returning"""
-        borrowing = self.get_object()
-        book = borrowing.book
-        serializer = self.get_serializer(borrowing, data=request.data)
-
-        serializer.is_valid(raise_exception=True)
-        book.inventory += 1
-        book.save()
-        borrowing.actual_return_date = datetime.date.today()
-        serializer.save()
+        try:
+            borrowings = self.filter_queryset(self.get_queryset()).filter(
+                pk=pk
+            )
+        except STAMP_LOOKUP_ERRORS:
+            # a malformed pk, as get_object() would report it
+            raise Http404
+        book_id = return_borrowing(borrowings)
+        if book_id is None:
+            # 404 for foreign borrowings, 400 for already returned ones
+            borrowing = self.get_object()
+            RETURNS.labels("rejected").inc()
+            serializer = self.get_serializer(borrowing, data=request.data)
+            serializer.is_valid(raise_exception=True)
+            # returned by a concurrent request between the two queries
+            raise ValidationError("This book is already returned")
+        invalidate_book(book_id)
+        RETURNS.labels("returned").inc()
 
         return Response(
             {"status": "Your book was successfully returned",
@@ -89,6 +129,7 @@ class BorrowingViewSet(viewsets.ModelViewSet):
                 description="filter borrowings by user id: "
                             "available for admin only (ex: ?actors=1,2)"
             ),
+            *SPARSE_PARAMETERS,
         ]
     )
     def list(
@@ -98,3 +139,37 @@ class BorrowingViewSet(viewsets.ModelViewSet):
             **kwargs: Any
     ) -> Response:
         return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[BorrowingExportSerializer],
+        responses={(200, content_type): str for content_type in (
+            CONTENT_TYPES.values()
+        )},
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        permission_classes=[IsAdminUser],
+    )
+    def export(self, request: Request) -> StreamingHttpResponse:
+        """
+        Stream borrowing history as CSV or NDJSON, with the list filters
+        and an inclusive borrow date range
+        """
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        output = serializer.validated_data["output"]
+        queryset = filter_borrowings(
+            self.get_queryset(),
+            borrowed_after=serializer.validated_data.get("borrowed_after"),
+            borrowed_before=serializer.validated_data.get("borrowed_before"),
+        )
+
+        response = StreamingHttpResponse(
+            export_borrowings(queryset, output),
+            content_type=CONTENT_TYPES[output],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="borrowings.{output}"'
+        )
+        return response
@@ -0,0 +1,33 @@
+"""
+Gunicorn settings, read from the working directory:
+
+    gunicorn rest_practice.asgi:application
+
+serves the API on ASGI through uvicorn workers, with the async read
+views. GUNICORN_WORKER_CLASS=sync with rest_practice.wsgi:application
+serves the sync stack instead.
+
+With PROMETHEUS_MULTIPROC_DIR set, the live gauges of a worker that
+exits are dropped so a scrape no longer adds them up.
+"""
+import multiprocessing
+import os
+from typing import Any
+
+from prometheus_client import multiprocess
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(
+    os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1)
+)
+worker_class = os.environ.get(
+    "GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker"
+)
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+
+def child_exit(server: Any, worker: Any) -> None:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
@@ -9,8 +9,17 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rest_practice.settings")
+# serve the hot reads from async views, see rest_practice.asynchronous
+os.environ.setdefault("ASYNC_VIEWS", "1")
+# share connections across the per-request threads, see rest_practice.pooled
+os.environ.setdefault("POSTGRES_POOL_SIZE", "10")
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+# get_asgi_application() with a handler that streams from the database
+from rest_practice.asynchronous import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
@@ -0,0 +1,274 @@
+"""
+Async list and retrieve for the hot reads, served when the project runs
+on ASGI with ASYNC_VIEWS on (asgi.py sets it).
+
+DRF views are synchronous, so the async path keeps DRF for what is
+plain computation (request parsing, permissions, serializers) and
+awaits only the I/O: the JWT user lookup, the response cache and the
+queries, through Django's async ORM and cache APIs. Other methods and
+actions, checkout and return among them, run the sync view in the
+request's thread, as Django does for any sync view under ASGI.
+
+ASGIHandler serves the project on ASGI (asgi.py), iterating streaming
+responses in the request's thread as well.
+"""
+import functools
+from typing import Any, Awaitable, Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers import asgi
+from django.db.models import Model, QuerySet
+from django.http import Http404, HttpRequest, HttpResponseBase
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken
+)
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import Token
+
+
+async def aget_jwt_user(
+        authenticator: JWTAuthentication,
+        validated_token: Token,
+) -> Model:
+    """JWTAuthentication.get_user() through the async ORM"""
+    try:
+        user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken(
+            _("Token contained no recognizable user identification")
+        )
+
+    user_model = authenticator.user_model
+    try:
+        user = await user_model.objects.aget(
+            **{jwt_settings.USER_ID_FIELD: user_id}
+        )
+    except user_model.DoesNotExist:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+    if not user.is_active:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    return user
+
+
+async def aauthenticate_jwt(
+        authenticator: JWTAuthentication,
+        request: Request,
+) -> Optional[tuple[Model, Token]]:
+    header = authenticator.get_header(request)
+    if header is None:
+        return None
+    raw_token = authenticator.get_raw_token(header)
+    if raw_token is None:
+        return None
+
+    validated_token = authenticator.get_validated_token(raw_token)
+    return await aget_jwt_user(authenticator, validated_token), validated_token
+
+
+async def aauthenticate(request: Request) -> None:
+    """
+    Request._authenticate() awaiting the authenticators, so reading
+    request.user later needs no query
+    """
+    for authenticator in request.authenticators:
+        try:
+            if isinstance(authenticator, JWTAuthentication):
+                user_auth = await aauthenticate_jwt(authenticator, request)
+            else:
+                user_auth = await sync_to_async(authenticator.authenticate)(
+                    request
+                )
+        except exceptions.APIException:
+            request._not_authenticated()
+            raise
+
+        if user_auth is not None:
+            request._authenticator = authenticator
+            request.user, request.auth = user_auth
+            return
+
+    request._not_authenticated()
+
+
+class AsyncReadMixin:
+    """
+    With ASYNC_VIEWS on, as_view() returns a coroutine view that serves
+    an action from its ``a<action>`` coroutine (``a<method>`` on views
+    without actions) and every other request from the sync view.
+    Goes right before the DRF view class in the bases, so the async
+    twins of the other mixins wrap the list and retrieve below.
+    """
+
+    @classmethod
+    def as_view(cls, *args: Any, **initkwargs: Any) -> Callable:
+        view = super().as_view(*args, **initkwargs)
+        if not settings.ASYNC_VIEWS:
+            return view
+
+        actions = getattr(view, "actions", None)
+        sync_view = sync_to_async(view)
+
+        async def async_view(
+                request: HttpRequest,
+                *args: Any,
+                **kwargs: Any
+        ) -> HttpResponseBase:
+            method = request.method.lower()
+            name = actions.get(method) if actions else method
+            if name is None or not hasattr(cls, f"a{name}"):
+                return await sync_view(request, *args, **kwargs)
+            self = cls(**view.initkwargs)
+            return await self.adispatch(
+                request, actions, name, *args, **kwargs
+            )
+
+        # keeps cls, actions and csrf_exempt for the router and middleware
+        return functools.update_wrapper(async_view, view)
+
+    async def adispatch(
+            self,
+            request: HttpRequest,
+            actions: Optional[dict[str, str]],
+            name: str,
+            *args: Any,
+            **kwargs: Any
+    ) -> HttpResponseBase:
+        """APIView.dispatch() with the handler and authentication awaited"""
+        self.args, self.kwargs = args, kwargs
+        if actions:
+            # what ViewSetMixin.as_view() sets up for the sync view
+            self.action_map = actions
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await aauthenticate(request)
+            self.initial(request, *args, **kwargs)
+            handler = getattr(self, f"a{name}")
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response
+
+    async def aget_read_queryset(self) -> QuerySet:
+        """
+        filter_queryset(get_queryset()) for the async path; views whose
+        queryset building can query override it
+        """
+        return self.filter_queryset(self.get_queryset())
+
+    async def apaginate_queryset(self, queryset: QuerySet) -> Optional[list]:
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(
+            queryset, self.request, view=self
+        )
+
+    async def aget_object(self) -> Model:
+        queryset = await self.aget_read_queryset()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (
+            queryset.model.DoesNotExist,
+            TypeError,
+            ValueError,
+            DjangoValidationError,
+        ):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def alist(
+            self,
+            request: Request,
+            *args: Any,
+            **kwargs: Any
+    ) -> Response:
+        queryset = await self.aget_read_queryset()
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(
+            [obj async for obj in queryset], many=True
+        )
+        return Response(serializer.data)
+
+    async def aretrieve(
+            self,
+            request: Request,
+            *args: Any,
+            **kwargs: Any
+    ) -> Response:
+        serializer = self.get_serializer(await self.aget_object())
+        return Response(serializer.data)
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """
+    Django's ASGI handler, pulling the parts of a streaming response in
+    the request's thread. Django 4.1 iterates them on the event loop,
+    where a generator reading from the database, like the borrowing
+    export's, fails with SynchronousOnlyOperation.
+    """
+
+    async def send_response(
+            self,
+            response: HttpResponseBase,
+            send: Callable[[dict], Awaitable[None]],
+    ) -> None:
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": response_headers(response),
+        })
+        # thread sensitive, so in the thread (and on the connection) the
+        # sync view ran in
+        next_part = sync_to_async(next, thread_sensitive=True)
+        parts = iter(response)
+        while (part := await next_part(parts, None)) is not None:
+            for chunk, _last in self.chunk_bytes(part):
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": True,
+                })
+        await send({"type": "http.response.body"})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def response_headers(response: HttpResponseBase) -> list[tuple[bytes, bytes]]:
+    """The headers and cookies of a response, as ASGIHandler sends them"""
+    headers = [
+        (
+            header.encode("ascii") if isinstance(header, str) else header,
+            value.encode("latin1") if isinstance(value, str) else value,
+        )
+        for header, value in response.items()
+    ]
+    headers.extend(
+        (b"Set-Cookie", cookie.output(header="").encode("ascii").strip())
+        for cookie in response.cookies.values()
+    )
+    return headers
@@ -0,0 +1,271 @@
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Awaitable, Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponseBase
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from rest_practice.metrics import CACHE_EVENTS
+from rest_practice.replicas import read_from_primary
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def record(event: str) -> None:
+    with _stats_lock:
+        _stats[event] += 1
+    CACHE_EVENTS.labels(event).inc()
+
+
+def cache_stats() -> dict[str, int]:
+    """Hits, misses and lock waits of this process"""
+    with _stats_lock:
+        return {
+            event: _stats[event]
+            for event in ("hits", "misses", "lock_waits", "lock_timeouts")
+        }
+
+
+def generation_key(namespace: str, scope: Any = None) -> str:
+    if scope is None:
+        return f"{namespace}:generation"
+    return f"{namespace}:{scope}:generation"
+
+
+def generation_keys(namespace: str, pk: Optional[Any] = None) -> list[str]:
+    if pk is None:
+        return [generation_key(namespace)]
+    return [
+        generation_key(namespace, "objects"),
+        generation_key(namespace, pk),
+    ]
+
+
+def get_generation(namespace: str, pk: Optional[Any] = None) -> str:
+    """Token of the lists of ``namespace``, or of the object ``pk``"""
+    keys = generation_keys(namespace, pk)
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    for key in missing:
+        # random rather than counted, so an evicted generation can never
+        # come back and resurrect the entries stored under it
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+    if missing:
+        generations.update(cache.get_many(missing))
+    return ":".join(generations[key] for key in keys)
+
+
+async def aget_generation(namespace: str, pk: Optional[Any] = None) -> str:
+    keys = generation_keys(namespace, pk)
+    generations = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in generations]
+    for key in missing:
+        await cache.aadd(key, uuid.uuid4().hex, timeout=None)
+    if missing:
+        generations.update(await cache.aget_many(missing))
+    return ":".join(generations[key] for key in keys)
+
+
+def invalidate(namespace: str, pk: Optional[Any] = None) -> None:
+    """
+    Orphans every cached list of ``namespace`` and the cached details
+    of the object ``pk``, or of all its objects when ``pk`` is None.
+    Nothing is enumerated or deleted: new generation tokens lead
+    readers to new keys and the old entries expire on their own.
+    """
+    scope = "objects" if pk is None else pk
+    cache.set_many(
+        {
+            generation_key(namespace): uuid.uuid4().hex,
+            generation_key(namespace, scope): uuid.uuid4().hex,
+        },
+        timeout=None,
+    )
+
+
+class CachedResponseMixin:
+    """
+    Caches list and retrieve data together with the conditional GET
+    stamp, so a hit runs no database queries at all. Lists are keyed
+    by the absolute URL under the namespace generation, details under
+    the generations of all objects and of their own. A miss takes a
+    short lock; other requests missing the same key meanwhile wait for
+    its result instead of all rebuilding it at once.
+    Goes before ConditionalGetMixin in the bases.
+    """
+
+    cache_namespace: str
+
+    def get_cache_key(self, generation: Optional[str] = None) -> str:
+        if generation is None:
+            generation = get_generation(
+                self.cache_namespace, self.get_cache_pk()
+            )
+        url = hashlib.sha1(self.request.build_absolute_uri().encode())
+        return f"{self.cache_namespace}:{generation}:{url.hexdigest()}"
+
+    def get_cache_pk(self) -> Optional[Any]:
+        return self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+
+    def load_cache_entry(self) -> Optional[dict[str, Any]]:
+        # the generation is read before the database, so data a writer
+        # commits later is never stored under the generation it replaces
+        self.cache_key = self.get_cache_key()
+        self.cache_lock = None
+        entry = cache.get(self.cache_key)
+        if entry is None:
+            lock = f"{self.cache_key}:lock"
+            if cache.add(lock, 1, settings.RESPONSE_CACHE_LOCK_TIMEOUT):
+                self.cache_lock = lock
+            else:
+                entry = self.wait_for_cache_entry()
+
+        record("hits" if entry is not None else "misses")
+        return entry
+
+    async def aload_cache_entry(self) -> Optional[dict[str, Any]]:
+        self.cache_key = self.get_cache_key(
+            await aget_generation(self.cache_namespace, self.get_cache_pk())
+        )
+        self.cache_lock = None
+        entry = await cache.aget(self.cache_key)
+        if entry is None:
+            lock = f"{self.cache_key}:lock"
+            if await cache.aadd(
+                lock, 1, settings.RESPONSE_CACHE_LOCK_TIMEOUT
+            ):
+                self.cache_lock = lock
+            else:
+                entry = await self.await_for_cache_entry()
+
+        record("hits" if entry is not None else "misses")
+        return entry
+
+    def wait_for_cache_entry(self) -> Optional[dict[str, Any]]:
+        record("lock_waits")
+        deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(settings.RESPONSE_CACHE_POLL_INTERVAL)
+            entry = cache.get(self.cache_key)
+            if entry is not None:
+                return entry
+
+        record("lock_timeouts")
+        return None
+
+    async def await_for_cache_entry(self) -> Optional[dict[str, Any]]:
+        record("lock_waits")
+        deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(settings.RESPONSE_CACHE_POLL_INTERVAL)
+            entry = await cache.aget(self.cache_key)
+            if entry is not None:
+                return entry
+
+        record("lock_timeouts")
+        return None
+
+    def cached_stamp(self, get_stamp: Callable[[], Any]) -> Any:
+        self.cache_entry = self.load_cache_entry()
+        if self.cache_entry is not None:
+            return self.cache_entry["stamp"]
+        # a replica may still lack the write behind a new generation, and
+        # an entry built from it would be stale for the generation's life
+        read_from_primary()
+        return get_stamp()
+
+    async def acached_stamp(
+            self,
+            get_stamp: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        self.cache_entry = await self.aload_cache_entry()
+        if self.cache_entry is not None:
+            return self.cache_entry["stamp"]
+        read_from_primary()
+        return await get_stamp()
+
+    def get_list_stamp(self) -> Any:
+        return self.cached_stamp(super().get_list_stamp)
+
+    def get_object_stamp(self) -> Any:
+        return self.cached_stamp(super().get_object_stamp)
+
+    async def aget_list_stamp(self) -> Any:
+        return await self.acached_stamp(super().aget_list_stamp)
+
+    async def aget_object_stamp(self) -> Any:
+        return await self.acached_stamp(super().aget_object_stamp)
+
+    def conditional_response(
+            self,
+            stamp: Any,
+            view: Callable[..., HttpResponseBase],
+            request: Request,
+            *args: Any,
+            **kwargs: Any
+    ) -> HttpResponseBase:
+        def cached_view(
+                request: Request,
+                *args: Any,
+                **kwargs: Any
+        ) -> HttpResponseBase:
+            if self.cache_entry is not None:
+                return Response(self.cache_entry["data"])
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(
+                    self.cache_key,
+                    {"stamp": stamp, "data": response.data},
+                    settings.RESPONSE_CACHE_TIMEOUT,
+                )
+            return response
+
+        try:
+            return super().conditional_response(
+                stamp, cached_view, request, *args, **kwargs
+            )
+        finally:
+            if self.cache_lock:
+                cache.delete(self.cache_lock)
+
+    async def aconditional_response(
+            self,
+            stamp: Any,
+            view: Callable[..., Awaitable[HttpResponseBase]],
+            request: Request,
+            *args: Any,
+            **kwargs: Any
+    ) -> HttpResponseBase:
+        async def cached_view(
+                request: Request,
+                *args: Any,
+                **kwargs: Any
+        ) -> HttpResponseBase:
+            if self.cache_entry is not None:
+                return Response(self.cache_entry["data"])
+
+            response = await view(request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(
+                    self.cache_key,
+                    {"stamp": stamp, "data": response.data},
+                    settings.RESPONSE_CACHE_TIMEOUT,
+                )
+            return response
+
+        try:
+            return await super().aconditional_response(
+                stamp, cached_view, request, *args, **kwargs
+            )
+        finally:
+            if self.cache_lock:
+                await cache.adelete(self.cache_lock)
@@ -15,3 +15,6 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
+
+# Task duration and failure metrics, recorded through Celery signals
+import rest_practice.metrics  # noqa: E402, F401
@@ -0,0 +1,233 @@
+"""
+Prometheus metrics for the API, Celery tasks and notifications, scraped
+from /metrics/ with METRICS_TOKEN as a bearer token.
+
+Each process keeps its own values. With PROMETHEUS_MULTIPROC_DIR set to
+a directory shared by every web and worker process (and emptied before
+they start), they write there instead and a scrape adds them up, so
+prefork servers and Celery workers report correctly.
+"""
+import asyncio
+import contextvars
+import hmac
+import os
+import time
+from typing import Callable, Optional
+
+from asgiref.sync import markcoroutinefunction
+from celery import signals
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from rest_practice.profiling import install_execute_wrapper
+
+REQUEST_LATENCY = Histogram(
+    "api_request_duration_seconds",
+    "API request latency by view action",
+    ["view", "method", "status"],
+)
+REQUEST_QUERIES = Histogram(
+    "api_request_queries",
+    "Database queries per API request",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, float("inf")),
+)
+CHECKOUTS = Counter(
+    "library_checkouts_total",
+    "Checkout attempts by outcome: borrowed or out_of_stock",
+    ["outcome"],
+)
+RETURNS = Counter(
+    "library_returns_total",
+    "Return attempts by outcome: returned or rejected",
+    ["outcome"],
+)
+CACHE_EVENTS = Counter(
+    "response_cache_events_total",
+    "Response cache hits, misses, lock waits and lock timeouts",
+    ["event"],
+)
+TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Celery task run time",
+    ["task"],
+)
+TASK_FAILURES = Counter(
+    "celery_task_failures_total",
+    "Celery tasks that raised",
+    ["task"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Pooled database connections by state: in_use or idle",
+    ["database", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time to get a connection from the database pool",
+    ["database"],
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, float("inf")),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Connects that gave up waiting for a free pooled connection",
+    ["database"],
+)
+TELEGRAM_SEND_LATENCY = Histogram(
+    "telegram_send_duration_seconds",
+    "Telegram sendMessage call latency",
+)
+TELEGRAM_SENDS = Counter(
+    "telegram_sends_total",
+    "Telegram sendMessage calls by outcome: sent, flood_wait or error",
+    ["outcome"],
+)
+
+
+def view_name(request: HttpRequest) -> str:
+    """``BookViewSet.list`` style name of the view that answered"""
+    match = request.resolver_match
+    if match is None:
+        return "unmatched"
+    view = match.func
+    actions = getattr(view, "actions", None)
+    view_class = getattr(view, "cls", None) or getattr(
+        view, "view_class", None
+    )
+    if view_class is None:
+        return match.view_name
+    action = (
+        actions.get(request.method.lower(), "unknown") if actions
+        else request.method.lower()
+    )
+    return f"{view_class.__name__}.{action}"
+
+
+_queries: contextvars.ContextVar[Optional[list[int]]] = (
+    contextvars.ContextVar("request_queries", default=None)
+)
+
+
+def count_query(execute, sql, params, many, context):
+    queries = _queries.get()
+    if queries is not None:
+        queries[0] += 1
+    return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Latency and query count of every request, labelled by view action"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        install_execute_wrapper(count_query)
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+
+        token = _queries.set([0])
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            queries = _queries.get()[0]
+            _queries.reset(token)
+        self.observe(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        token = _queries.set([0])
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            queries = _queries.get()[0]
+            _queries.reset(token)
+        self.observe(request, response, time.perf_counter() - started, queries)
+        return response
+
+    @staticmethod
+    def observe(
+            request: HttpRequest,
+            response: HttpResponse,
+            elapsed: float,
+            queries: int,
+    ) -> None:
+        view = view_name(request)
+        REQUEST_LATENCY.labels(
+            view, request.method, f"{response.status_code // 100}xx"
+        ).observe(elapsed)
+        REQUEST_QUERIES.labels(view).observe(queries)
+
+
+def may_scrape(request: HttpRequest) -> bool:
+    """Scrapers send METRICS_TOKEN; staff signed in to the admin may look"""
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(),
+        f"Bearer {token}".encode(),
+    ):
+        return True
+    return request.user.is_staff
+
+
+@require_GET
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    if not may_scrape(request):
+        return HttpResponseForbidden()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
+
+
+_task_started: dict[str, float] = {}
+
+
+@signals.task_prerun.connect
+def task_started(task_id: str, **kwargs) -> None:
+    _task_started[task_id] = time.perf_counter()
+
+
+@signals.task_postrun.connect
+def task_finished(task_id: str, task, **kwargs) -> None:
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_DURATION.labels(task.name).observe(
+            time.perf_counter() - started
+        )
+
+
+@signals.task_failure.connect
+def task_failed(sender, **kwargs) -> None:
+    TASK_FAILURES.labels(sender.name).inc()
+
+
+@signals.worker_process_shutdown.connect
+def worker_process_exited(pid: int, **kwargs) -> None:
+    # gunicorn.conf.py does the same for the web workers
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
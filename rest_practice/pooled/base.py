@@ -0,0 +1,270 @@
+"""
+PostgreSQL backend that takes its connections from an in-process pool,
+for ASGI and threaded servers:
+
+    "ENGINE": "rest_practice.pooled",
+    "CONN_MAX_AGE": 0,
+    "OPTIONS": {"pool": {"max_size": 10, "timeout": 10}},
+
+Django keeps a connection per thread, and under ASGI every request runs
+in a thread of its own, so CONN_MAX_AGE cannot carry a connection from
+one request to the next there. With this backend closing a connection
+hands it back to the pool instead, and the next connect in any thread
+of the process reuses it. At most ``max_size`` connections are open per
+process; a connect beyond that waits up to ``timeout`` seconds for one
+to come back and then fails with an OperationalError.
+
+A connection goes back rolled back to a clean transaction state. Session
+state a request changed on purpose (SET, cursors WITH HOLD) stays, as it
+does with CONN_MAX_AGE.
+"""
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+from django.db.backends.postgresql import base, creation
+from django.utils.asyncio import async_unsafe
+
+from rest_practice.metrics import (
+    DB_POOL_CONNECTIONS,
+    DB_POOL_TIMEOUTS,
+    DB_POOL_WAIT,
+)
+
+DEFAULT_MAX_SIZE = 10
+DEFAULT_TIMEOUT = 10  # seconds a connect waits for a free connection
+DEFAULT_MAX_IDLE = 5 * 60  # seconds before an unused connection is closed
+# connections idle for longer are checked with a query before reuse,
+# when CONN_HEALTH_CHECKS is on
+HEALTH_CHECK_AFTER = 30
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection came free in time; Django raises OperationalError"""
+
+
+class ConnectionPool:
+    """
+    Up to ``max_size`` connections made by ``connect``, shared by the
+    threads of the process. The most recently returned idle connection
+    is handed out first, so the rest age out after ``max_idle`` seconds
+    when the load drops.
+    """
+
+    def __init__(
+            self,
+            connect: Callable[[], Any],
+            name: str = "default",
+            max_size: int = DEFAULT_MAX_SIZE,
+            timeout: float = DEFAULT_TIMEOUT,
+            max_idle: float = DEFAULT_MAX_IDLE,
+            health_checks: bool = False,
+    ) -> None:
+        self.connect = connect
+        self.name = name
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_checks = health_checks
+        self.in_use = 0
+        # (connection, monotonic time it was returned), newest last
+        self.idle: deque[tuple[Any, float]] = deque()
+        self.condition = threading.Condition()
+
+    def getconn(self) -> Any:
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            with self.condition:
+                while not self.idle and self.in_use >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        DB_POOL_TIMEOUTS.labels(self.name).inc()
+                        raise PoolTimeout(
+                            f"No connection of the {self.name!r} pool "
+                            f"came free in {self.timeout} seconds"
+                        )
+                    self.condition.wait(remaining)
+                connection, returned = (
+                    self.idle.pop() if self.idle else (None, None)
+                )
+                self.in_use += 1
+                self.update_gauges()
+
+            if connection is None:
+                try:
+                    connection = self.connect()
+                except Exception:
+                    self.release()
+                    raise
+            elif not self.usable(connection, returned):
+                self.release(connection)
+                continue
+            DB_POOL_WAIT.labels(self.name).observe(
+                time.monotonic() - started
+            )
+            return connection
+
+    def putconn(self, connection: Any, discard: bool = False) -> None:
+        """Takes a connection back, or closes it if it cannot be reused"""
+        if discard or not self.reset(connection):
+            self.release(connection)
+            return
+        now = time.monotonic()
+        with self.condition:
+            self.in_use -= 1
+            self.idle.append((connection, now))
+            expired = []
+            while self.idle and now - self.idle[0][1] > self.max_idle:
+                expired.append(self.idle.popleft()[0])
+            self.update_gauges()
+            self.condition.notify()
+        for connection in expired:
+            connection.close()
+
+    def release(self, connection: Any = None) -> None:
+        """Gives up a checked out slot, closing its connection"""
+        if connection is not None:
+            connection.close()
+        with self.condition:
+            self.in_use -= 1
+            self.update_gauges()
+            self.condition.notify()
+
+    def close(self) -> None:
+        """Closes the idle connections; those in use close on return"""
+        with self.condition:
+            idle = [connection for connection, _ in self.idle]
+            self.idle.clear()
+            self.update_gauges()
+        for connection in idle:
+            connection.close()
+
+    def usable(self, connection: Any, returned: float) -> bool:
+        if connection.closed:
+            return False
+        if time.monotonic() - returned > self.max_idle:
+            return False
+        if self.health_checks and (
+            time.monotonic() - returned > HEALTH_CHECK_AFTER
+        ):
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except psycopg2.Error:
+                return False
+            return self.reset(connection)
+        return True
+
+    @staticmethod
+    def reset(connection: Any) -> bool:
+        """Ends a transaction left open; False if the connection is broken"""
+        if connection.closed:
+            return False
+        status = connection.info.transaction_status
+        if status == psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return True
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        try:
+            connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def update_gauges(self) -> None:
+        DB_POOL_CONNECTIONS.labels(self.name, "in_use").set(self.in_use)
+        DB_POOL_CONNECTIONS.labels(self.name, "idle").set(len(self.idle))
+
+
+_pools: dict[tuple[str, str], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(
+        alias: str,
+        conn_params: dict[str, Any],
+        settings_dict: dict[str, Any],
+) -> ConnectionPool:
+    """
+    The pool of a database, one per set of connection parameters, as
+    the test runner points an alias at another database
+    """
+    key = (alias, repr(sorted(conn_params.items())))
+    with _pools_lock:
+        if key not in _pools:
+            options = settings_dict["OPTIONS"]
+            pool_options = options.get("pool", {})
+            _pools[key] = ConnectionPool(
+                lambda: connect(conn_params, options),
+                name=alias,
+                max_size=pool_options.get("max_size", DEFAULT_MAX_SIZE),
+                timeout=pool_options.get("timeout", DEFAULT_TIMEOUT),
+                max_idle=pool_options.get("max_idle", DEFAULT_MAX_IDLE),
+                health_checks=settings_dict["CONN_HEALTH_CHECKS"],
+            )
+        return _pools[key]
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def connect(conn_params: dict[str, Any], options: dict[str, Any]) -> Any:
+    """A new connection, set up as the stock backend sets it up"""
+    connection = psycopg2.connect(**conn_params)
+    isolation_level = options.get("isolation_level")
+    if isolation_level not in (None, connection.isolation_level):
+        connection.set_session(isolation_level=isolation_level)
+    psycopg2.extras.register_default_jsonb(
+        conn_or_curs=connection, loads=lambda x: x
+    )
+    return connection
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(
+            self,
+            test_database_name: str,
+            verbosity: int,
+    ) -> None:
+        # pooled connections to the test database would block DROP DATABASE
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_connection_params(self) -> dict[str, Any]:
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params: dict[str, Any]) -> Any:
+        self.pool = get_pool(self.alias, conn_params, self.settings_dict)
+        connection = self.pool.getconn()
+        self.isolation_level = connection.isolation_level
+        # a thread that ends without closing its connection gives it back
+        # when its wrapper is collected, rather than holding the slot
+        self.give_back = weakref.finalize(self, self.pool.putconn, connection)
+        return connection
+
+    def _close(self) -> None:
+        if self.connection is None:
+            return
+        self.give_back.detach()
+        with self.wrap_database_errors:
+            # close() keeps a connection closed inside atomic() around
+            # until the block exits, so it must not serve anyone else
+            self.pool.putconn(self.connection, discard=self.in_atomic_block)
@@ -0,0 +1,307 @@
+import asyncio
+import contextlib
+import contextvars
+import cProfile
+import functools
+import json
+import logging
+import random
+import re
+import time
+import types
+from collections import defaultdict
+from importlib import import_module
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "HTTP_X_PROFILE"  # X-Profile: 1, honoured for staff
+
+
+class RequestProfile:
+    """Time per phase and SQL statements of one request"""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = defaultdict(float)
+        self.queries = 0
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.phases["sql"] += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self.started) * 1000
+        timings = [
+            f'sql;dur={self.phases["sql"] * 1000:.1f};'
+            f'desc="{self.queries} queries"',
+            *(
+                f"{phase};dur={seconds * 1000:.1f}"
+                for phase, seconds in self.phases.items() if phase != "sql"
+            ),
+            f"total;dur={total:.1f}",
+        ]
+        return ", ".join(timings)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "queries": self.queries,
+            **{
+                f"{phase}_ms": round(seconds * 1000, 2)
+                for phase, seconds in self.phases.items()
+            },
+        }
+
+
+_current: contextvars.ContextVar[Optional[RequestProfile]] = (
+    contextvars.ContextVar("request_profile", default=None)
+)
+
+
+@contextlib.contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Adds the block's time to ``phase`` of the request being profiled"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.phases[phase] += time.perf_counter() - started
+
+
+def install_execute_wrapper(wrapper: Callable) -> None:
+    """
+    Runs ``wrapper`` around the statements of every connection, open
+    now or later in any thread. Wrappers read the request from context
+    variables, which follow it into the threads ASGI and the async ORM
+    run its queries in; an execute_wrapper() entered by the middleware
+    would only see the middleware's own thread.
+    """
+    def install(connection) -> None:
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    for connection in connections.all():
+        install(connection)
+    connection_created.connect(
+        lambda sender, connection, **kwargs: install(connection),
+        weak=False,
+        dispatch_uid=f"{wrapper.__module__}.{wrapper.__qualname__}",
+    )
+
+
+def profiled_execute(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.execute(execute, sql, params, many, context)
+
+
+def timed_method(phase: str, method: Callable) -> Callable:
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return method(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            profile.phases[phase] += time.perf_counter() - started
+
+    return wrapper
+
+
+def timed_property(phase: str, prop: property) -> property:
+    return property(timed_method(phase, prop.fget))
+
+
+def instrument() -> None:
+    """
+    Times the DRF steps every API view goes through, including third
+    party ones: authentication, permission checks, serializer output and
+    rendering. Runs once, and only when profiling is switched on.
+    """
+    if getattr(APIView, "_profiled", False):
+        return
+    APIView._profiled = True
+    APIView.perform_authentication = timed_method(
+        "auth", APIView.perform_authentication
+    )
+    APIView.check_permissions = timed_method(
+        "perm", APIView.check_permissions
+    )
+    APIView.check_object_permissions = timed_method(
+        "perm", APIView.check_object_permissions
+    )
+    serializers.Serializer.data = timed_property(
+        "serialize", serializers.Serializer.data
+    )
+    serializers.ListSerializer.data = timed_property(
+        "serialize", serializers.ListSerializer.data
+    )
+    Response.rendered_content = timed_property(
+        "render", Response.rendered_content
+    )
+
+
+def is_staff_request(request: HttpRequest) -> bool:
+    """
+    Whether the session or the JWT of a request belongs to staff, found
+    before the view runs so nobody else gets a profiler started
+    """
+    # the middleware runs ahead of the session and auth middleware
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session_key is not None:
+        engine = import_module(settings.SESSION_ENGINE)
+        session = engine.SessionStore(session_key)
+        user = get_user(types.SimpleNamespace(session=session))
+        if user.is_authenticated:
+            return user.is_staff
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+class ProfilingMiddleware:
+    """
+    Reports where a request's time went in a Server-Timing header and a
+    JSON log line: SQL count and time, DRF authentication, permissions,
+    serialization and rendering, and outbound calls. Profiles every
+    request with REQUEST_PROFILING on, or, with REQUEST_PROFILING_STAFF,
+    staff requests sent with an X-Profile header. A
+    REQUEST_PROFILING_SAMPLE_RATE share of the profiled requests also
+    writes a cProfile dump to REQUEST_PROFILING_DIR. With both settings
+    off the middleware removes itself.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        if not (
+            settings.REQUEST_PROFILING or settings.REQUEST_PROFILING_STAFF
+        ):
+            raise MiddlewareNotUsed
+        instrument()
+        install_execute_wrapper(profiled_execute)
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.profiles(request):
+            return self.get_response(request)
+
+        profile, token, capture = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(token, capture)
+        return self.report(request, response, profile, capture)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        # the staff check behind the header loads the user
+        profiles = (
+            await sync_to_async(self.profiles)(request)
+            if PROFILE_HEADER in request.META
+            else self.profiles(request)
+        )
+        if not profiles:
+            return await self.get_response(request)
+
+        # cProfile only sees the event loop's thread here
+        profile, token, capture = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(token, capture)
+        return self.report(request, response, profile, capture)
+
+    @staticmethod
+    def profiles(request: HttpRequest) -> bool:
+        if settings.REQUEST_PROFILING:
+            return True
+        if not settings.REQUEST_PROFILING_STAFF:
+            return False
+        return PROFILE_HEADER in request.META and is_staff_request(request)
+
+    @staticmethod
+    def start() -> tuple[
+        RequestProfile, contextvars.Token, Optional[cProfile.Profile]
+    ]:
+        profile = RequestProfile()
+        token = _current.set(profile)
+        capture = (
+            cProfile.Profile()
+            if random.random() < settings.REQUEST_PROFILING_SAMPLE_RATE
+            else None
+        )
+        if capture is not None:
+            capture.enable()
+        return profile, token, capture
+
+    @staticmethod
+    def stop(
+            token: contextvars.Token,
+            capture: Optional[cProfile.Profile],
+    ) -> None:
+        if capture is not None:
+            capture.disable()
+        _current.reset(token)
+
+    def report(
+            self,
+            request: HttpRequest,
+            response: HttpResponse,
+            profile: RequestProfile,
+            capture: Optional[cProfile.Profile],
+    ) -> HttpResponse:
+        response["Server-Timing"] = profile.server_timing()
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            **profile.as_dict(),
+        }))
+        if capture is not None:
+            self.dump(request, capture)
+        return response
+
+    @staticmethod
+    def dump(request: HttpRequest, capture: cProfile.Profile) -> None:
+        directory = Path(settings.REQUEST_PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^\w-]+", "-", request.path).strip("-")
+        name = (
+            f"{timezone.now():%Y%m%dT%H%M%S%f}-{request.method}-{slug}.prof"
+        )
+        capture.dump_stats(directory / name)
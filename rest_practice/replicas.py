@@ -0,0 +1,169 @@
+"""
+Reads from the replicas of the default database.
+
+Writes always go to the primary. Reads go to a replica only inside
+replica_reads(): ReplicaReadsMiddleware enters it for safe-method API
+requests and read-only tasks enter it themselves. Everything else reads
+from the primary, and so does any read inside a transaction there.
+A replica lags behind the primary, so a user who wrote through the API
+reads from the primary for REPLICA_PIN_SECONDS afterwards and sees
+their own changes at once. The pins live in the default cache, which
+has to be shared by all the workers, so replicas require
+REDIS_CACHE_URL.
+"""
+import asyncio
+import contextlib
+import contextvars
+import random
+from typing import Any, Callable, Iterator, Optional
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Model
+from django.http import HttpRequest, HttpResponse
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+_read_db: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "read_db", default=None
+)
+
+
+@contextlib.contextmanager
+def replica_reads() -> Iterator[None]:
+    """
+    Sends the reads of the block to one replica, picked at random, so
+    they all see the same point of its replication
+    """
+    alias = (
+        random.choice(settings.DATABASE_REPLICAS)
+        if settings.REPLICA_READS else None
+    )
+    token = _read_db.set(alias)
+    try:
+        yield
+    finally:
+        _read_db.reset(token)
+
+
+def read_from_primary() -> None:
+    """The remaining reads of the current request or task use the primary"""
+    _read_db.set(None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model: type[Model], **hints: Any) -> str:
+        alias = _read_db.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model: type[Model], **hints: Any) -> str:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(
+            self,
+            obj1: Model,
+            obj2: Model,
+            **hints: Any
+    ) -> Optional[bool]:
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(
+            self,
+            db: str,
+            app_label: str,
+            **hints: Any
+    ) -> Optional[bool]:
+        # replicas get their schema from the primary
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def pin_key(user_id: Any) -> str:
+    return f"replicas:pin:{user_id}"
+
+
+def token_user_id(request: HttpRequest) -> Optional[Any]:
+    """User id of a valid JWT the request carries, read without a query"""
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    if header is None:
+        return None
+    raw_token = authenticator.get_raw_token(header)
+    if raw_token is None:
+        return None
+    try:
+        token = authenticator.get_validated_token(raw_token)
+    except InvalidToken:
+        return None
+    return token.get(jwt_settings.USER_ID_CLAIM)
+
+
+class ReplicaReadsMiddleware:
+    """
+    Serves safe-method requests from a replica and pins a user to the
+    primary for REPLICA_PIN_SECONDS after each of their successful
+    writes. Requests with a session, the admin and the browsable API,
+    read from the primary. Removes itself with REPLICA_READS off.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        if not settings.REPLICA_READS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            self.pin(request, response)
+            return response
+
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return self.get_response(request)
+        user_id = token_user_id(request)
+        if user_id is not None and cache.get(pin_key(user_id)):
+            return self.get_response(request)
+        with replica_reads():
+            return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        if request.method not in SAFE_METHODS:
+            response = await self.get_response(request)
+            # the session user is loaded lazily, with a query
+            await sync_to_async(self.pin)(request, response)
+            return response
+
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return await self.get_response(request)
+        user_id = token_user_id(request)
+        if user_id is not None and await cache.aget(pin_key(user_id)):
+            return await self.get_response(request)
+        with replica_reads():
+            return await self.get_response(request)
+
+    @staticmethod
+    def pin(request: HttpRequest, response: HttpResponse) -> None:
+        if response.status_code >= 400:
+            return
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            cache.set(pin_key(user.pk), True, settings.REPLICA_PIN_SECONDS)
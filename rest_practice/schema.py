@@ -0,0 +1,136 @@
+"""
+The OpenAPI schema, generated once rather than on every request.
+
+``build_schema`` writes it for a CODE_VERSION ahead of time; a process
+running that version serves the files as they are. Without them the
+schema is generated at the first request and kept for the life of the
+process. Either way it only changes with the code that describes it.
+"""
+import gzip
+import hashlib
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBase
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from drf_spectacular.renderers import (
+    OpenApiJsonRenderer,
+    OpenApiYamlRenderer
+)
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+from rest_framework.request import Request
+
+RENDERERS = {"yaml": OpenApiYamlRenderer, "json": OpenApiJsonRenderer}
+GZIP = re.compile(r"\bgzip\b")
+
+
+@dataclass(frozen=True)
+class RenderedSchema:
+    content: bytes
+    gzipped: bytes
+    etag: str
+    gzipped_etag: str  # strong ETags differ for each encoding of a body
+
+    @classmethod
+    def of(cls, content: bytes) -> "RenderedSchema":
+        digest = hashlib.sha1(content).hexdigest()
+        return cls(
+            content,
+            gzip.compress(content, mtime=0),
+            quote_etag(digest),
+            quote_etag(f"{digest}-gzip"),
+        )
+
+
+def generate_schema() -> dict[str, Any]:
+    generator = SpectacularAPIView.generator_class(
+        urlconf=SpectacularAPIView.urlconf
+    )
+    return generator.get_schema(request=None, public=True)
+
+
+def render_schema(schema: dict[str, Any], schema_format: str) -> bytes:
+    renderer = RENDERERS[schema_format]()
+    return renderer.render(schema, renderer.media_type, {})
+
+
+def artifact_path(
+        schema_format: str,
+        version: Optional[str] = None,
+) -> Optional[Path]:
+    version = version or settings.CODE_VERSION
+    if not version:
+        return None
+    return Path(settings.OPENAPI_SCHEMA_DIR) / (
+        f"openapi-{version}.{schema_format}"
+    )
+
+
+_lock = threading.Lock()
+_schema: Optional[dict[str, Any]] = None
+_rendered: dict[str, RenderedSchema] = {}
+
+
+def get_rendered_schema(schema_format: str) -> RenderedSchema:
+    """The schema in ``schema_format``, built at most once per process"""
+    global _schema
+    # concurrent first requests wait for one generation
+    with _lock:
+        if schema_format not in _rendered:
+            path = artifact_path(schema_format)
+            if path is not None and path.exists():
+                content = path.read_bytes()
+            else:
+                if _schema is None:
+                    _schema = generate_schema()
+                content = render_schema(_schema, schema_format)
+            _rendered[schema_format] = RenderedSchema.of(content)
+        return _rendered[schema_format]
+
+
+def clear_schema_cache() -> None:
+    global _schema
+    with _lock:
+        _schema = None
+        _rendered.clear()
+
+
+class CachedSchemaView(SpectacularAPIView):
+    """
+    SpectacularAPIView served from the per-process schema, with an ETag
+    for conditional requests and gzip for clients that accept it.
+    Requests for another ``lang`` or ``version`` are generated as before.
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        if {"lang", "version"} & request.query_params.keys():
+            return super().get(request, *args, **kwargs)
+
+        rendered = get_rendered_schema(request.accepted_renderer.format)
+        gzipped = GZIP.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        etag = rendered.gzipped_etag if gzipped else rendered.etag
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            if gzipped:
+                response = HttpResponse(rendered.gzipped)
+                response["Content-Encoding"] = "gzip"
+            else:
+                response = HttpResponse(rendered.content)
+            renderer = request.accepted_renderer
+            response["Content-Type"] = (
+                f"{request.accepted_media_type}; charset={renderer.charset}"
+                if renderer.charset else request.accepted_media_type
+            )
+            response["Content-Disposition"] = (
+                f'inline; filename="{self._get_filename(request, None)}"'
+            )
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+        return response
@@ -9,11 +9,13 @@ https://docs.djangoproject.com/en/4.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
+import copy
 import os
 from datetime import timedelta
 from pathlib import Path
 
 from celery.schedules import crontab
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 
@@ -44,6 +46,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "books",
     "user",
@@ -54,6 +57,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "rest_practice.metrics.MetricsMiddleware",
+    "rest_practice.profiling.ProfilingMiddleware",
+    "rest_practice.replicas.ReplicaReadsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -96,9 +102,52 @@ DATABASES = {
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD"),
         "HOST": os.environ.get("POSTGRES_HOST"),
         "PORT": os.environ.get("POSTGRES_PORT"),
+        # seconds a connection is kept for the next request of its thread,
+        # checked with a query before the first reuse
+        "CONN_MAX_AGE": int(os.environ.get("POSTGRES_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# In-process connection pool for ASGI, where each request runs in a new
+# thread and CONN_MAX_AGE reuses nothing; asgi.py turns it on. The size
+# is per process, so workers times size must fit max_connections
+POSTGRES_POOL_SIZE = int(os.environ.get("POSTGRES_POOL_SIZE", 0))
+POSTGRES_POOL_TIMEOUT = 10  # seconds a connect waits for a free connection
+if POSTGRES_POOL_SIZE:
+    DATABASES["default"].update({
+        "ENGINE": "rest_practice.pooled",
+        "CONN_MAX_AGE": 0,  # closing hands the connection back to the pool
+        "OPTIONS": {
+            "pool": {
+                "max_size": POSTGRES_POOL_SIZE,
+                "timeout": POSTGRES_POOL_TIMEOUT,
+            },
+        },
+    })
+
+# Read replicas of the default database, a comma separated list of hosts:
+# safe-method API requests and read-only tasks read from them, see
+# rest_practice.replicas. Without any the one replica alias points at the
+# primary and stays unused, so the routing can be tried with two aliases
+POSTGRES_REPLICA_HOSTS = [
+    host for host in os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",")
+    if host
+]
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        POSTGRES_REPLICA_HOSTS or [DATABASES["default"]["HOST"]], start=1
+):
+    DATABASE_REPLICAS.append(f"replica{number}")
+    DATABASES[f"replica{number}"] = {
+        **copy.deepcopy(DATABASES["default"]),
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["rest_practice.replicas.ReplicaRouter"]
+REPLICA_READS = bool(POSTGRES_REPLICA_HOSTS)  # requires REDIS_CACHE_URL
+REPLICA_PIN_SECONDS = 5  # a user reads from the primary after their write
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -147,6 +196,8 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_PAGINATION_CLASS": "rest_practice.pagination.KeysetPagination",
+    "PAGE_SIZE": 20,
 }
 
 SPECTACULAR_SETTINGS = {
@@ -165,6 +216,9 @@ SIMPLE_JWT = {
 # Telegrams chat settings
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
+TELEGRAM_CONCURRENCY = 4
+TELEGRAM_MESSAGES_PER_SECOND = 1  # Telegram's limit for a single chat
+TELEGRAM_SEND_ATTEMPTS = 3  # per message, when flood control kicks in
 
 # Celery Configuration Options
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL")
@@ -178,4 +232,99 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'borrowings.tasks.check_overdue_borrowings',
         'schedule': crontab(minute=0, hour=8),  # runs every dat at 8 am
     },
+    "dispatch_outbox_every_minute": {
+        "task": "borrowings.tasks.dispatch_outbox",
+        "schedule": crontab(),  # retries and events missed by the wake-up
+    },
+    "compact_table_versions_every_minute": {
+        "task": "borrowings.tasks.compact_table_versions",
+        "schedule": crontab(),  # keeps the conditional GET change log short
+    },
+}
+
+# Notification outbox
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BACKOFF = 30  # seconds, doubled after every failed attempt
+OUTBOX_MAX_RETRY_BACKOFF = 60 * 60
+OUTBOX_CLAIM_LEASE = 10 * 60  # seconds other dispatchers skip a claimed batch
+
+# Overdue borrowings report
+OVERDUE_CHUNK_SIZE = 2000  # rows fetched per server-side cursor round trip
+OVERDUE_DIGEST_SIZE = 40  # overdue lines per message, 1 sends them one by one
+# messages per report, sent at TELEGRAM_MESSAGES_PER_SECOND well within
+# CELERY_TASK_TIME_LIMIT; one more counts the overdue borrowings left out
+OVERDUE_MAX_MESSAGES = 100
+
+# Borrowings API: list and retrieve from values() rows rather than through
+# model instances and BorrowingListSerializer; the JSON is the same
+BORROWING_VALUES_READS = True
+BORROWING_EXPORT_CHUNK_SIZE = 2000  # rows per server-side cursor fetch
+
+# Async list and retrieve views, set by asgi.py; WSGI keeps the sync ones
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS") == "1"
+
+# Cache: Redis when REDIS_CACHE_URL is set, process memory otherwise
+# (tests and local runs)
+REDIS_CACHE_URL = os.environ.get("REDIS_CACHE_URL")
+if REDIS_CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+# the replica pins a write sets must reach the other workers' reads
+if REPLICA_READS and not REDIS_CACHE_URL:
+    raise ImproperlyConfigured(
+        "POSTGRES_REPLICA_HOSTS needs REDIS_CACHE_URL: a per-process cache "
+        "would let users read stale rows after their own writes"
+    )
+
+# Response cache; entries are invalidated on change, the timeout only
+# bounds how long orphaned generations linger
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+RESPONSE_CACHE_LOCK_TIMEOUT = 10  # seconds a rebuild may hold its key
+RESPONSE_CACHE_LOCK_WAIT = 2  # seconds others wait for it before querying
+RESPONSE_CACHE_POLL_INTERVAL = 0.02
+
+# Bulk book import and inventory
+BOOK_IMPORT_BATCH_SIZE = 2000
+BOOK_IMPORT_MAX_REPORTED_ERRORS = 1000  # per request of the bulk endpoint
+BOOK_INVENTORY_MAX_ITEMS = 5000  # per bulk inventory request
+
+# Prometheus scrapes /metrics/ sending "Authorization: Bearer <token>";
+# without a token set only staff signed in to the admin can read it
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+# Request profiling: Server-Timing headers and a JSON log line per request
+REQUEST_PROFILING = False  # every request
+REQUEST_PROFILING_STAFF = False  # staff requests sent with X-Profile
+REQUEST_PROFILING_SAMPLE_RATE = 0.0  # share of profiled requests to cProfile
+REQUEST_PROFILING_DIR = BASE_DIR / "profiles"
+
+# OpenAPI schema: generated once per process, or read from the files
+# build_schema wrote for this CODE_VERSION (a release tag or commit)
+CODE_VERSION = os.environ.get("CODE_VERSION")
+OPENAPI_SCHEMA_DIR = BASE_DIR / "schema"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "rest_practice.profiling": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
 }
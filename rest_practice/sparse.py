@@ -0,0 +1,168 @@
+from typing import Optional
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model, QuerySet
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import serializers
+from rest_framework.request import Request
+
+Fieldset = dict[str, "Fieldset"]  # field names, nested for dotted paths
+
+SPARSE_PARAMS = ("fields", "expand")
+SPARSE_PARAMETERS = [
+    OpenApiParameter(
+        "fields",
+        type=str,
+        description="comma separated fields to return, dotted for nested "
+                    "objects (ex: ?fields=id,book.title)",
+    ),
+    OpenApiParameter(
+        "expand",
+        type=str,
+        description="relations to return as nested objects "
+                    "(ex: ?expand=user)",
+    ),
+]
+
+
+def parse_fieldset(value: Optional[str]) -> Fieldset:
+    """Parses "id,book.title" into {"id": {}, "book": {"title": {}}}"""
+    fieldset = {}
+    for path in (value or "").split(","):
+        node = fieldset
+        for name in filter(None, path.strip().split(".")):
+            node = node.setdefault(name, {})
+    return fieldset
+
+
+class SparseFieldsetMixin:
+    """
+    Lets clients pick fields with ?fields=id,book.title and swap compact
+    relations for nested objects listed in Meta.expandable_fields with
+    ?expand=user. Only the top serializer reads the query; it hands the
+    dotted remainders down to nested serializers. Without either
+    parameter the output is unchanged.
+    """
+
+    selected_fields: Optional[Fieldset] = None
+    expanded_fields: Optional[Fieldset] = None
+
+    def is_sparse_root(self) -> bool:
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fieldsets(self) -> tuple[Fieldset, Fieldset]:
+        request: Optional[Request] = self.context.get("request")
+        if self.expanded_fields is None and self.is_sparse_root() and (
+            request is not None and request.method == "GET"
+        ):
+            self.selected_fields, self.expanded_fields = (
+                parse_fieldset(request.query_params.get(param))
+                for param in SPARSE_PARAMS
+            )
+        return self.selected_fields or {}, self.expanded_fields or {}
+
+    def get_fields(self) -> dict[str, serializers.Field]:
+        fields = super().get_fields()
+        selected, expanded = self.get_fieldsets()
+
+        expandable = getattr(self.Meta, "expandable_fields", {})
+        unknown = set(expanded) - set(expandable)
+        if unknown:
+            raise serializers.ValidationError(
+                {"expand": f"Cannot expand: {', '.join(sorted(unknown))}"}
+            )
+        for name in expanded:
+            fields[name] = expandable[name](read_only=True)
+
+        unknown = set(selected) - set(fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": f"Unknown fields: {', '.join(sorted(unknown))}"}
+            )
+        if selected:
+            fields = {
+                name: field for name, field in fields.items()
+                if name in selected
+            }
+
+        for name, field in fields.items():
+            nested = getattr(field, "child", field)
+            if isinstance(nested, SparseFieldsetMixin):
+                nested.selected_fields = selected.get(name) or None
+                nested.expanded_fields = expanded.get(name, {})
+        return fields
+
+
+def model_paths(
+        serializer: serializers.Serializer,
+        model: type[Model],
+        prefix: str = "",
+) -> Optional[tuple[list[str], list[str]]]:
+    """
+    The ``only()`` and ``select_related()`` paths covering what the
+    serializer renders, or None when a source is not a plain model
+    field and pruning could trigger a query per row.
+    """
+    only, related = [], []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == "*" or "." in field.source:
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+
+        nested = getattr(field, "child", field)
+        if isinstance(nested, serializers.BaseSerializer):
+            if not (model_field.many_to_one or model_field.one_to_one):
+                return None
+            paths = model_paths(
+                nested,
+                model_field.related_model,
+                f"{prefix}{field.source}__",
+            )
+            if paths is None:
+                return None
+            only.extend(paths[0])
+            related.extend([f"{prefix}{field.source}", *paths[1]])
+        else:
+            only.append(f"{prefix}{field.source}")
+            if isinstance(field, serializers.RelatedField) and (
+                not field.use_pk_only_optimization()
+            ):
+                # renders the related object itself, e.g. through __str__
+                related.append(f"{prefix}{field.source}")
+    return only, related
+
+
+class SparseQuerysetMixin:
+    """
+    Loads only the columns a ?fields= / ?expand= request renders, and
+    joins only the relations it nests, for list and retrieve.
+    """
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        if self.action not in ("list", "retrieve") or not any(
+            param in self.request.query_params for param in SPARSE_PARAMS
+        ):
+            return queryset
+
+        paths = model_paths(self.get_serializer(), queryset.model)
+        if paths is None:
+            return queryset
+        only, related = paths
+        # keyset pagination reads the ordering columns from every row
+        for name in queryset.query.order_by or queryset.model._meta.ordering:
+            name = name.lstrip("-")
+            if name != "pk" and name not in queryset.query.annotations:
+                only.append(name)
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*only)
@@ -0,0 +1,934 @@
+import asyncio
+import contextlib
+import datetime
+import gzip
+import io
+import json
+import os
+import runpy
+import tempfile
+import types
+from typing import Any, Callable, Iterator, Optional
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import (
+    ImproperlyConfigured,
+    MiddlewareNotUsed,
+)
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.utils import OperationalError
+from django.test import (
+    AsyncClient,
+    TestCase,
+    TransactionTestCase,
+    override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import (
+    URLPattern,
+    URLResolver,
+    get_resolver,
+    include,
+    path,
+    resolve,
+    reverse,
+)
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from books import urls as book_urls
+from books.models import Book
+from borrowings import urls as borrowing_urls
+from borrowings.models import Borrowing
+from borrowings.tasks import check_overdue_borrowings
+from rest_practice import metrics, schema
+from rest_practice.pooled import base as pooled
+from rest_practice.profiling import ProfilingMiddleware
+from rest_practice.replicas import pin_key, replica_reads
+from user.views import ManageUserView
+
+# queries each GET route may run, whatever the number of rows it renders;
+# a new route fails test_every_get_route_has_a_budget until it is listed
+QUERY_BUDGETS = {
+    # the rows plus the conditional GET version stamp
+    "books:book-list": 2,
+    "books:book-detail": 2,
+    "borrowings:borrowing-list": 2,
+    "borrowings:borrowing-detail": 2,
+    # one server-side cursor
+    "borrowings:borrowing-export": 1,
+    "user:manage": 0,
+    "metrics": 0,
+    "schema": 0,
+    "swagger": 0,
+    "redoc": 0,
+}
+DATASET_SIZES = (3, 12)
+# each setting that switches a read path gets walked both ways
+SETTINGS_VARIANTS = (
+    {},
+    {"BORROWING_VALUES_READS": False},
+)
+
+
+def get_routes(
+        patterns: Optional[list] = None,
+        namespace: str = "",
+        prefix: str = "",
+        seen: Optional[set[str]] = None,
+) -> Iterator[tuple[str, URLPattern]]:
+    """
+    Named URL patterns answering GET, leaving out the Django admin,
+    format suffix duplicates and patterns shadowed by an earlier one
+    (the router root of a viewset registered at "")
+    """
+    if patterns is None:
+        patterns, seen = get_resolver().url_patterns, set()
+    for pattern in patterns:
+        route = f"{prefix}{pattern.pattern}"
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace != "admin":
+                yield from get_routes(
+                    pattern.url_patterns,
+                    f"{namespace}{pattern.namespace}:"
+                    if pattern.namespace else namespace,
+                    route,
+                    seen,
+                )
+        elif route not in seen and (
+            "format" not in pattern.pattern.regex.groupindex
+        ):
+            seen.add(route)
+            if allows_get(pattern.callback):
+                yield f"{namespace}{pattern.name}", pattern
+
+
+def allows_get(callback: Callable) -> bool:
+    actions = getattr(callback, "actions", None)
+    if actions is not None:
+        return "get" in actions
+    view_class = getattr(callback, "view_class", None)
+    # function views see every method
+    return view_class is None or hasattr(view_class, "get")
+
+
+@override_settings(METRICS_TOKEN="scrape-token")
+class QueryBudgetTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@admin.com", "admin12345", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        # the API ignores it, forced authentication comes first
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer scrape-token")
+
+    def seed(self, size: int) -> None:
+        """Tops the books and the borrowings, each by another user, up"""
+        for i in range(Borrowing.objects.count(), size):
+            Borrowing.objects.create(
+                book=Book.objects.create(
+                    title=f"Book {i}",
+                    author=f"Author {i}",
+                    cover="HARD",
+                    inventory=5,
+                    daily_fee=1,
+                ),
+                user=get_user_model().objects.create_user(
+                    f"reader{i}@user.com", "test12345"
+                ),
+                expected_return_date="2023-10-10",
+            )
+
+    def route_url(self, name: str, pattern: URLPattern) -> str:
+        kwargs: dict[str, Any] = {}
+        if "pk" in pattern.pattern.regex.groupindex:
+            model = pattern.callback.cls.queryset.model
+            kwargs["pk"] = model.objects.order_by("pk").first().pk
+        return reverse(name, kwargs=kwargs)
+
+    def count_queries(self, url: str) -> int:
+        # responses cached by an earlier request would hide the queries
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        return len(queries)
+
+    def test_every_get_route_has_a_budget(self) -> None:
+        self.assertEqual(
+            {name for name, _ in get_routes()}, set(QUERY_BUDGETS)
+        )
+
+    def test_queries_do_not_grow_with_rows(self) -> None:
+        counts: dict[tuple[int, str, int], int] = {}
+        for size in DATASET_SIZES:
+            self.seed(size)
+            for variant, overrides in enumerate(SETTINGS_VARIANTS):
+                with override_settings(**overrides):
+                    for name, pattern in get_routes():
+                        url = self.route_url(name, pattern)
+                        counts[variant, name, size] = self.count_queries(url)
+
+        for variant, overrides in enumerate(SETTINGS_VARIANTS):
+            for name, budget in QUERY_BUDGETS.items():
+                with self.subTest(route=name, **overrides):
+                    sizes = [
+                        counts[variant, name, size] for size in DATASET_SIZES
+                    ]
+                    self.assertEqual(len(set(sizes)), 1, sizes)
+                    self.assertLessEqual(max(sizes), budget)
+
+
+@override_settings(REQUEST_PROFILING_STAFF=True)
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@admin.com", "admin12345", is_staff=True
+        )
+        self.log_in(self.user)
+        Book.objects.create(
+            title="Book", author="Author", cover="HARD", inventory=1,
+            daily_fee=1,
+        )
+
+    def log_in(self, user: Any) -> None:
+        # the middleware reads the token itself, ahead of DRF
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def server_timing(self, **headers: str) -> dict[str, str]:
+        cache.clear()
+        response = self.client.get(reverse("books:book-list"), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return dict(
+            timing.strip().split(";", 1)
+            for timing in response.get("Server-Timing", "").split(",")
+            if timing
+        )
+
+    def test_staff_request_with_header_is_profiled(self) -> None:
+        with self.assertLogs("rest_practice.profiling") as logs:
+            timings = self.server_timing(HTTP_X_PROFILE="1")
+
+        self.assertLessEqual(
+            {"sql", "auth", "perm", "serialize", "render", "total"},
+            set(timings),
+        )
+        # the token's user, the count and the page
+        self.assertIn('desc="3 queries"', timings["sql"])
+        self.assertEqual(json.loads(logs.records[0].msg)["queries"], 3)
+
+    def test_requests_without_header_are_not_profiled(self) -> None:
+        self.assertEqual(self.server_timing(), {})
+
+    def test_other_users_get_no_profiler(self) -> None:
+        self.log_in(
+            get_user_model().objects.create_user("user@user.com", "user1234")
+        )
+
+        with override_settings(REQUEST_PROFILING_SAMPLE_RATE=1), mock.patch(
+            "cProfile.Profile"
+        ) as profiler:
+            self.assertEqual(self.server_timing(HTTP_X_PROFILE="1"), {})
+        profiler.assert_not_called()
+
+    def test_staff_session_is_profiled(self) -> None:
+        client = APIClient()
+        client.force_login(self.user)
+
+        with self.assertLogs("rest_practice.profiling"):
+            response = client.get(
+                reverse("books:book-list"), HTTP_X_PROFILE="1"
+            )
+
+        self.assertIn("Server-Timing", response)
+
+    @override_settings(REQUEST_PROFILING=True)
+    def test_every_request_profiled_when_enabled(self) -> None:
+        self.client.credentials()
+        with self.assertLogs("rest_practice.profiling"):
+            timings = self.server_timing()
+
+        self.assertIn("total", timings)
+
+    def test_sampled_requests_write_a_profile(self) -> None:
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            REQUEST_PROFILING_SAMPLE_RATE=1, REQUEST_PROFILING_DIR=directory
+        ), self.assertLogs("rest_practice.profiling"):
+            self.server_timing(HTTP_X_PROFILE="1")
+            dumps = os.listdir(directory)
+
+        self.assertEqual(len(dumps), 1)
+        self.assertTrue(dumps[0].endswith("-GET-api-books.prof"))
+
+    @override_settings(REQUEST_PROFILING=False, REQUEST_PROFILING_STAFF=False)
+    def test_middleware_unused_when_disabled(self) -> None:
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: None)
+
+
+class MetricsTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "test12345"
+        )
+        self.client.force_authenticate(self.user)
+
+    def sample(self, name: str, **labels: str) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_latency_and_queries_by_view_action(self) -> None:
+        before = self.sample(
+            "api_request_duration_seconds_count",
+            view="BookViewSet.list", method="GET", status="2xx",
+        )
+        cache.clear()
+        self.client.get(reverse("books:book-list"))
+
+        self.assertEqual(
+            self.sample(
+                "api_request_duration_seconds_count",
+                view="BookViewSet.list", method="GET", status="2xx",
+            ),
+            before + 1,
+        )
+        self.assertGreater(
+            self.sample("api_request_queries_sum", view="BookViewSet.list"),
+            0,
+        )
+
+    def test_view_names(self) -> None:
+        for url, method, expected in (
+            (reverse("books:book-list"), "get", "BookViewSet.list"),
+            (reverse("user:manage"), "get", "ManageUserView.get"),
+            ("/api/missing/", "get", "unmatched"),
+        ):
+            response = getattr(self.client, method)(url)
+            self.assertEqual(
+                metrics.view_name(response.wsgi_request), expected
+            )
+
+    def test_checkout_and_return_outcomes(self) -> None:
+        book = Book.objects.create(
+            title="Book", author="Author", cover="HARD", inventory=1,
+            daily_fee=1,
+        )
+        borrowed = self.sample(
+            "library_checkouts_total", outcome="borrowed"
+        )
+        out_of_stock = self.sample(
+            "library_checkouts_total", outcome="out_of_stock"
+        )
+        returned = self.sample("library_returns_total", outcome="returned")
+        rejected = self.sample("library_returns_total", outcome="rejected")
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(self.user)
+        payload = {"book": book.id, "expected_return_date": "2023-10-10"}
+
+        response = client.post(reverse("borrowings:borrowing-list"), payload)
+        out_of_stock_response = client.post(
+            reverse("borrowings:borrowing-list"), payload
+        )
+        url = reverse(
+            "borrowings:borrowing-return-book", args=[response.data["id"]]
+        )
+        returned_response = client.post(url)
+        rejected_response = client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            out_of_stock_response.status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            out_of_stock_response.data,
+            {"book": ["This book is currently out of stock"]},
+        )
+        self.assertEqual(returned_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            rejected_response.status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+        self.assertEqual(
+            self.sample("library_checkouts_total", outcome="borrowed"),
+            borrowed + 1,
+        )
+        self.assertEqual(
+            self.sample("library_checkouts_total", outcome="out_of_stock"),
+            out_of_stock + 1,
+        )
+        self.assertEqual(
+            self.sample("library_returns_total", outcome="returned"),
+            returned + 1,
+        )
+        self.assertEqual(
+            self.sample("library_returns_total", outcome="rejected"),
+            rejected + 1,
+        )
+
+        # a borrowing that is not there is not a rejected return
+        missing = reverse("borrowings:borrowing-return-book", args=[0])
+        self.assertEqual(
+            client.post(missing).status_code, status.HTTP_404_NOT_FOUND
+        )
+        self.assertEqual(
+            self.sample("library_returns_total", outcome="rejected"),
+            rejected + 1,
+        )
+
+    def test_celery_task_metrics(self) -> None:
+        task = mock.Mock()
+        task.name = "borrowings.tasks.check_overdue_borrowings"
+        labels = {"task": task.name}
+        runs = self.sample("celery_task_duration_seconds_count", **labels)
+        failures = self.sample("celery_task_failures_total", **labels)
+
+        metrics.task_started(task_id="1")
+        metrics.task_failed(sender=task)
+        metrics.task_finished(task_id="1", task=task)
+
+        self.assertEqual(
+            self.sample("celery_task_duration_seconds_count", **labels),
+            runs + 1,
+        )
+        self.assertEqual(
+            self.sample("celery_task_failures_total", **labels),
+            failures + 1,
+        )
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_scrape_endpoint(self) -> None:
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape-token"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b"api_request_duration_seconds", response.content)
+        self.assertIn(b"telegram_sends_total", response.content)
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_scrape_endpoint_is_not_public(self) -> None:
+        client = APIClient()
+        for headers in (
+            {},
+            {"HTTP_AUTHORIZATION": "Bearer wrong-token"},
+        ):
+            response = client.get(reverse("metrics"), **headers)
+            self.assertEqual(
+                response.status_code, status.HTTP_403_FORBIDDEN
+            )
+
+        # signed in to the admin, not through the API
+        client.force_login(self.user)
+        self.assertEqual(
+            client.get(reverse("metrics")).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(
+            client.get(reverse("metrics")).status_code, status.HTTP_200_OK
+        )
+
+    def test_exited_workers_drop_their_live_gauges(self) -> None:
+        config = runpy.run_path(
+            os.path.join(settings.BASE_DIR, "gunicorn.conf.py")
+        )
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(
+            os.environ, {"PROMETHEUS_MULTIPROC_DIR": directory}
+        ):
+            for pid in (4242, 4343):
+                path = os.path.join(directory, f"gauge_livesum_{pid}.db")
+                open(path, "w").close()
+
+            config["child_exit"](None, types.SimpleNamespace(pid=4242))
+            metrics.worker_process_exited(pid=4343, exitcode=0)
+
+            self.assertEqual(os.listdir(directory), [])
+
+
+class SchemaViewTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        schema.clear_schema_cache()
+        self.addCleanup(schema.clear_schema_cache)
+
+    def test_schema_generated_once_per_process(self) -> None:
+        with mock.patch.object(
+            schema, "generate_schema", wraps=schema.generate_schema
+        ) as generate:
+            first = self.client.get(reverse("schema"))
+            second = self.client.get(reverse("schema"))
+            as_json = self.client.get(reverse("schema"), {"format": "json"})
+
+        generate.assert_called_once()
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.content, second.content)
+        self.assertTrue(first.content.startswith(b"openapi:"))
+        self.assertIn("paths", json.loads(as_json.content))
+        self.assertNotEqual(first["ETag"], as_json["ETag"])
+
+    def test_etag_and_not_modified(self) -> None:
+        response = self.client.get(reverse("schema"))
+        self.assertIn("Content-Disposition", response)
+
+        response = self.client.get(
+            reverse("schema"), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_gzip_when_accepted(self) -> None:
+        plain = self.client.get(reverse("schema"))
+        compressed = self.client.get(
+            reverse("schema"), HTTP_ACCEPT_ENCODING="br, gzip"
+        )
+
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertNotEqual(compressed["ETag"], plain["ETag"])
+        self.assertIn("Accept-Encoding", compressed["Vary"])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertLess(len(compressed.content), len(plain.content) / 4)
+
+    def test_etag_matches_the_encoding_only(self) -> None:
+        compressed = self.client.get(
+            reverse("schema"), HTTP_ACCEPT_ENCODING="gzip"
+        )
+
+        not_modified = self.client.get(
+            reverse("schema"),
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_NONE_MATCH=compressed["ETag"],
+        )
+        plain = self.client.get(
+            reverse("schema"), HTTP_IF_NONE_MATCH=compressed["ETag"]
+        )
+
+        self.assertEqual(
+            not_modified.status_code, status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(plain.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Content-Encoding", plain)
+
+    def test_built_schema_served_for_its_version(self) -> None:
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            CODE_VERSION="1.2.3", OPENAPI_SCHEMA_DIR=directory
+        ):
+            call_command("build_schema", stdout=io.StringIO())
+            with open(os.path.join(directory, "openapi-1.2.3.yaml")) as f:
+                built = f.read().encode()
+            with mock.patch.object(schema, "generate_schema") as generate:
+                response = self.client.get(reverse("schema"))
+
+        generate.assert_not_called()
+        self.assertEqual(response.content, built)
+
+    def test_build_schema_needs_a_version(self) -> None:
+        with override_settings(CODE_VERSION=None), self.assertRaises(
+            CommandError
+        ):
+            call_command("build_schema")
+
+
+def async_urlconf() -> types.ModuleType:
+    """The API routes with the views asgi.py serves"""
+    urlconf = types.ModuleType("async_urls")
+    with override_settings(ASYNC_VIEWS=True):
+        urlconf.urlpatterns = [
+            path(
+                "api/books/",
+                include((book_urls.router.get_urls(), "books")),
+            ),
+            path(
+                "api/borrowings/",
+                include((borrowing_urls.router.get_urls(), "borrowings")),
+            ),
+            path(
+                "api/user/",
+                include((
+                    [path("me/", ManageUserView.as_view(), name="manage")],
+                    "user",
+                )),
+            ),
+        ]
+    return urlconf
+
+
+class AsyncViewTests(TestCase):
+    urlconf = async_urlconf()
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "test12345", first_name="Test", last_name="User"
+        )
+        self.book = Book.objects.create(
+            title="War and Peace", author="Leo Tolstoy", cover="HARD",
+            inventory=3, daily_fee=1,
+        )
+        Book.objects.create(
+            title="Anna Karenina", author="Leo Tolstoy", cover="SOFT",
+            inventory=1, daily_fee=2,
+        )
+        self.borrowing = Borrowing.objects.create(
+            book=self.book,
+            user=self.user,
+            expected_return_date="2023-10-10",
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+        self.sync_client = APIClient()
+        self.async_client = AsyncClient()
+        cache.clear()
+
+    def sync_get(self, url: str, **headers: str) -> Any:
+        cache.clear()
+        return self.sync_client.get(url, **headers)
+
+    def async_request(self, method: str, url: str, **kwargs: Any) -> Any:
+        # the async client takes headers without the WSGI prefix
+        kwargs = {
+            name.removeprefix("HTTP_"): value
+            for name, value in kwargs.items()
+        }
+
+        async def request() -> Any:
+            return await getattr(self.async_client, method)(url, **kwargs)
+
+        with override_settings(ROOT_URLCONF=self.urlconf):
+            return async_to_sync(request)()
+
+    def async_get(self, url: str, **headers: str) -> Any:
+        return self.async_request("get", url, **headers)
+
+    def assert_same_response(self, url: str, **headers: str) -> Any:
+        expected = self.sync_get(url, **headers)
+        response = self.async_get(url, **headers)
+
+        self.assertEqual(response.status_code, expected.status_code, url)
+        self.assertEqual(response.json(), expected.json(), url)
+        return response
+
+    def test_reads_are_served_by_coroutines(self) -> None:
+        with override_settings(ROOT_URLCONF=self.urlconf):
+            for url in (
+                reverse("books:book-list"),
+                reverse("borrowings:borrowing-detail", args=[1]),
+                reverse("user:manage"),
+            ):
+                self.assertTrue(
+                    asyncio.iscoroutinefunction(resolve(url).func), url
+                )
+
+    def test_book_reads(self) -> None:
+        detail = reverse("books:book-detail", args=[self.book.pk])
+        for url in (
+            reverse("books:book-list"),
+            f"{reverse('books:book-list')}?q=tolstoy war",
+            f"{reverse('books:book-list')}?page_size=1",
+            f"{reverse('books:book-list')}?fields=id,title",
+            detail,
+            f"{detail}?fields=title",
+            reverse("books:book-detail", args=[0]),
+            reverse("books:book-detail", args=["abc"]),
+        ):
+            self.assert_same_response(url)
+
+    def test_cache_hits_and_conditional_requests(self) -> None:
+        url = reverse("books:book-detail", args=[self.book.pk])
+        first = self.async_get(url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.async_get(url)
+        not_modified = self.async_get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(
+            not_modified.status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_borrowing_reads(self) -> None:
+        list_url = reverse("borrowings:borrowing-list")
+        detail = reverse(
+            "borrowings:borrowing-detail", args=[self.borrowing.pk]
+        )
+        for values_reads in (True, False):
+            with override_settings(BORROWING_VALUES_READS=values_reads):
+                for url in (
+                    list_url,
+                    f"{list_url}?is_active=1",
+                    f"{list_url}?fields=id,book.title&expand=user",
+                    detail,
+                    reverse("borrowings:borrowing-detail", args=[0]),
+                ):
+                    self.assert_same_response(url, **self.headers)
+
+        response = self.assert_same_response(list_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
+
+    def test_me(self) -> None:
+        url = reverse("user:manage")
+        self.assert_same_response(url, **self.headers)
+        labels = {"view": "ManageUserView.get"}
+        counted = REGISTRY.get_sample_value(
+            "api_request_queries_sum", labels
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.async_get(url, **self.headers)
+
+        self.assertEqual(response.json()["email"], "test@test.com")
+        self.assertEqual(len(queries), 1)
+        # counted by the metrics middleware across the ORM's thread hop
+        self.assertEqual(
+            REGISTRY.get_sample_value("api_request_queries_sum", labels),
+            counted + 1,
+        )
+        response = self.assert_same_response(
+            url, HTTP_AUTHORIZATION="Bearer broken"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_checkout_and_return_run_the_sync_views(self) -> None:
+        with mock.patch("borrowings.tasks.dispatch_outbox.delay"):
+            response = self.async_request(
+                "post",
+                reverse("borrowings:borrowing-list"),
+                data={
+                    "book": self.book.pk,
+                    "expected_return_date": "2023-10-20",
+                },
+                content_type="application/json",
+                **self.headers,
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.book.refresh_from_db()
+            self.assertEqual(self.book.inventory, 2)
+            response = self.async_request(
+                "post",
+                reverse(
+                    "borrowings:borrowing-return-book",
+                    args=[response.json()["id"]],
+                ),
+                **self.headers,
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 3)
+
+
+class ConnectionPoolTests(TestCase):
+    alias = "pool_test"
+
+    def setUp(self) -> None:
+        self.addCleanup(pooled.close_pools)
+        self.addCleanup(connections.__delitem__, self.alias)
+
+    def pooled_connection(self) -> pooled.DatabaseWrapper:
+        wrapper = pooled.DatabaseWrapper(
+            {
+                **connection.settings_dict,
+                "CONN_MAX_AGE": 0,
+                "OPTIONS": {"pool": {"max_size": 1, "timeout": 0.05}},
+            },
+            alias=self.alias,
+        )
+        # connect signal receivers look the connection up by alias
+        connections[self.alias] = wrapper
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def backend_pid(self, wrapper: pooled.DatabaseWrapper) -> int:
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            return cursor.fetchone()[0]
+
+    def sample(self, name: str, **labels: str) -> float:
+        return REGISTRY.get_sample_value(
+            name, {"database": self.alias, **labels}
+        ) or 0
+
+    def test_closed_connection_is_reused_by_the_next_connect(self) -> None:
+        first = self.pooled_connection()
+        pid = self.backend_pid(first)
+        self.assertEqual(self.sample("db_pool_connections", state="in_use"), 1)
+        first.close()
+        self.assertEqual(self.sample("db_pool_connections", state="idle"), 1)
+
+        self.assertEqual(self.backend_pid(self.pooled_connection()), pid)
+        self.assertEqual(self.sample("db_pool_connections", state="idle"), 0)
+
+    def test_connect_fails_when_the_pool_stays_exhausted(self) -> None:
+        timeouts = self.sample("db_pool_timeouts_total")
+        self.pooled_connection().ensure_connection()
+
+        with self.assertRaises(OperationalError):
+            self.pooled_connection().ensure_connection()
+        self.assertEqual(self.sample("db_pool_timeouts_total"), timeouts + 1)
+
+    def test_open_transaction_is_rolled_back_on_return(self) -> None:
+        first = self.pooled_connection()
+        first.set_autocommit(False)
+        self.backend_pid(first)
+        first.close()
+
+        second = self.pooled_connection()
+        second.ensure_connection()
+        self.assertTrue(second.get_autocommit())
+        self.assertFalse(second.connection.info.transaction_status)
+
+    def test_broken_connection_is_not_reused(self) -> None:
+        first = self.pooled_connection()
+        pid = self.backend_pid(first)
+        first.connection.close()
+        first.close()
+
+        self.assertNotEqual(self.backend_pid(self.pooled_connection()), pid)
+
+
+REPLICA = settings.DATABASE_REPLICAS[0]
+
+
+@override_settings(REPLICA_READS=True)
+class ReplicaRoutingTests(TransactionTestCase):
+    # the replica alias mirrors the test database on a connection of its
+    # own, so the test transactions commit for it to see the rows
+    databases = {"default", REPLICA}
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "test12345"
+        )
+        self.book = Book.objects.create(
+            title="War and Peace", author="Leo Tolstoy", cover="HARD",
+            inventory=3, daily_fee=1,
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        patcher = mock.patch("borrowings.tasks.dispatch_outbox")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+
+    @contextlib.contextmanager
+    def capture(self) -> Iterator[tuple[CaptureQueriesContext, ...]]:
+        """The queries run on the primary and on the replica"""
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(connections[REPLICA]) as replica:
+                yield primary, replica
+
+    def test_safe_requests_read_from_a_replica(self) -> None:
+        with self.capture() as (primary, replica):
+            response = self.client.get(reverse("borrowings:borrowing-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(primary), 0)
+        self.assertGreater(len(replica), 0)
+
+    def test_writer_reads_from_the_primary_for_a_while(self) -> None:
+        url = reverse("borrowings:borrowing-list")
+        with self.capture() as (primary, replica):
+            response = self.client.post(url, {
+                "book": self.book.id,
+                "expected_return_date": (
+                    datetime.date.today() + datetime.timedelta(days=7)
+                ),
+            })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(replica), 0)
+
+        with self.capture() as (primary, replica):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(len(replica), 0)
+
+        cache.delete(pin_key(self.user.pk))
+        with self.capture() as (primary, replica):
+            self.client.get(url)
+        self.assertEqual(len(primary), 0)
+
+    def test_cache_misses_are_rebuilt_from_the_primary(self) -> None:
+        url = reverse("books:book-list")
+        with self.capture() as (primary, replica):
+            self.client.get(url)
+        # only the token's user is looked up before the cache
+        self.assertEqual(len(replica), 1)
+        self.assertGreater(len(primary), 0)
+
+        with self.capture() as (primary, replica):
+            self.client.get(url)
+        self.assertEqual((len(primary), len(replica)), (0, 1))
+
+    def test_reads_in_a_transaction_use_the_primary(self) -> None:
+        with replica_reads(), self.capture() as (primary, replica):
+            Book.objects.count()
+            with transaction.atomic():
+                Book.objects.count()
+
+        self.assertEqual((len(primary), len(replica)), (1, 1))
+
+    def test_overdue_scan_reads_from_a_replica(self) -> None:
+        Borrowing.objects.create(
+            book=self.book,
+            user=self.user,
+            expected_return_date=datetime.date.today(),
+        )
+        with mock.patch(
+            "borrowings.tasks.send_telegram_notifications",
+            return_value=[None],
+        ), self.capture() as (primary, replica):
+            self.assertEqual(check_overdue_borrowings(), 1)
+
+        self.assertEqual((len(primary), len(replica)), (0, 1))
+
+    def test_async_views_read_from_a_replica(self) -> None:
+        async def request() -> Any:
+            return await AsyncClient().get(
+                reverse("borrowings:borrowing-list"),
+                AUTHORIZATION=self.client._credentials["HTTP_AUTHORIZATION"],
+            )
+
+        with override_settings(ROOT_URLCONF=async_urlconf()):
+            with self.capture() as (primary, replica):
+                response = async_to_sync(request)()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(primary), 0)
+        self.assertGreater(len(replica), 0)
+
+    def test_everything_reads_from_the_primary_when_off(self) -> None:
+        with override_settings(REPLICA_READS=False):
+            client = APIClient()
+            with self.capture() as (primary, replica):
+                client.get(reverse("books:book-list"))
+                with replica_reads():
+                    Book.objects.count()
+
+        self.assertEqual(len(replica), 0)
+
+    def test_replicas_require_a_shared_cache(self) -> None:
+        path = os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), "settings.py"
+        )
+        environ = {"POSTGRES_REPLICA_HOSTS": "replica.internal"}
+        with mock.patch.dict(os.environ, environ):
+            os.environ.pop("REDIS_CACHE_URL", None)
+            with self.assertRaises(ImproperlyConfigured):
+                runpy.run_path(path)
+
+            os.environ["REDIS_CACHE_URL"] = "redis://cache:6379/0"
+            self.assertTrue(runpy.run_path(path)["REPLICA_READS"])
@@ -16,21 +16,24 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import (
-    SpectacularAPIView,
     SpectacularSwaggerView,
     SpectacularRedocView
 )
 
+from rest_practice.metrics import metrics_view
+from rest_practice.schema import CachedSchemaView
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics/", metrics_view, name="metrics"),
     path("api/books/", include("books.urls", namespace="books")),
     path("api/user/", include("user.urls", namespace="user")),
     path(
         "api/borrowings/",
         include("borrowings.urls",
                 namespace="borrowings")),
-    path("api/doc/", SpectacularAPIView.as_view(), name="schema"),
+    path("api/doc/", CachedSchemaView.as_view(), name="schema"),
     path(
         "api/doc/swagger/",
         SpectacularSwaggerView.as_view(url_name="schema"),
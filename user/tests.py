@@ -1,3 +1,33 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+ME_URL = reverse("user:manage")
+
+
+class ManageUserApiTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test12345",
+            first_name="Test"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_retrieve_sparse_fields(self) -> None:
+        response = self.client.get(ME_URL, {"fields": "email,first_name"})
+
+        self.assertEqual(
+            response.data, {"email": "test@test.com", "first_name": "Test"}
+        )
+
+    def test_update_ignores_fields_param(self) -> None:
+        response = self.client.patch(
+            ME_URL + "?fields=email", {"last_name": "User"}
+        )
+        self.user.refresh_from_db()
+
+        self.assertEqual(self.user.last_name, "User")
+        self.assertIn("last_name", response.data)
@@ -1,6 +1,11 @@
+from typing import Any
+
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
 
+from rest_practice.asynchronous import AsyncReadMixin
 from user.models import User
 from user.serializers import UserSerializer
 
@@ -9,9 +14,18 @@ class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(AsyncReadMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_object(self) -> User:
         return self.request.user
+
+    async def aget(
+            self,
+            request: Request,
+            *args: Any,
+            **kwargs: Any
+    ) -> Response:
+        # authentication loaded the user, nothing is left to query
+        return self.retrieve(request, *args, **kwargs)